@@ -0,0 +1,86 @@
+"""
+Throughput of StorageWithCache with per-category locks and with one lock of the whole table.
+
+Every character loads its inventory and saves some items, like CharacterInventory does when
+characters log in and pick up objects. The storage waits for a simulated database round trip,
+so tasks of different characters can run at the same time if they do not share a lock.
+
+Run it in the repository's root:
+    python -m benchmarks.category_locks --characters 500 --latency 2
+"""
+
+import time
+import asyncio
+import argparse
+from muddery.server.database.storage.memory_kv_storage import MemoryKVStorage
+from muddery.server.database.storage.memory_kv_cache import MemoryKVCache
+from muddery.server.database.storage.storage_with_cache import StorageWithCache
+
+
+class RemoteStorage(MemoryKVStorage):
+    """
+    A memory storage which waits for a round trip on every query.
+    """
+    def __init__(self, latency):
+        super(RemoteStorage, self).__init__()
+        self.latency = latency
+
+    async def load_category(self, category, *default):
+        await asyncio.sleep(self.latency)
+        return await super(RemoteStorage, self).load_category(category, *default)
+
+    async def save(self, category, key, value=None):
+        await asyncio.sleep(self.latency)
+        await super(RemoteStorage, self).save(category, key, value)
+
+
+class TableLock(object):
+    """
+    One lock of the whole table, the behaviour before category locks.
+    """
+    def __init__(self):
+        self.lock = asyncio.Lock()
+
+    def category(self, category):
+        return self.lock
+
+    def table(self, owned=0):
+        return self.lock
+
+
+async def run(characters, items, latency, table_lock):
+    """
+    Run all characters at the same time.
+
+    Return:
+        (float): seconds.
+    """
+    storage = StorageWithCache(RemoteStorage(latency), MemoryKVCache())
+    if table_lock:
+        storage.locks = TableLock()
+
+    async def play(char_db_id):
+        await storage.load_category(char_db_id, {})
+        for position in range(items):
+            await storage.save(char_db_id, position, {"object_key": "item", "number": 1, "level": 1})
+
+    start = time.perf_counter()
+    await asyncio.gather(*[play(char_db_id) for char_db_id in range(characters)])
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--characters", type=int, default=500)
+    parser.add_argument("--items", type=int, default=5, help="items saved by every character")
+    parser.add_argument("--latency", type=float, default=2, help="milliseconds of a query")
+    args = parser.parse_args()
+
+    operations = args.characters * (args.items + 1)
+    for name, table_lock in (("table lock", True), ("category locks", False)):
+        seconds = asyncio.run(run(args.characters, args.items, args.latency / 1000, table_lock))
+        print("%-15s %8.3fs %10.0f ops/s" % (name, seconds, operations / seconds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Time of finding element types in elements' files, scanning all files compared with reusing the
+manifest of unchanged files.
+
+Run it with a game's folder:
+    python -m benchmarks.element_manifest /path/to/game --repeat 50
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("game", help="the game's folder")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    game_dir = os.path.abspath(args.game)
+    os.chdir(game_dir)
+    sys.path.insert(0, game_dir)
+
+    from muddery.server.settings import SETTINGS
+    from server.settings import ServerSettings
+    SETTINGS.update(ServerSettings())
+
+    start = time.perf_counter()
+    from muddery.server.mappings.element_set import ElementSet, ELEMENT_SET
+    print("import element_set  %.2f ms  %d element types" % (
+        (time.perf_counter() - start) * 1000, len(ELEMENT_SET.module_dict)
+    ))
+
+    def load(manifest_path):
+        element_set = ElementSet()
+        element_set.load_manifest(manifest_path)
+        element_set.load_files(SETTINGS.PATH_ELEMENTS_BASE)
+        element_set.load_files(SETTINGS.PATH_ELEMENTS_CUSTOM)
+        element_set.save_manifest()
+        assert element_set.module_dict == ELEMENT_SET.module_dict
+        return element_set
+
+    with tempfile.TemporaryDirectory() as folder:
+        manifest_path = os.path.join(folder, "elements.manifest")
+        load(manifest_path)
+
+        for name, path in (("scan all files", None), ("use the manifest", manifest_path)):
+            start = time.perf_counter()
+            for i in range(args.repeat):
+                load(path)
+            print("%-18s  %.2f ms" % (name, (time.perf_counter() - start) * 1000 / args.repeat))
+
+
+if __name__ == "__main__":
+    main()
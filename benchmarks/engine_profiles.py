@@ -0,0 +1,61 @@
+"""
+Write throughput of SQLite engines with different tuning profiles. Every insert is committed
+alone, like saving a character's data without write-behind caches.
+
+The result depends on the disk, put the database on the disk of the game's folder:
+    python -m benchmarks.engine_profiles --folder /path/to/game --commits 2000
+"""
+
+import os
+import time
+import argparse
+import tempfile
+from sqlalchemy import text
+from muddery.common.database.engines import ENGINE_PROFILES, get_engine
+
+
+def measure(folder, profile, commits):
+    """
+    Insert rows in separate transactions.
+
+    Return:
+        (str, str, float): journal mode, synchronous level and commits per second.
+    """
+    path = os.path.join(folder, "%s.db3" % profile)
+    engine = get_engine("sqlite3", {"NAME": path, "DEBUG": False, "PROFILE": profile})
+
+    try:
+        with engine.connect() as conn:
+            journal_mode = conn.execute(text("PRAGMA journal_mode")).scalar()
+            synchronous = conn.execute(text("PRAGMA synchronous")).scalar()
+            with conn.begin():
+                conn.execute(text("CREATE TABLE records (id INTEGER PRIMARY KEY, key TEXT, value TEXT)"))
+
+            start = time.perf_counter()
+            for i in range(commits):
+                with conn.begin():
+                    conn.execute(text("INSERT INTO records (key, value) VALUES (:key, :value)"),
+                                 {"key": "key_%d" % i, "value": "x" * 100})
+            seconds = time.perf_counter() - start
+    finally:
+        engine.dispose()
+
+    return journal_mode, synchronous, commits / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--folder", help="create databases in this folder, default is a temporary folder")
+    parser.add_argument("--commits", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.folder) as folder:
+        for profile in ENGINE_PROFILES["sqlite3"]:
+            journal_mode, synchronous, speed = measure(folder, profile, args.commits)
+            print("%-8s journal_mode=%-6s synchronous=%s  %8.0f commits/s" % (
+                profile, journal_mode, synchronous, speed
+            ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Memory and lookup speed of world data tables: columnar MemoryTables compared with tables of row
+records, the layout before columns.
+
+Tracing memory makes loading several times slower, compare load times of the two layouts only.
+
+Run it in the repository's root:
+    python -m benchmarks.memory_table --rows 30000
+"""
+
+import gc
+import time
+import argparse
+import tracemalloc
+from sqlalchemy import create_engine, insert, select, UniqueConstraint
+from sqlalchemy.orm import Session
+from muddery.server.database import worlddata_models
+from muddery.server.database.storage.memory_record import MemoryRecord
+from muddery.server.database.storage.memory_table import MemoryTable
+
+
+TABLES = ["world_npcs", "element_properties", "localized_strings"]
+
+
+class RowTable(object):
+    """
+    A table keeps a record object of every row and indexes of lists, the layout before columns.
+    """
+    def __init__(self, session, model_path, model_name):
+        self.model = getattr(worlddata_models, model_name)
+        self.columns = self.model.__table__.columns.keys()
+        self.table_fields = {field_name: i for i, field_name in enumerate(self.columns)}
+
+        self.records = []
+        for row in session.execute(select(self.model)).scalars():
+            self.records.append(MemoryRecord(self.table_fields, [getattr(row, field) for field in self.columns]))
+        session.expunge_all()
+
+        self.index = {}
+        indexes = [[field_name] for field_name in self.columns
+                   if field_name != "id" and (self.model.__table__.columns[field_name].unique or
+                                              self.model.__table__.columns[field_name].index)]
+        indexes.extend(getattr(self.model, "__index_together__", []))
+        for table_args in getattr(self.model, "__table_args__", ()):
+            if type(table_args) == UniqueConstraint:
+                indexes.append(table_args.columns.keys())
+
+        for index_fields in indexes:
+            index_fields = sorted(index_fields)
+            index = {}
+            for i, record in enumerate(self.records):
+                key = tuple(getattr(record, field_name) for field_name in index_fields)
+                index.setdefault(key[0] if len(key) == 1 else key, []).append(i)
+            self.index[".".join(index_fields)] = index
+
+    def filter(self, **conditions):
+        index_fields = sorted(conditions.keys())
+        key = tuple(conditions[field_name] for field_name in index_fields)
+        rows = self.index[".".join(index_fields)].get(key[0] if len(key) == 1 else key, [])
+        return [self.records[i] for i in rows]
+
+
+def create_database(rows):
+    """
+    Create world data tables in memory.
+    """
+    engine = create_engine("sqlite://")
+    for table_name in TABLES:
+        getattr(worlddata_models, table_name).__table__.create(engine)
+
+    with engine.begin() as conn:
+        conn.execute(insert(worlddata_models.world_npcs.__table__), [
+            {"key": "npc_%d" % i, "name": "npc %d" % (i % 100), "location": "room_%d" % (i % 500)}
+            for i in range(rows)
+        ])
+        conn.execute(insert(worlddata_models.element_properties.__table__), [
+            {"element": "CHARACTER", "key": "npc_%d" % (i // 10), "level": 1, "property": "prop_%d" % (i % 10),
+             "value": str(i % 7)}
+            for i in range(rows * 10)
+        ])
+        conn.execute(insert(worlddata_models.localized_strings.__table__), [
+            {"category": "category_%d" % (i % 20), "origin": "origin %d" % i, "local": "local %d" % i}
+            for i in range(rows)
+        ])
+    return Session(engine, autocommit=True)
+
+
+def measure(table_class, session, rows, lookups):
+    """
+    Load tables and search them.
+    """
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    tables = {name: table_class(session, worlddata_models.__name__, name) for name in TABLES}
+    load_time = time.perf_counter() - start
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    npcs = tables["world_npcs"]
+    properties = tables["element_properties"]
+    start = time.perf_counter()
+    for i in range(lookups):
+        key = "npc_%d" % (i % rows)
+        npcs.filter(key=key)[0].location
+        for record in properties.filter(element="CHARACTER", key=key, level=1):
+            record.value
+    lookup_time = time.perf_counter() - start
+
+    print("%-12s retained %6.1f MB  peak %6.1f MB  load %.2fs  %d lookups %.3fs" % (
+        table_class.__name__, retained / 1e6, peak / 1e6, load_time, lookups, lookup_time
+    ))
+    return tables
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--rows", type=int, default=30000, help="npcs, they have ten properties each")
+    parser.add_argument("--lookups", type=int, default=20000)
+    args = parser.parse_args()
+
+    session = create_database(args.rows)
+    row_tables = measure(RowTable, session, args.rows, args.lookups)
+    tables = measure(MemoryTable, session, args.rows, args.lookups)
+
+    for i in range(0, args.rows, max(args.rows // 100, 1)):
+        conditions = {"element": "CHARACTER", "key": "npc_%d" % i, "level": 1}
+        assert [record.id for record in row_tables["element_properties"].filter(**conditions)] == \
+            [record.id for record in tables["element_properties"].filter(**conditions)]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Speed and size of object state codecs: the legacy JSON codec and the binary codec.
+
+Run it in the repository's root:
+    python -m benchmarks.state_codecs --number 20000
+"""
+
+import timeit
+import argparse
+from muddery.server.database.gamedata.state_codecs import JSONStateCodec, BinaryStateCodec
+
+
+# States of a typical character.
+STATES = {
+    "hp": 120,
+    "mp": 45,
+    "exp": 123456,
+    "level": 12,
+    "position": "room_001",
+    "nickname": "Hero",
+    "is_alive": True,
+    "buffs": {"strength": (5, 1.5e9), "haste": (2, 1.6e9)},
+    "skills": {"skill_%d" % i: {"cd": 12.5, "level": i} for i in range(5)},
+    "closed_events": ["event_%d" % i for i in range(10)],
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--number", type=int, default=20000, help="times to pack all states")
+    args = parser.parse_args()
+
+    values = list(STATES.values())
+    for name, codec in (("json", JSONStateCodec()), ("binary", BinaryStateCodec())):
+        data = [codec.encode(value) for value in values]
+        assert [codec.decode(item) for item in data] == values
+
+        encode_time = timeit.timeit(lambda: [codec.encode(value) for value in values], number=args.number)
+        decode_time = timeit.timeit(lambda: [codec.decode(item) for item in data], number=args.number)
+        print("%-7s encode %.3fs  decode %.3fs  %d bytes" % (
+            name,
+            encode_time,
+            decode_time,
+            sum(len(item) for item in data),
+        ))
+
+
+if __name__ == "__main__":
+    main()
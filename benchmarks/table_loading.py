@@ -0,0 +1,104 @@
+"""
+Time of warming caches from big gamedata tables, reading rows as tuples through SQLAlchemy Core
+compared with building ORM objects of every row.
+
+Run it in the repository's root:
+    python -m benchmarks.table_loading --characters 10000
+"""
+
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+from muddery.server.database import gamedata_models
+from muddery.server.database.storage.table_kv_storage import TableKVStorage
+
+
+def create_database(path, characters):
+    """
+    Create tables of characters' states and inventories.
+    """
+    engine = create_engine("sqlite:///" + path)
+    gamedata_models.Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(gamedata_models.character_states.__table__), [
+            {"obj_id": i, "key": "key_%d" % n, "value": "value %d" % n}
+            for i in range(characters) for n in range(20)
+        ])
+        conn.execute(insert(gamedata_models.character_inventory.__table__), [
+            {"character_id": i, "position": n, "object_key": "item_%d" % n, "number": 1, "level": 1}
+            for i in range(characters) for n in range(10)
+        ])
+    return engine
+
+
+def load_orm_objects(storage):
+    """
+    Load all data by ORM objects, the way before reading rows as tuples.
+    """
+    all_data = {}
+    records = storage.session.execute(select(storage.model)).scalars().all()
+    for record in records:
+        category = getattr(record, storage.category_field)
+        key = getattr(record, storage.key_field)
+        if storage.default_value_field:
+            value = getattr(record, storage.default_value_field)
+        else:
+            value = {field: getattr(record, field) for field in storage.columns}
+        all_data.setdefault(category, {})[key] = value
+
+    storage.session.expunge_all()
+    return storage.categories_to_all_data(all_data)
+
+
+def measure(func, repeat):
+    """
+    Get the best time of a function.
+    """
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--characters", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        engine = create_database(os.path.join(folder, "gamedata.db3"), args.characters)
+        session = Session(engine, autocommit=True)
+        models = gamedata_models.__name__
+        storages = [
+            TableKVStorage(session, models, "character_states", "obj_id", "key", "value"),
+            TableKVStorage(session, models, "character_inventory", "character_id", "position"),
+        ]
+
+        for storage in storages:
+            core = lambda: asyncio.run(storage.load_all())
+            assert core() == load_orm_objects(storage)
+
+            orm_time = measure(lambda: load_orm_objects(storage), args.repeat)
+            core_time = measure(core, args.repeat)
+            print("%-20s %8d rows  orm %.3fs  core %.3fs  %.1fx" % (
+                storage.model.__tablename__,
+                session.query(storage.model).count(),
+                orm_time,
+                core_time,
+                orm_time / core_time,
+            ))
+
+        session.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Time of loading all world data tables at startup: querying the database compared with loading
+the world data snapshot.
+
+Use a game's world data database, or create a database of generated data:
+    python -m benchmarks.world_snapshot --database /path/to/game/server/worlddata.db3
+    python -m benchmarks.world_snapshot --rows 30000
+"""
+
+import os
+import time
+import argparse
+import tempfile
+from muddery.server.settings import SETTINGS
+
+
+def create_data(rows):
+    """
+    Add generated elements to the world data database.
+    """
+    from sqlalchemy import insert
+    from muddery.server.database import worlddata_models
+    from muddery.server.database.worlddata_db import WorldDataDB
+
+    WorldDataDB.inst().create_tables()
+    with WorldDataDB.inst().engine.begin() as conn:
+        conn.execute(insert(worlddata_models.world_npcs.__table__), [
+            {"key": "npc_%d" % i, "location": "room_%d" % (i % 500)} for i in range(rows)
+        ])
+        conn.execute(insert(worlddata_models.element_properties.__table__), [
+            {"element": "CHARACTER", "key": "npc_%d" % (i // 10), "level": 1, "property": "prop_%d" % (i % 10),
+             "value": str(i % 7)}
+            for i in range(rows * 10)
+        ])
+        conn.execute(insert(worlddata_models.localized_strings.__table__), [
+            {"category": "category_%d" % (i % 20), "origin": "origin %d" % i, "local": "local %d" % i}
+            for i in range(rows * 3)
+        ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--database", help="the world data database, default is a generated database")
+    parser.add_argument("--rows", type=int, default=30000, help="npcs of the generated database")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        database = args.database or os.path.join(folder, "worlddata.db3")
+        snapshot_path = os.path.join(folder, "worlddata.snapshot")
+        SETTINGS.WORLDDATA_DB = dict(SETTINGS.WORLDDATA_DB, NAME=database,
+                                     MODELS="muddery.server.database.worlddata_models")
+
+        from muddery.server.database.worlddata_db import WorldDataDB
+        from muddery.server.database.worlddata.worlddata import WorldData
+
+        WorldDataDB.inst().connect()
+        if not args.database:
+            create_data(args.rows)
+
+        start = time.perf_counter()
+        WorldData.save_snapshot(snapshot_path)
+        print("build snapshot   %.2fs  %.1f MB" % (time.perf_counter() - start, os.path.getsize(snapshot_path) / 1e6))
+
+        start = time.perf_counter()
+        WorldData.reload_all()
+        print("load from SQL    %.2fs" % (time.perf_counter() - start))
+        rows = {name: table.size for name, table in WorldData.tables.items()}
+
+        start = time.perf_counter()
+        assert WorldData.load_snapshot(snapshot_path)
+        print("load snapshot    %.2fs" % (time.perf_counter() - start))
+        assert {name: table.size for name, table in WorldData.tables.items()} == rows
+
+        WorldData.clear_all()
+        WorldDataDB.inst().engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,12 @@
 
+import os
+import hashlib
 import importlib
 import inspect
-from sqlalchemy.orm import Session
-from sqlalchemy import delete
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy import delete, text
 from sqlalchemy import inspect as sql_inspect
-from muddery.common.database.engines import get_engine, get_db_link
+from muddery.common.database.engines import get_engine, get_async_engine, get_db_link
 from muddery.common.utils.singleton import Singleton
 
 
@@ -17,23 +19,35 @@ class DBManager(Singleton):
         self.logger = logger
         self.engine = None
         self.session = None
+        self.async_engine = None
+        self.async_session_maker = None
         self.connected = False
 
-    def connect(self):
+    def connect(self, async_engine=False):
         """
         Create db connections.
-        """
-        if self.connected:
-            return
 
-        try:
-            self.engine = get_engine(self.config["ENGINE"], self.config)
-            self.session = Session(self.engine, autocommit=True)
-        except Exception as e:
-            self.logger.log_trace("Can not connect to db.")
-            raise e
+        Args:
+            async_engine: (boolean) create an asyncio engine too.
+        """
+        if not self.connected:
+            try:
+                self.engine = get_engine(self.config["ENGINE"], self.config)
+                self.session = Session(self.engine, autocommit=True)
+            except Exception as e:
+                self.logger.log_trace("Can not connect to db.")
+                raise e
 
-        self.connected = True
+            self.connected = True
+
+        if async_engine and not self.async_engine:
+            try:
+                from sqlalchemy.ext.asyncio import AsyncSession
+                self.async_engine = get_async_engine(self.config["ENGINE"], self.config)
+                self.async_session_maker = sessionmaker(self.async_engine, class_=AsyncSession, expire_on_commit=False)
+            except Exception as e:
+                self.logger.log_trace("Can not connect to db.")
+                raise e
 
     def create_tables(self):
         """
@@ -78,6 +92,12 @@ class DBManager(Singleton):
         """
         return self.session
 
+    def get_async_session_maker(self):
+        """
+        The factory of asyncio sessions. Each coroutine should use its own session.
+        """
+        return self.async_session_maker
+
     def get_tables(self):
         """
         Get all tables' names of a scheme.
@@ -103,3 +123,38 @@ class DBManager(Singleton):
         module = importlib.import_module(self.config["MODELS"])
         model = getattr(module, table_name)
         return model
+
+    def get_checksum(self):
+        """
+        Get a checksum of the database's data, it changes when data changes.
+        Return None if the database's engine does not support it.
+        """
+        db_type = self.config["ENGINE"]
+        if db_type == "sqlite3":
+            # Write changes in the WAL file back to the database, so the database file keeps
+            # the same after all connections are closed.
+            with self.engine.connect() as connection:
+                connection.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+
+            checksum = hashlib.sha256()
+            db_path = self.config["NAME"]
+            for path in (db_path, db_path + "-wal"):
+                if not os.path.exists(path):
+                    continue
+
+                with open(path, "rb") as f:
+                    for block in iter(lambda: f.read(1048576), b""):
+                        checksum.update(block)
+            return checksum.hexdigest()
+
+        elif db_type == "mysql":
+            table_names = sorted(self.get_tables())
+            if not table_names:
+                return None
+
+            stmt = text("CHECKSUM TABLE %s" % ", ".join("`%s`" % name for name in table_names))
+            rows = self.session.execute(stmt).all()
+            checksum = hashlib.sha256(repr([tuple(row) for row in rows]).encode("utf-8"))
+            return checksum.hexdigest()
+
+        return None
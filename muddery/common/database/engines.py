@@ -2,7 +2,70 @@
 Create sqlalchemy engines.
 """
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+
+
+# Engines' tuning profiles. A database's "PROFILE" setting selects a profile of its engine type,
+# its "OPTIONS" setting overrides the profile's values.
+#
+# sqlite3 options are pragmas set on every new connection, None means keeping SQLite's default:
+#     JOURNAL_MODE: WAL lets readers work while writing and makes commits much cheaper.
+#     SYNCHRONOUS: NORMAL only syncs at checkpoints in WAL mode, FULL syncs every commit.
+#     CACHE_SIZE: pages, or KiB if it is negative.
+#     MMAP_SIZE: bytes of the file to map into memory.
+#     BUSY_TIMEOUT: milliseconds to wait for locks of other connections.
+#
+# mysql options are connection pool's arguments:
+#     POOL_SIZE, MAX_OVERFLOW, POOL_RECYCLE (seconds), POOL_PRE_PING
+ENGINE_PROFILES = {
+    "sqlite3": {
+        # Syncs every commit and waits for other connections' locks.
+        "safe": {
+            "JOURNAL_MODE": None,
+            "SYNCHRONOUS": "FULL",
+            "CACHE_SIZE": None,
+            "MMAP_SIZE": None,
+            "BUSY_TIMEOUT": 5000,
+        },
+        # SQLite's own settings.
+        "default": {
+            "JOURNAL_MODE": None,
+            "SYNCHRONOUS": None,
+            "CACHE_SIZE": None,
+            "MMAP_SIZE": None,
+            "BUSY_TIMEOUT": None,
+        },
+        # May lose the latest commits if the system crashes, but the database file keeps
+        # consistent. WAL mode leaves -wal and -shm files beside the database file.
+        "fast": {
+            "JOURNAL_MODE": "WAL",
+            "SYNCHRONOUS": "NORMAL",
+            "CACHE_SIZE": -16000,
+            "MMAP_SIZE": None,
+            "BUSY_TIMEOUT": 5000,
+        },
+    },
+    "mysql": {
+        "safe": {
+            "POOL_SIZE": 5,
+            "MAX_OVERFLOW": 10,
+            "POOL_RECYCLE": 3600,
+            "POOL_PRE_PING": True,
+        },
+        "default": {
+            "POOL_SIZE": 10,
+            "MAX_OVERFLOW": 20,
+            "POOL_RECYCLE": 3600,
+            "POOL_PRE_PING": True,
+        },
+        "fast": {
+            "POOL_SIZE": 20,
+            "MAX_OVERFLOW": 40,
+            "POOL_RECYCLE": 3600,
+            "POOL_PRE_PING": False,
+        },
+    },
+}
 
 
 def get_engine(db_type, configs):
@@ -10,7 +73,82 @@ def get_engine(db_type, configs):
     Get an engine according to the database type.
     """
     db_link = get_db_link(db_type, configs)
-    return create_engine(db_link, echo=configs["DEBUG"])
+    options = get_engine_options(db_type, configs)
+    engine = create_engine(db_link, echo=configs["DEBUG"], **get_pool_args(db_type, options))
+    set_sqlite_pragmas(db_type, engine, options)
+    return engine
+
+
+def get_async_engine(db_type, configs):
+    """
+    Get an asyncio engine according to the database type.
+    """
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    db_link = get_async_db_link(db_type, configs)
+    options = get_engine_options(db_type, configs)
+    engine = create_async_engine(db_link, echo=configs["DEBUG"], **get_pool_args(db_type, options))
+    set_sqlite_pragmas(db_type, engine.sync_engine, options)
+    return engine
+
+
+def get_engine_options(db_type, configs):
+    """
+    Get the engine's tuning options from its profile and options settings.
+    """
+    profiles = ENGINE_PROFILES.get(db_type, {})
+    profile_name = configs.get("PROFILE", "default")
+    try:
+        options = dict(profiles[profile_name]) if profiles else {}
+    except KeyError:
+        raise ValueError("Unknown %s engine profile: %s" % (db_type, profile_name))
+
+    options.update(configs.get("OPTIONS", {}))
+    return options
+
+
+def get_pool_args(db_type, options):
+    """
+    Get create_engine's connection pool arguments.
+    """
+    if db_type != "mysql":
+        return {}
+
+    args = {
+        "pool_size": options.get("POOL_SIZE"),
+        "max_overflow": options.get("MAX_OVERFLOW"),
+        "pool_recycle": options.get("POOL_RECYCLE"),
+        "pool_pre_ping": options.get("POOL_PRE_PING"),
+    }
+    return {key: value for key, value in args.items() if value is not None}
+
+
+def set_sqlite_pragmas(db_type, engine, options):
+    """
+    Set SQLite's pragmas on every new connection of the engine.
+    """
+    if db_type != "sqlite3":
+        return
+
+    pragmas = [
+        ("journal_mode", options.get("JOURNAL_MODE")),
+        ("synchronous", options.get("SYNCHRONOUS")),
+        ("cache_size", options.get("CACHE_SIZE")),
+        ("mmap_size", options.get("MMAP_SIZE")),
+        ("busy_timeout", options.get("BUSY_TIMEOUT")),
+    ]
+    statements = ["PRAGMA %s=%s" % (name, value) for name, value in pragmas if value is not None]
+    if not statements:
+        return
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
 
 
 def get_db_link(db_type, configs):
@@ -20,21 +158,32 @@ def get_db_link(db_type, configs):
         return get_mysql_link(configs)
 
 
-def get_sqlite3_link(configs):
+def get_async_db_link(db_type, configs):
+    if db_type == "sqlite3":
+        return get_sqlite3_link(configs, driver="aiosqlite")
+    elif db_type == "mysql":
+        return get_mysql_link(configs, driver="aiomysql")
+
+
+def get_sqlite3_link(configs, driver=None):
     """
     Get a sqlite3 engine with configs.
     """
-    link = "sqlite:///{path}?check_same_thread=False".format(path=configs["NAME"])
+    link = "sqlite{driver}:///{path}?check_same_thread=False".format(
+               driver=("+%s" % driver) if driver else "",
+               path=configs["NAME"]
+           )
     return link
 
 
-def get_mysql_link(configs):
+def get_mysql_link(configs, driver="pymysql"):
     """
     Get a mysql engine with configs.
     mysql+pymysql://root:*@localhost:3306/blog?charset=utf8
 
     """
-    link = "mysql+pymysql://{user}:{password}@{host}{port}/{name}".format(
+    link = "mysql+{driver}://{user}:{password}@{host}{port}/{name}".format(
+               driver=driver,
                user=configs["USER"],
                password=configs["PASSWORD"],
                host=configs["HOST"] if configs["HOST"] else "localhost",
@@ -7,7 +7,7 @@ import threading
 
 
 class Singleton(object):
-    _instance_lock = threading.Lock()
+    _instance_lock = threading.RLock()
 
     @classmethod
     def inst(cls):
@@ -7,6 +7,8 @@ be of use when designing your own game.
 """
 
 import os, inspect
+import ast
+import copy
 import asyncio
 import importlib
 from pkgutil import iter_modules
@@ -33,6 +35,27 @@ def file_iterator(file, erase=False, chunk_size=512):
             break
 
 
+def literal_value(value):
+    """
+    Get the value of a python literal string. If the string is not a literal, return the string
+    itself.
+    """
+    try:
+        return ast.literal_eval(value)
+    except (SyntaxError, ValueError) as e:
+        # treat as a raw string
+        return value
+
+
+def copy_values(values):
+    """
+    Copy a dict of values. Mutable values (lists, dicts and sets) are copied deeply, other values
+    are shared.
+    """
+    return {key: copy.deepcopy(value) if type(value) in (list, dict, set) else value
+            for key, value in values.items()}
+
+
 def class_from_path(path):
     """
     Get a class from its path
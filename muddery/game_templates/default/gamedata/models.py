@@ -18,6 +18,15 @@ class character_states(BaseModels.character_states):
     pass
 
 
+# ------------------------------------------------------------
+#
+# Game object's runtime attributes in one record, used by DATABASE_BLOB_TABLES.
+#
+# ------------------------------------------------------------
+class character_state_blobs(BaseModels.character_state_blobs):
+    pass
+
+
 # ------------------------------------------------------------
 #
 # server bans
@@ -157,6 +157,7 @@ operations:
   muddery createadmin       Create an administrator account in the world editor.
   muddery upgrade           Upgrade a game directory to the latest version.
   muddery migrate           Migrate databases to new version.
+  muddery migratestates     Convert stored object states to the current state codec.
   muddery loaddata          Load game data from the worlddata folder.
   muddery sysdata           Reload system default data.
   muddery -h                -h, --help      Show help messages.
@@ -4,6 +4,7 @@ import os
 import traceback
 import asyncio
 import subprocess
+import importlib
 import httpx
 from muddery.launcher import configs, utils
 
@@ -225,6 +226,8 @@ def load_game_data():
         traceback.print_exc()
         raise
 
+    build_world_snapshot()
+
 
 def load_system_data():
     """
@@ -264,6 +267,26 @@ def load_system_data():
         traceback.print_exc()
         raise
 
+    build_world_snapshot()
+
+
+def build_world_snapshot():
+    """
+    Build the world data snapshot for the server's startup.
+
+    :return:
+    """
+    print("Building the world data snapshot.")
+
+    try:
+        start = time.time()
+        utils.build_world_snapshot()
+        print("Build the world data snapshot success in %.2fs." % (time.time() - start))
+    except Exception as e:
+        # The server can still load world data from the database.
+        traceback.print_exc()
+        print("Can not build the world data snapshot: %s" % e)
+
 
 def migrate_database(database_name):
     """
@@ -284,6 +307,68 @@ def migrate_database(database_name):
         print("Migrate %s error: %s" % (database_name, e))
 
 
+def migrate_object_states(batch_size=1000):
+    """
+    Convert object states in the game database to the current state codec.
+
+    :param batch_size: the number of rows converted in a transaction.
+    :return:
+    """
+    print("Migrating object states.")
+
+    gamedir = os.path.abspath(configs.CURRENT_DIR)
+    utils.init_game_env(gamedir)
+
+    # Load settings.
+    try:
+        from muddery.server.settings import SETTINGS
+        from server.settings import ServerSettings
+        SETTINGS.update(ServerSettings())
+    except Exception as e:
+        traceback.print_exc()
+        raise
+
+    from sqlalchemy import select, update, bindparam
+    from muddery.server.database.gamedata_db import GameDataDB
+    from muddery.server.database.gamedata.state_codecs import get_state_codec, BinaryStateCodec
+
+    GameDataDB.inst().connect()
+    session = GameDataDB.inst().get_session()
+    codec = get_state_codec(SETTINGS.OBJECT_STATE_CODEC)
+
+    # It reads both binary and JSON states.
+    reader = BinaryStateCodec()
+
+    module = importlib.import_module(SETTINGS.GAMEDATA_DB["MODELS"])
+    table = module.character_states.__table__
+
+    stmt = update(table).where(table.c.id == bindparam("row_id")).values(value=bindparam("new_value"))
+    last_id = None
+    total = 0
+    while True:
+        query = select(table.c.id, table.c.value).order_by(table.c.id).limit(batch_size)
+        if last_id is not None:
+            query = query.where(table.c.id > last_id)
+        rows = session.execute(query).all()
+        if not rows:
+            break
+
+        last_id = rows[-1][0]
+        params = []
+        for row_id, value in rows:
+            if codec.is_current(value):
+                continue
+
+            params.append({"row_id": row_id, "new_value": codec.encode(reader.decode(value))})
+
+        if params:
+            with session.begin():
+                session.execute(stmt, params)
+            total += len(params)
+
+    print("Migrated %d object states." % total)
+
+
 def collect_webclient_static():
     """
     Collect webclient's static web files.
@@ -349,6 +349,17 @@ def import_system_data():
     importer.import_table_path(localized_string_path, SETTINGS.LOCALIZED_STRINGS_MODEL, clear=False, except_errors=True)
 
 
+def build_world_snapshot():
+    """
+    Build the world data snapshot, so the server can load world data without querying the database.
+    """
+    from muddery.server.settings import SETTINGS
+    from muddery.server.database.worlddata.worlddata import WorldData
+
+    if SETTINGS.WORLD_DATA_SNAPSHOT:
+        WorldData.save_snapshot(SETTINGS.WORLD_DATA_SNAPSHOT)
+
+
 def init_game_env(gamedir):
     """
     Set the environment to the game dir.
@@ -99,6 +99,16 @@ def main():
             sys.exit(-1)
         sys.exit(0)
 
+    elif sys_argv[1] == "migratestates":
+        # Convert object states to the current codec.
+        from muddery.launcher import manager
+        try:
+            manager.migrate_object_states()
+        except Exception as e:
+            print(e)
+            sys.exit(-1)
+        sys.exit(0)
+
     elif sys_argv[1] == "loaddata":
         # Load game data from the worlddata folder.
         from muddery.launcher import manager
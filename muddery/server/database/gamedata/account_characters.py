@@ -41,6 +41,16 @@ class AccountCharacters(BaseData, Singleton):
         """
         await self.storage.delete(account_id, char_id)
 
+    async def remove_characters(self, account_id, char_ids):
+        """
+        Remove characters of an account.
+
+        :param account_id: player's account id
+        :param char_ids: (list) characters' db ids
+        :return:
+        """
+        await self.storage.delete_many(account_id, char_ids)
+
     async def get_account_characters(self, account_id):
         """
         Get all characters of an account.
@@ -3,9 +3,14 @@
 Query and deal game data.
 """
 
+import importlib
 from muddery.server.settings import SETTINGS
 from muddery.common.utils import utils
 from muddery.server.database.storage.storage_with_cache import StorageWithCache
+from muddery.server.database.storage.cache_flusher import CacheFlusher
+from muddery.server.database.storage.blob_kv_storage import BlobKVStorage
+from muddery.server.database.gamedata.state_codecs import get_state_codec
+from muddery.server.database.storage.storage_metrics import StorageMetricsRegistry
 from muddery.server.database.gamedata_db import GameDataDB
 
 
@@ -28,13 +33,26 @@ class BaseData(object):
         """
         pass
 
+    def get_db_session(self, storage_class):
+        """
+        Get the database session used by the storage class.
+        """
+        if storage_class.require_async_engine:
+            return GameDataDB.inst().get_async_session_maker()
+        else:
+            return GameDataDB.inst().get_session()
+
     def create_storage(self, table_name, category_name, key_field, default_value_field):
         """
         Create the storage object.
         """
+        blob_table_name = SETTINGS.DATABASE_BLOB_TABLES.get(table_name)
+        if blob_table_name:
+            return self.create_blob_storage(blob_table_name, category_name)
+
         storage_class = utils.class_from_path(SETTINGS.DATABASE_STORAGE_OBJECT)
         storage = storage_class(
-            GameDataDB.inst().get_session(),
+            self.get_db_session(storage_class),
             SETTINGS.GAMEDATA_DB["MODELS"],
             table_name,
             category_name,
@@ -43,9 +61,24 @@ class BaseData(object):
         )
 
         cache_class = utils.class_from_path(SETTINGS.DATABASE_CACHE_OBJECT)
-        cache = cache_class()
+        cache_options = dict(SETTINGS.DATABASE_CACHE_OPTIONS)
+        cache_options.update(SETTINGS.DATABASE_CACHE_TABLE_OPTIONS.get(table_name, {}))
+        cache = cache_class(**cache_options)
+
+        storage_with_cache = StorageWithCache(
+            storage,
+            cache,
+            write_behind=SETTINGS.DATABASE_WRITE_BEHIND,
+            flush_threshold=SETTINGS.DATABASE_FLUSH_THRESHOLD,
+            metrics=StorageMetricsRegistry.inst().get(table_name) if SETTINGS.DATABASE_METRICS else None,
+            name=table_name,
+            journal=CacheFlusher.inst().journal
+        )
 
-        return StorageWithCache(storage, cache)
+        if SETTINGS.DATABASE_WRITE_BEHIND:
+            CacheFlusher.inst().add(storage_with_cache)
+
+        return storage_with_cache
 
     def create_storage_no_cache(self, table_name, category_name, key_field, default_value_field):
         """
@@ -53,7 +86,7 @@ class BaseData(object):
         """
         storage_class = utils.class_from_path(SETTINGS.DATABASE_STORAGE_OBJECT)
         return storage_class(
-            GameDataDB.inst().get_session(),
+            self.get_db_session(storage_class),
             SETTINGS.GAMEDATA_DB["MODELS"],
             table_name,
             category_name,
@@ -61,8 +94,47 @@ class BaseData(object):
             default_value_field
         )
 
-    def transaction(self):
+    def create_blob_storage(self, blob_table_name, category_name):
+        """
+        Create the storage object which keeps a category's data in one record. Games created
+        before blob tables have not their models, Muddery's own models are used then. The table
+        is created if it does not exist.
+        """
+        models_path = SETTINGS.GAMEDATA_DB["MODELS"]
+        if not hasattr(importlib.import_module(models_path), blob_table_name):
+            models_path = "muddery.server.database.gamedata_models"
+
+        model = getattr(importlib.import_module(models_path), blob_table_name)
+        model.__table__.create(GameDataDB.inst().engine, checkfirst=True)
+
+        storage_class = utils.class_from_path(SETTINGS.DATABASE_STORAGE_OBJECT)
+        storage = storage_class(
+            self.get_db_session(storage_class),
+            models_path,
+            blob_table_name,
+            category_name,
+            None,
+            None
+        )
+        return BlobKVStorage(storage, get_state_codec(SETTINGS.OBJECT_STATE_CODEC))
+
+    def pin(self, category):
+        """
+        Keep a category's data in the cache.
+        """
+        self.storage.pin(category)
+
+    def unpin(self, category):
+        """
+        Release a pin of the category.
+        """
+        self.storage.unpin(category)
+
+    def transaction(self, write_through: bool = False):
         """
         Guarantee the transaction execution of a given block.
+
+        :param write_through: write changes of write-behind storages to the database in the same
+            database transaction.
         """
-        return self.storage.transaction()
+        return self.storage.transaction(write_through)
@@ -0,0 +1,133 @@
+"""
+Load all game data of player characters at once.
+"""
+
+from muddery.common.utils.singleton import Singleton
+from muddery.common.utils.utils import async_gather
+from muddery.server.database.gamedata.account_characters import AccountCharacters
+from muddery.server.database.gamedata.character_info import CharacterInfo
+from muddery.server.database.gamedata.character_location import CharacterLocation
+from muddery.server.database.gamedata.character_combat import CharacterCombat
+from muddery.server.database.gamedata.character_revealed_map import CharacterRevealedMap
+from muddery.server.database.gamedata.character_inventory import CharacterInventory
+from muddery.server.database.gamedata.character_equipments import CharacterEquipments
+from muddery.server.database.gamedata.character_quests import CharacterQuests
+from muddery.server.database.gamedata.character_finished_quests import CharacterFinishedQuests
+from muddery.server.database.gamedata.character_skills import CharacterSkills
+from muddery.server.database.gamedata.character_closed_events import CharacterClosedEvents
+from muddery.server.database.gamedata.character_quest_objectives import CharacterQuestObjectives
+from muddery.server.database.gamedata.character_relationships import CharacterRelationships
+from muddery.server.database.gamedata.object_storage import CharacterObjectStorage
+from muddery.server.database.gamedata.honours_mapper import HonoursMapper
+
+
+# Game data whose categories are player characters' db ids.
+CHARACTER_CATEGORY_DATA = (
+    CharacterObjectStorage,
+    CharacterRevealedMap,
+    CharacterInventory,
+    CharacterEquipments,
+    CharacterQuests,
+    CharacterFinishedQuests,
+    CharacterSkills,
+    CharacterClosedEvents,
+    CharacterQuestObjectives,
+    CharacterRelationships,
+)
+
+
+# Game data whose keys are player characters' db ids.
+CHARACTER_KEY_DATA = (
+    CharacterInfo,
+    CharacterLocation,
+    CharacterCombat,
+)
+
+
+class CharacterBundle(Singleton):
+    """
+    Load player characters' data of all tables into caches before using them, so puppeting a
+    character does not query tables one by one.
+    """
+    def pin(self, char_db_id):
+        """
+        Keep a character's data in caches while it is online.
+
+        :param char_db_id: (int) the character's db id.
+        """
+        for data in CHARACTER_CATEGORY_DATA:
+            data.inst().pin(char_db_id)
+
+    def unpin(self, char_db_id):
+        """
+        Release the character's data in caches.
+
+        :param char_db_id: (int) the character's db id.
+        """
+        for data in CHARACTER_CATEGORY_DATA:
+            data.inst().unpin(char_db_id)
+
+    async def flush(self, char_db_id):
+        """
+        Write a character's write-behind changes to the database.
+
+        :param char_db_id: (int) the character's db id.
+        """
+        for data in CHARACTER_CATEGORY_DATA:
+            storage = data.inst().storage
+            if getattr(storage, "write_behind", False):
+                await storage.flush(categories=[char_db_id])
+
+        for data in CHARACTER_KEY_DATA:
+            storage = data.inst().storage
+            if getattr(storage, "write_behind", False):
+                await storage.flush(keys=[("", char_db_id)])
+
+    async def load(self, char_db_ids):
+        """
+        Load characters' data of all tables to caches. Every table is queried once and
+        tables are queried concurrently.
+
+        :param char_db_ids: (list) characters' db ids.
+        """
+        char_db_ids = list(char_db_ids)
+        if not char_db_ids:
+            return
+
+        coros = [data.inst().storage.load_categories(char_db_ids) for data in CHARACTER_CATEGORY_DATA]
+        coros.extend(data.inst().storage.load_many("", char_db_ids) for data in CHARACTER_KEY_DATA)
+        await async_gather(coros)
+
+    async def remove(self, account_id, char_db_ids):
+        """
+        Remove all data of an account's characters in one transaction. Every table is deleted
+        with one statement and removed categories are evicted from caches. If anything fails,
+        all changes are rolled back.
+
+        Deletions are collected in the transaction first, the database transaction is opened
+        when the transaction commits, so it is not kept open while other tasks are running.
+        Deletions of write-behind tables are written in the same database transaction, so a crash
+        can not leave a part of them.
+
+        :param account_id: (int) the account's id.
+        :param char_db_ids: (list) characters' db ids.
+        """
+        char_db_ids = list(char_db_ids)
+        if not char_db_ids:
+            return
+
+        try:
+            # Writes of a transaction must be made in the same task, so they can not be gathered.
+            async with CharacterInfo.inst().transaction(write_through=True):
+                await AccountCharacters.inst().remove_characters(account_id, char_db_ids)
+                await CharacterInfo.inst().remove_characters(char_db_ids)
+                await CharacterLocation.inst().storage.delete_many("", char_db_ids)
+                await CharacterCombat.inst().storage.delete_many("", char_db_ids)
+                for data in CHARACTER_CATEGORY_DATA:
+                    await data.inst().storage.delete_categories(char_db_ids)
+                await HonoursMapper.inst().remove_characters(char_db_ids)
+        except Exception:
+            # Restore in-memory indexes from the rolled back data.
+            await CharacterInfo.inst().init()
+            await HonoursMapper.inst().load()
+            raise
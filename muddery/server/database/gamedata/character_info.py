@@ -68,6 +68,19 @@ class CharacterInfo(BaseData, Singleton):
         if current_info["nickname"]:
             del self.nicknames[current_info["nickname"]]
 
+    async def remove_characters(self, char_ids):
+        """
+        Remove player characters.
+        :param char_ids: (list) characters' ids
+        :return:
+        """
+        current_info = await self.storage.load_many("", char_ids)
+        await self.storage.delete_many("", char_ids)
+
+        for info in current_info.values():
+            if info["nickname"]:
+                self.nicknames.pop(info["nickname"], None)
+
     async def get(self, char_id):
         """
         Get a player character's nickname.
@@ -85,6 +98,15 @@ class CharacterInfo(BaseData, Singleton):
         data = await self.storage.load("", char_id)
         return data["nickname"]
 
+    async def get_nicknames(self, char_ids):
+        """
+        Get player characters' nicknames.
+        :param char_ids: (list) characters' ids
+        :return: (list) nicknames in the order of char_ids
+        """
+        data = await self.storage.load_many("", char_ids)
+        return [data[char_id]["nickname"] for char_id in char_ids]
+
     async def get_char_id(self, nickname):
         """
         Get an player character's id by its nickname.
@@ -31,6 +31,16 @@ class CharacterSkills(BaseData, Singleton):
         """
         await self.storage.save(character_id, skill_key, data)
 
+    async def save_skills(self, character_id, skills):
+        """
+        Set skills.
+
+        Args:
+            character_id: (number) character's id.
+            skills: (dict) {skill's key: data to save}.
+        """
+        await self.storage.save_many(character_id, skills)
+
     async def has(self, character_id, skill_key):
         """
         Check if the skill exists.
@@ -75,6 +85,16 @@ class CharacterSkills(BaseData, Singleton):
         """
         await self.storage.delete(character_id, skill_key)
 
+    async def delete_skills(self, character_id, skill_keys):
+        """
+        delete skills of a character.
+
+        Args:
+            character_id: (number) character's id.
+            skill_keys: (list) skills' keys.
+        """
+        await self.storage.delete_many(character_id, skill_keys)
+
     async def remove_character(self, character_id):
         """
         Remove all skills of a character.
@@ -8,19 +8,30 @@ from sqlalchemy import select, update, delete
 from muddery.common.utils.singleton import Singleton
 from muddery.server.settings import SETTINGS
 from muddery.server.database.gamedata_db import GameDataDB
+from muddery.server.database.gamedata.base_data import BaseData
+from muddery.server.database.storage.storage_with_cache import StorageWithCache
+from muddery.server.database.storage.memory_kv_cache import MemoryKVCache
 from muddery.server.utils.logger import logger
 
 
-class HonoursMapper(Singleton):
+class HonoursMapper(BaseData, Singleton):
     """
     This model stores all character's honours.
     """
     def __init__(self):
+        super(HonoursMapper, self).__init__()
         self.model_name = "honours"
         module = importlib.import_module(SETTINGS.GAMEDATA_DB["MODELS"])
         self.model = getattr(module, self.model_name)
         self.session = GameDataDB.inst().get_session()
 
+        # Removing characters' honours can be a part of other game data's transactions. Honours
+        # are kept in self.honours, so the storage does not cache them.
+        self.storage = StorageWithCache(
+            self.create_storage_no_cache(self.model_name, None, "character", "honour"),
+            MemoryKVCache()
+        )
+
         self.honours = {}
         self.rankings = []
 
@@ -240,6 +251,18 @@ class HonoursMapper(Singleton):
         except Exception as e:
             logger.log_err("Can not remove character's honour: %s" % e)
 
+    async def remove_characters(self, char_db_ids):
+        """
+        Remove characters' honours in one statement. In a transaction, they are removed from
+        the database when the transaction commits.
+        """
+        await self.storage.delete_many("", char_db_ids)
+
+        for char_db_id in char_db_ids:
+            self.honours.pop(char_db_id, None)
+
+        self.make_rankings()
+
     def get_characters(self, character, number):
         """
         Get opponents whose ranking is in the given number.
@@ -2,64 +2,23 @@
 Object's attributes cache.
 """
 
-import json
 import traceback
-from collections import OrderedDict
-from muddery.common.utils.exception import MudderyError, ERR
+from muddery.server.settings import SETTINGS
 from muddery.server.database.storage.memory_kv_storage import MemoryKVStorage
 from muddery.server.database.gamedata.base_data import BaseData
+from muddery.server.database.gamedata.state_codecs import get_state_codec, PlainStateCodec
 from muddery.common.utils.singleton import Singleton
 
 
-def to_string(value):
-    # pack a value to a string.
-    data_type = type(value)
-    if value is None:
-        # inner types
-        str_value = json.dumps((value, data_type.__name__))
-    elif data_type in {str, int, float, bool, bytes}:
-        # inner types
-        str_value = json.dumps((value, data_type.__name__))
-    elif hasattr(value, "__iter__"):
-        # iterable value
-        if data_type in {dict, OrderedDict}:
-            str_value = json.dumps((dict((to_string(key), to_string(obj)) for key, obj in value.items()), data_type.__name__))
-        else:
-            try:
-                str_value = json.dumps((tuple(to_string(obj) for obj in value), data_type.__name__))
-            except Exception as e:
-                raise MudderyError(ERR.server_error, "The object could not be stored.")
-    else:
-        raise MudderyError(ERR.server_error, "The object can not store %s of %s." % (value, type(value)))
-
-    return str_value
-
-
-def from_string(str_value):
-    # unpack a value from a string.
-    if str_value is None:
-        return None
-
-    try:
-        json_value, data_type = json.loads(str_value)
-        if data_type == "NoneType":
-            value = None
-        elif data_type in {"str", "int", "float", "bool", "bytes"}:
-            value = eval(data_type)(json_value)
-        elif data_type in {"dict", "OrderedDict"}:
-            value = eval(data_type)((from_string(key), from_string(item)) for key, item in json_value.items())
-        else:
-            value = eval(data_type)(from_string(item) for item in json_value)
-    except Exception as e:
-        raise MudderyError(ERR.server_error, "The object can not load %s." % str_value)
-
-    return value
-
-
 class BaseObjectStorage(BaseData, Singleton):
     """
     The storage of object attributes.
     """
+    def __init__(self):
+        super(BaseObjectStorage, self).__init__()
+
+        # the codec to convert values to strings
+        self.codec = get_state_codec(SETTINGS.OBJECT_STATE_CODEC)
 
     # data storage
     async def save(self, obj_id, key, value):
@@ -71,7 +30,7 @@ class BaseObjectStorage(BaseData, Singleton):
             key: (string) attribute's key.
             value: (any) attribute's value.
         """
-        to_save = to_string(value)
+        to_save = self.codec.encode(value)
         await self.storage.save(obj_id, key, to_save)
 
     async def save_keys(self, obj_id, value_dict):
@@ -84,9 +43,7 @@ class BaseObjectStorage(BaseData, Singleton):
         """
         if value_dict:
             try:
-                with self.storage.transaction():
-                    for key, value in value_dict.items():
-                        await self.storage.save(obj_id, key, to_string(value))
+                await self.storage.save_many(obj_id, {key: self.codec.encode(value) for key, value in value_dict.items()})
             except Exception as e:
                 traceback.print_exc()
 
@@ -115,13 +72,27 @@ class BaseObjectStorage(BaseData, Singleton):
         """
         try:
             value = await self.storage.load(obj_id, key)
-            return from_string(value)
+            return self.codec.decode(value)
         except KeyError as e:
             if len(default) > 0:
                 return default[0]
             else:
                 raise e
 
+    async def load_keys(self, obj_id, keys):
+        """
+        Get values of attributes.
+
+        Args:
+            obj_id: (number) object's id.
+            keys: (list) attributes' keys.
+
+        Return:
+            (dict): {key: value}, keys not found are omitted.
+        """
+        values = await self.storage.load_many(obj_id, keys)
+        return {key: self.codec.decode(value) for key, value in values.items()}
+
     async def load_obj(self, obj_id):
         """
         Get values of an object.
@@ -130,7 +101,7 @@ class BaseObjectStorage(BaseData, Singleton):
             obj_id: (number) object's id.
         """
         values = await self.storage.load_category(obj_id, {})
-        return {key: from_string(value) for key, value in values.items()}
+        return {key: self.codec.decode(value) for key, value in values.items()}
 
     async def delete(self, obj_id, key):
         """
@@ -166,6 +137,10 @@ class CharacterObjectStorage(BaseObjectStorage):
         super(CharacterObjectStorage, self).__init__()
         self.storage = self.create_storage(self.__table_name, self.__category_name, self.__key_field, self.__default_value_field)
 
+        if getattr(self.storage, "packs_values", False):
+            # Values are packed with the whole blob.
+            self.codec = PlainStateCodec()
+
 
 class MemoryObjectStorage(BaseObjectStorage):
     """
@@ -0,0 +1,398 @@
+"""
+Codecs to convert object states to strings which can be stored in the database.
+"""
+
+import copy
+import json
+import struct
+import base64
+from collections import OrderedDict
+from muddery.common.utils.exception import MudderyError, ERR
+from muddery.common.utils.utils import class_from_path
+
+
+# Shared codec objects. {codec class's path: codec}
+_codecs = {}
+
+
+def get_state_codec(path):
+    """
+    Get the shared codec object of a codec class. Codecs keep no state, so one object is used by
+    all storages.
+
+    :param path: the codec class's path.
+    """
+    try:
+        return _codecs[path]
+    except KeyError:
+        codec = class_from_path(path)()
+        _codecs[path] = codec
+        return codec
+
+
+class BaseStateCodec(object):
+    """
+    The base class of state codecs.
+    """
+    def encode(self, value) -> str:
+        """
+        Pack a value to a string.
+        """
+        raise NotImplementedError
+
+    def decode(self, data: str):
+        """
+        Unpack a value from a string.
+        """
+        raise NotImplementedError
+
+    def is_current(self, data: str) -> bool:
+        """
+        Check if the data is in this codec's format.
+        """
+        return True
+
+
+class PlainStateCodec(BaseStateCodec):
+    """
+    Keep values as they are, for storages which pack values themselves. Mutable values are copied,
+    so stored values will not be changed by callers.
+    """
+    def encode(self, value):
+        """
+        Copy a value to store.
+        """
+        return copy.deepcopy(value) if type(value) in {list, dict, set, OrderedDict} else value
+
+    def decode(self, data):
+        """
+        Copy a stored value.
+        """
+        return copy.deepcopy(data) if type(data) in {list, dict, set, OrderedDict} else data
+
+
+# Types of JSON data. {type name: type}
+JSON_TYPES = {
+    "NoneType": type(None),
+    "str": str,
+    "int": int,
+    "float": float,
+    "bool": bool,
+    "bytes": bytes,
+    "list": list,
+    "tuple": tuple,
+    "set": set,
+    "frozenset": frozenset,
+    "dict": dict,
+    "OrderedDict": OrderedDict,
+}
+
+
+class JSONStateCodec(BaseStateCodec):
+    """
+    The legacy codec. Every value is packed as a JSON (value, type name) pair.
+    """
+    def encode(self, value) -> str:
+        """
+        Pack a value to a string.
+        """
+        data_type = type(value)
+        if value is None:
+            # inner types
+            str_value = json.dumps((value, data_type.__name__))
+        elif data_type in {str, int, float, bool, bytes}:
+            # inner types
+            str_value = json.dumps((value, data_type.__name__))
+        elif hasattr(value, "__iter__"):
+            # iterable value
+            if data_type in {dict, OrderedDict}:
+                str_value = json.dumps((dict((self.encode(key), self.encode(obj)) for key, obj in value.items()), data_type.__name__))
+            else:
+                try:
+                    str_value = json.dumps((tuple(self.encode(obj) for obj in value), data_type.__name__))
+                except Exception as e:
+                    raise MudderyError(ERR.server_error, "The object could not be stored.")
+        else:
+            raise MudderyError(ERR.server_error, "The object can not store %s of %s." % (value, type(value)))
+
+        return str_value
+
+    def decode(self, data: str):
+        """
+        Unpack a value from a string.
+        """
+        if data is None:
+            return None
+
+        try:
+            json_value, type_name = json.loads(data)
+            data_type = JSON_TYPES[type_name]
+        except Exception as e:
+            raise MudderyError(ERR.server_error, "The object can not load %s." % data)
+
+        try:
+            if data_type is type(None):
+                value = None
+            elif data_type in {str, int, float, bool, bytes}:
+                value = data_type(json_value)
+            elif data_type in {dict, OrderedDict}:
+                value = data_type((self.decode(key), self.decode(item)) for key, item in json_value.items())
+            else:
+                value = data_type(self.decode(item) for item in json_value)
+        except MudderyError:
+            raise
+        except Exception as e:
+            raise MudderyError(ERR.server_error, "The object can not load %s." % data)
+
+        return value
+
+    def is_current(self, data: str) -> bool:
+        """
+        Check if the data is in this codec's format.
+        """
+        return data is None or data.startswith("[")
+
+
+# Binary data's tags.
+TAG_NONE = 0x00
+TAG_TRUE = 0x01
+TAG_FALSE = 0x02
+TAG_UINT8 = 0x03
+TAG_INT64 = 0x04
+TAG_BIGINT = 0x05
+TAG_FLOAT = 0x06
+TAG_STR = 0x07
+TAG_BYTES = 0x08
+TAG_LIST = 0x09
+TAG_TUPLE = 0x0A
+TAG_SET = 0x0B
+TAG_FROZENSET = 0x0C
+TAG_DICT = 0x0D
+TAG_ORDERED_DICT = 0x0E
+
+INT64 = struct.Struct("<q")
+FLOAT = struct.Struct("<d")
+
+INT64_MIN = -(1 << 63)
+INT64_MAX = (1 << 63) - 1
+
+SEQUENCE_TYPES = {
+    TAG_LIST: list,
+    TAG_TUPLE: tuple,
+    TAG_SET: set,
+    TAG_FROZENSET: frozenset,
+}
+
+
+class BinaryStateCodec(BaseStateCodec):
+    """
+    Pack values in a compact tagged binary format without evaluating type names.
+
+    Every value starts with a one byte tag. Lengths are unsigned varints. The binary data is
+    stored as base64 text with a prefix, so it can be put in string columns. Data without the
+    prefix are legacy JSON data, they are decoded by the JSON codec.
+    """
+    # Legacy JSON data always starts with "[".
+    prefix = "~"
+
+    def __init__(self):
+        self.legacy = JSONStateCodec()
+
+        self.packers = {
+            type(None): self.pack_none,
+            bool: self.pack_bool,
+            int: self.pack_int,
+            float: self.pack_float,
+            str: self.pack_str,
+            bytes: self.pack_bytes,
+            list: self.pack_list,
+            tuple: self.pack_tuple,
+            set: self.pack_set,
+            frozenset: self.pack_frozenset,
+            dict: self.pack_dict,
+            OrderedDict: self.pack_ordered_dict,
+        }
+
+    def encode(self, value) -> str:
+        """
+        Pack a value to a string.
+        """
+        buffer = bytearray()
+        self.pack(buffer, value)
+        return self.prefix + base64.b64encode(buffer).decode("ascii")
+
+    def decode(self, data: str):
+        """
+        Unpack a value from a string.
+        """
+        if data is None:
+            return None
+
+        if not data.startswith(self.prefix):
+            return self.legacy.decode(data)
+
+        try:
+            buffer = base64.b64decode(data[len(self.prefix):])
+            value, pos = self.unpack(buffer, 0)
+        except Exception as e:
+            raise MudderyError(ERR.server_error, "The object can not load %s." % data)
+
+        if pos != len(buffer):
+            raise MudderyError(ERR.server_error, "The object can not load %s." % data)
+
+        return value
+
+    def is_current(self, data: str) -> bool:
+        """
+        Check if the data is in the binary format.
+        """
+        return data is None or data.startswith(self.prefix)
+
+    def pack(self, buffer: bytearray, value) -> None:
+        """
+        Append a value to the buffer.
+        """
+        try:
+            packer = self.packers[type(value)]
+        except KeyError:
+            raise MudderyError(ERR.server_error, "The object can not store %s of %s." % (value, type(value)))
+
+        packer(buffer, value)
+
+    @staticmethod
+    def pack_length(buffer: bytearray, length: int) -> None:
+        while length > 0x7F:
+            buffer.append((length & 0x7F) | 0x80)
+            length >>= 7
+        buffer.append(length)
+
+    @staticmethod
+    def pack_none(buffer: bytearray, value) -> None:
+        buffer.append(TAG_NONE)
+
+    @staticmethod
+    def pack_bool(buffer: bytearray, value: bool) -> None:
+        buffer.append(TAG_TRUE if value else TAG_FALSE)
+
+    def pack_int(self, buffer: bytearray, value: int) -> None:
+        if 0 <= value <= 0xFF:
+            buffer.append(TAG_UINT8)
+            buffer.append(value)
+        elif INT64_MIN <= value <= INT64_MAX:
+            buffer.append(TAG_INT64)
+            buffer += INT64.pack(value)
+        else:
+            data = value.to_bytes((value.bit_length() + 8) // 8, "little", signed=True)
+            buffer.append(TAG_BIGINT)
+            self.pack_length(buffer, len(data))
+            buffer += data
+
+    @staticmethod
+    def pack_float(buffer: bytearray, value: float) -> None:
+        buffer.append(TAG_FLOAT)
+        buffer += FLOAT.pack(value)
+
+    def pack_str(self, buffer: bytearray, value: str) -> None:
+        data = value.encode("utf-8")
+        buffer.append(TAG_STR)
+        self.pack_length(buffer, len(data))
+        buffer += data
+
+    def pack_bytes(self, buffer: bytearray, value: bytes) -> None:
+        buffer.append(TAG_BYTES)
+        self.pack_length(buffer, len(value))
+        buffer += value
+
+    def pack_sequence(self, buffer: bytearray, tag: int, value) -> None:
+        buffer.append(tag)
+        self.pack_length(buffer, len(value))
+        for item in value:
+            self.pack(buffer, item)
+
+    def pack_list(self, buffer: bytearray, value: list) -> None:
+        self.pack_sequence(buffer, TAG_LIST, value)
+
+    def pack_tuple(self, buffer: bytearray, value: tuple) -> None:
+        self.pack_sequence(buffer, TAG_TUPLE, value)
+
+    def pack_set(self, buffer: bytearray, value: set) -> None:
+        self.pack_sequence(buffer, TAG_SET, value)
+
+    def pack_frozenset(self, buffer: bytearray, value: frozenset) -> None:
+        self.pack_sequence(buffer, TAG_FROZENSET, value)
+
+    def pack_mapping(self, buffer: bytearray, tag: int, value: dict) -> None:
+        buffer.append(tag)
+        self.pack_length(buffer, len(value))
+        for key, item in value.items():
+            self.pack(buffer, key)
+            self.pack(buffer, item)
+
+    def pack_dict(self, buffer: bytearray, value: dict) -> None:
+        self.pack_mapping(buffer, TAG_DICT, value)
+
+    def pack_ordered_dict(self, buffer: bytearray, value: OrderedDict) -> None:
+        self.pack_mapping(buffer, TAG_ORDERED_DICT, value)
+
+    @staticmethod
+    def unpack_length(buffer: bytes, pos: int) -> tuple:
+        length = 0
+        shift = 0
+        while True:
+            byte = buffer[pos]
+            pos += 1
+            length |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return length, pos
+            shift += 7
+
+    def unpack(self, buffer: bytes, pos: int) -> tuple:
+        """
+        Read a value from the buffer's position.
+
+        Return:
+            (any, int): the value and the position after the value.
+        """
+        tag = buffer[pos]
+        pos += 1
+
+        if tag == TAG_UINT8:
+            return buffer[pos], pos + 1
+        elif tag == TAG_STR:
+            length, pos = self.unpack_length(buffer, pos)
+            end = pos + length
+            return buffer[pos:end].decode("utf-8"), end
+        elif tag == TAG_INT64:
+            return INT64.unpack_from(buffer, pos)[0], pos + 8
+        elif tag == TAG_FLOAT:
+            return FLOAT.unpack_from(buffer, pos)[0], pos + 8
+        elif tag == TAG_NONE:
+            return None, pos
+        elif tag == TAG_TRUE:
+            return True, pos
+        elif tag == TAG_FALSE:
+            return False, pos
+        elif tag == TAG_DICT or tag == TAG_ORDERED_DICT:
+            length, pos = self.unpack_length(buffer, pos)
+            value = {} if tag == TAG_DICT else OrderedDict()
+            for i in range(length):
+                key, pos = self.unpack(buffer, pos)
+                value[key], pos = self.unpack(buffer, pos)
+            return value, pos
+        elif tag in SEQUENCE_TYPES:
+            length, pos = self.unpack_length(buffer, pos)
+            items = []
+            for i in range(length):
+                item, pos = self.unpack(buffer, pos)
+                items.append(item)
+            return SEQUENCE_TYPES[tag](items) if tag != TAG_LIST else items, pos
+        elif tag == TAG_BYTES:
+            length, pos = self.unpack_length(buffer, pos)
+            end = pos + length
+            return bytes(buffer[pos:end]), end
+        elif tag == TAG_BIGINT:
+            length, pos = self.unpack_length(buffer, pos)
+            end = pos + length
+            return int.from_bytes(buffer[pos:end], "little", signed=True), end
+        else:
+            raise ValueError("Unknown tag %s." % tag)
@@ -1,6 +1,6 @@
 
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy import Column, Integer, String, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text
 from sqlalchemy import UniqueConstraint
 Base = declarative_base()
 
@@ -74,6 +74,22 @@ class character_states(BaseObjectStates):
     __tablename__ = "character_states"
 
 
+class character_state_blobs(BaseModel):
+    """
+    Player character's all runtime attributes in one record.
+    """
+    __tablename__ = "character_state_blobs"
+
+    # character's id
+    obj_id = Column(Integer, unique=True, nullable=False)
+
+    # the record's version, increase on every change
+    version = Column(Integer, nullable=False)
+
+    # packed attributes
+    data = Column(Text)
+
+
 # ------------------------------------------------------------
 #
 # server bans
@@ -0,0 +1,494 @@
+"""
+Key value storage in relational database, using asyncio database drivers.
+"""
+
+from contextvars import ContextVar
+from contextlib import asynccontextmanager
+from sqlalchemy.orm.exc import NoResultFound
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy import select, update, insert, delete
+from sqlalchemy import func
+from muddery.server.database.storage.table_kv_storage import TableKVStorage, LOAD_ALL_BATCH_SIZE
+
+
+# The session of the current task's database transaction: (session maker, session)
+current_session = ContextVar("current_session", default=None)
+
+
+class AsyncTableKVStorage(TableKVStorage):
+    """
+    The storage of object attributes. Queries do not block the event loop.
+
+    AsyncSession can not be shared between coroutines, so every operation uses its own
+    session and commits when it finishes, unless it is in a task's database transaction.
+    """
+    require_async_engine = True
+
+    def __init__(self,
+                 session_maker: any,
+                 model_path: str,
+                 model_name: str,
+                 category_field: str,
+                 key_field: str,
+                 default_value_field: str = None):
+        """
+        :param session_maker: the factory of AsyncSession
+        :param model_name: table's model
+        :param category_field: category's field name in the table
+        :param key_field: key's field name in the table
+        :param default_value_field: default value's field name in the table.
+                If set the default value field, it can only store a simple value.
+                If the default value field is not set, value should be a dict.
+        """
+        super(AsyncTableKVStorage, self).__init__(
+            None,
+            model_path,
+            model_name,
+            category_field,
+            key_field,
+            default_value_field
+        )
+
+        self.session_maker = session_maker
+
+    @asynccontextmanager
+    async def session_scope(self):
+        """
+        Get a new session in a transaction, or the session of the current database transaction.
+        """
+        current = current_session.get()
+        if current is not None and current[0] is self.session_maker:
+            yield current[1]
+            return
+
+        async with self.session_maker() as session:
+            async with session.begin():
+                yield session
+
+    @asynccontextmanager
+    async def db_transaction(self):
+        """
+        Run database operations of a block in one database transaction. Operations of all
+        tables in the same database in the block share the session.
+        """
+        current = current_session.get()
+        if current is not None and current[0] is self.session_maker:
+            yield
+            return
+
+        async with self.session_maker() as session:
+            async with session.begin():
+                token = current_session.set((self.session_maker, session))
+                try:
+                    yield
+                finally:
+                    current_session.reset(token)
+
+    def get_database(self):
+        """
+        Get the database engine of the storage.
+        """
+        return self.session_maker.kw.get("bind")
+
+    async def add(self, category, key, value=None):
+        """
+        Add a new attribute. If the key already exists, raise an exception.
+
+        Args:
+            category: (string) the category of data.
+            key: (string) the key.
+            value: (any) data.
+        """
+        if value is None:
+            data = {}
+        elif self.default_value_field is None:
+            data = value
+        else:
+            data = {self.default_value_field: value}
+
+        if self.category_field:
+            data[self.category_field] = category
+
+        if self.key_field:
+            data[self.key_field] = key
+
+        async with self.session_scope() as session:
+            session.add(self.model(**data))
+
+    async def save(self, category, key, value=None):
+        """
+        Set a value to the default value field.
+
+        Args:
+            category: (string) the category of data.
+            key: (string) the key.
+            value: (any) data.
+        """
+        if value is None:
+            data = {}
+        elif self.default_value_field is None:
+            data = value
+        else:
+            data = {self.default_value_field: value}
+
+        row = self.upsert_row(category, key, data)
+
+        stmt = update(self.model).values(**data)
+
+        if self.category_field:
+            stmt = stmt.where(getattr(self.model, self.category_field) == category)
+
+        if self.key_field:
+            stmt = stmt.where(getattr(self.model, self.key_field) == key)
+
+        async with self.session_scope() as session:
+            upsert = self.upsert_stmt(session.bind.dialect.name, row)
+            if upsert is not None:
+                await session.execute(upsert, row)
+                return
+
+            result = await session.execute(stmt)
+            if result.rowcount == 0:
+                # no matched rows
+                if self.category_field:
+                    data[self.category_field] = category
+
+                if self.key_field:
+                    data[self.key_field] = key
+
+                session.add(self.model(**data))
+
+    async def has(self, category: str, key: str, check_category: bool = False) -> bool:
+        """
+        Check if the key exists.
+
+        Args:
+            category: the category of data.
+            key: attribute's key.
+            check_category: if check_category is True and does not has the category, it will raise a KeyError.
+        """
+        stmt = select(func.count()).select_from(self.model)
+
+        if self.category_field:
+            stmt = stmt.where(getattr(self.model, self.category_field) == category)
+
+        if self.key_field:
+            stmt = stmt.where(getattr(self.model, self.key_field) == key)
+
+        async with self.session_scope() as session:
+            result = await session.execute(stmt)
+            count = result.scalars().one()
+            if count > 0:
+                return True
+
+            if not check_category:
+                return False
+
+            # Check if the category exists.
+            if not self.category_field:
+                return False
+
+            stmt = select(func.count()).select_from(self.model).where(getattr(self.model, self.category_field) == category)
+            result = await session.execute(stmt)
+            count = result.scalars().one()
+
+        if count > 0:
+            return False
+        else:
+            raise KeyError
+
+    async def load(self, category, key, *default, for_update=False):
+        """
+        Get the default field value of a key.
+
+        Args:
+            category: (string) the category of data.
+            key: (string) data's key.
+            default: (any or none) default value.
+
+        Raises:
+            KeyError: If `raise_exception` is set and no matching Attribute
+                was found matching `key` and no default value set.
+        """
+        stmt = self.select_rows()
+
+        if for_update:
+            stmt = stmt.with_for_update()
+
+        if self.category_field:
+            stmt = stmt.where(getattr(self.model, self.category_field) == category)
+
+        if self.key_field:
+            stmt = stmt.where(getattr(self.model, self.key_field) == key)
+
+        async with self.session_scope() as session:
+            result = await session.execute(stmt)
+
+            try:
+                row = result.one()
+            except NoResultFound:
+                if len(default) > 0:
+                    return default[0]
+                else:
+                    raise KeyError
+
+        return self.row_value(row)
+
+    async def delete(self, category, key):
+        """
+        delete a key.
+
+        Args:
+            category: (string) the category of data.
+            key: (string) attribute's key.
+        """
+        stmt = delete(self.model)
+
+        if self.category_field:
+            stmt = stmt.where(getattr(self.model, self.category_field) == category)
+
+        if self.key_field:
+            stmt = stmt.where(getattr(self.model, self.key_field) == key)
+
+        async with self.session_scope() as session:
+            await session.execute(stmt)
+
+    async def set_all(self, all_data: dict) -> None:
+        """
+        Set all data to the storage.
+        """
+        async with self.session_scope() as session:
+            # remove old data
+            stmt = delete(self.model)
+            await session.execute(stmt)
+
+            for cate_name, cate_data in all_data.items():
+                for key_name, key_data in cate_data.items():
+                    data = key_data
+                    if self.category_field:
+                        data[self.category_field] = cate_name
+                    if self.key_field:
+                        data[self.key_field] = key_name
+
+                    session.add(self.model(**data))
+
+    async def load_all(self) -> dict:
+        """
+        Get all data.
+        :return:
+        """
+        stmt = self.select_rows().execution_options(yield_per=LOAD_ALL_BATCH_SIZE)
+        async with self.session_scope() as session:
+            result = await session.stream(stmt)
+            all_data = {}
+            async for partition in result.partitions():
+                # Rows of a partition are released after being grouped.
+                self.values_to_categories(partition, all_data)
+
+        return self.categories_to_all_data(all_data)
+
+    async def set_category(self, category: str, data: dict) -> None:
+        """
+        Set a category of data.
+        """
+        async with self.session_scope() as session:
+            # remove old data
+            stmt = delete(self.model)
+            if self.category_field:
+                stmt = stmt.where(getattr(self.model, self.category_field) == category)
+            await session.execute(stmt)
+
+            for key_name, key_data in data.items():
+                record_data = key_data
+                if self.category_field:
+                    record_data[self.category_field] = category
+                if self.key_field:
+                    record_data[self.key_field] = key_name
+
+                session.add(self.model(**record_data))
+
+    async def has_category(self, category: str) -> bool:
+        """
+        Check if the category exists.
+        """
+        stmt = select(func.count()).select_from(self.model)
+
+        if self.category_field:
+            stmt = stmt.where(getattr(self.model, self.category_field) == category)
+
+        async with self.session_scope() as session:
+            result = await session.execute(stmt)
+            record = result.scalars().one()
+
+        return record > 0
+
+    async def load_category(self, category, *default):
+        """
+        Get all default field's values of a category.
+
+        Args:
+            category: (string) category's name.
+        """
+        stmt = self.select_rows()
+
+        if self.category_field:
+            stmt = stmt.where(getattr(self.model, self.category_field) == category)
+
+        async with self.session_scope() as session:
+            result = await session.execute(stmt)
+            data = {self.row_key(row): self.row_value(row) for row in result}
+
+        if len(data) == 0:
+            if len(default) > 0:
+                return default[0]
+            else:
+                raise KeyError
+
+        return data
+
+    async def delete_category(self, category):
+        """
+        Remove all values of a category.
+
+        Args:
+            category: (string) the category of data.
+        """
+        stmt = delete(self.model)
+
+        if self.category_field:
+            stmt = stmt.where(getattr(self.model, self.category_field) == category)
+
+        async with self.session_scope() as session:
+            await session.execute(stmt)
+
+    async def load_many(self, category: str, keys: list, check_category: bool = False) -> dict:
+        """
+        Get values of keys in a category.
+
+        Args:
+            category: (string) the category of data.
+            keys: (list) data's keys.
+            check_category: if check_category is True and does not has the category, it will raise a KeyError.
+        """
+        data = {}
+        async with self.session_scope() as session:
+            for stmt in self.load_many_stmts(category, keys):
+                result = await session.execute(stmt)
+                for row in result:
+                    data[self.row_key(row)] = self.row_value(row)
+
+        if not data and check_category and not await self.has_category(category):
+            raise KeyError
+
+        return data
+
+    async def save_many(self, category: str, values: dict) -> None:
+        """
+        Set values of a category's keys.
+
+        Args:
+            category: (string) the category of data.
+            values: (dict) {key: value}
+        """
+        if not values:
+            return
+
+        async with self.session_scope() as session:
+            upserts, values = self.upsert_many_params(session.bind.dialect.name, category, values)
+            for stmt, rows in upserts:
+                await session.execute(stmt, rows)
+
+            if not values:
+                return
+
+            exist_keys = set()
+            if self.key_field:
+                for stmt in self.load_many_stmts(category, values.keys()):
+                    stmt = stmt.with_only_columns([getattr(self.model, self.key_field)])
+                    result = await session.execute(stmt)
+                    exist_keys.update(result.scalars())
+            else:
+                stmt = select(func.count()).select_from(self.model)
+                if self.category_field:
+                    stmt = stmt.where(getattr(self.model, self.category_field) == category)
+                result = await session.execute(stmt)
+                if result.scalars().one() > 0:
+                    exist_keys.add("")
+
+            updates, inserts = self.save_many_params(category, values, exist_keys)
+            for stmt, params in updates:
+                await session.execute(stmt, params)
+
+            for params in inserts:
+                await session.execute(insert(self.model.__table__), params)
+
+    async def compare_and_save(self, category: str, key: str, value: any, field: str, expected: any) -> bool:
+        """
+        Save the value only if the record's field still has the expected value.
+
+        Args:
+            category: (string) the category of data.
+            key: (string) the key.
+            value: (any) data.
+            field: (string) the field to compare.
+            expected: (any) the expected value of the field. If it is None, only add the value when
+                the key does not exist.
+
+        Return:
+            (bool): if the value is saved.
+        """
+        try:
+            async with self.session_scope() as session:
+                stmt = self.compare_and_save_stmt(session.bind.dialect.name, category, key, value, field, expected)
+                result = await session.execute(stmt)
+        except IntegrityError:
+            # the key already exists
+            return False
+        return result.rowcount > 0
+
+    async def delete_many(self, category: str, keys: list) -> None:
+        """
+        Delete keys of a category.
+
+        Args:
+            category: (string) the category of data.
+            keys: (list) data's keys.
+        """
+        async with self.session_scope() as session:
+            for stmt in self.delete_many_stmts(category, keys):
+                await session.execute(stmt)
+
+    async def delete_categories(self, categories: list) -> None:
+        """
+        Remove all values of categories.
+
+        Args:
+            categories: (list) categories' names.
+        """
+        async with self.session_scope() as session:
+            for stmt in self.delete_categories_stmts(categories):
+                await session.execute(stmt)
+
+    async def load_categories(self, categories: list) -> dict:
+        """
+        Get all data of categories.
+
+        Args:
+            categories: (list) categories' names.
+        """
+        all_data = {}
+        async with self.session_scope() as session:
+            for stmt in self.load_categories_stmts(categories):
+                result = await session.execute(stmt)
+                all_data.update(self.values_to_categories(result))
+        return all_data
+
+    def transaction_enter(self) -> None:
+        # Every operation commits in its own session.
+        pass
+
+    def transaction_success(self, exc_type, exc_value, trace) -> None:
+        pass
+
+    def transaction_failed(self, exc_type, exc_value, trace) -> None:
+        pass
@@ -2,7 +2,7 @@
 The base class of key value storage.
 """
 
-from asyncio import Lock
+from contextlib import asynccontextmanager
 from muddery.server.database.storage.transaction import Transaction
 
 
@@ -10,8 +10,11 @@ class BaseKeyValueStorage(object):
     """
     The storage of key-values.
     """
+    # Use the database's asyncio engine.
+    require_async_engine = False
+
     def __init__(self):
-        self.lock = Lock()
+        pass
 
     async def add(self, category: str, key: str, value: any = None) -> None:
         """
@@ -61,6 +64,69 @@ class BaseKeyValueStorage(object):
         """
         pass
 
+    async def load_many(self, category: str, keys: list, check_category: bool = False) -> dict:
+        """
+        Get values of keys in a category.
+
+        Args:
+            category: (string, int) the category of data.
+            keys: (list) data's keys.
+            check_category: if check_category is True and does not has the category, it will raise a KeyError.
+
+        Return:
+            (dict): {key: value}, keys not found are omitted.
+        """
+        pass
+
+    async def save_many(self, category: str, values: dict) -> None:
+        """
+        Set values of a category's keys.
+
+        Args:
+            category: (string, int) the category of data.
+            values: (dict) {key: value}
+        """
+        pass
+
+    async def compare_and_save(self, category: str, key: str, value: any, field: str, expected: any) -> bool:
+        """
+        Save the value only if the record's field still has the expected value.
+
+        Args:
+            category: (string, int) the category of data.
+            key: (string) attribute's key.
+            value: (any) attribute's value.
+            field: (string) the field to compare.
+            expected: (any) the expected value of the field. If it is None, only add the value when
+                the key does not exist.
+
+        Return:
+            (bool): if the value is saved.
+        """
+        pass
+
+    async def delete_many(self, category: str, keys: list) -> None:
+        """
+        Delete keys of a category.
+
+        Args:
+            category: (string, int) the category of data.
+            keys: (list) data's keys.
+        """
+        pass
+
+    async def load_categories(self, categories: list) -> dict:
+        """
+        Get all data of categories.
+
+        Args:
+            categories: (list) categories' names.
+
+        Return:
+            (dict): {category: {key: value}}, categories not found are omitted.
+        """
+        pass
+
     async def set_all(self, all_data: dict) -> None:
         """
         Set all data to cache.
@@ -114,11 +180,56 @@ class BaseKeyValueStorage(object):
         """
         pass
 
-    def transaction(self) -> Transaction:
+    async def delete_categories(self, categories: list) -> None:
+        """
+        Remove all values of categories.
+
+        Args:
+            categories: (list) categories' names.
+        """
+        pass
+
+    def pin(self, category: str) -> None:
+        """
+        Keep a category in the cache, it will not be evicted until unpinned.
+
+        Args:
+            category: (string) the category of data.
+        """
+        pass
+
+    def unpin(self, category: str) -> None:
+        """
+        Release a pin of the category.
+
+        Args:
+            category: (string) the category of data.
+        """
+        pass
+
+    def transaction(self, write_through: bool = False) -> Transaction:
         """
         Guarantee the transaction execution of a given block.
+
+        :param write_through: write changes of write-behind storages to the database in the same
+            database transaction.
+        """
+        return Transaction(self, write_through)
+
+    @asynccontextmanager
+    async def db_transaction(self):
+        """
+        Run database operations of a block in one database transaction. Storages without
+        database transactions do nothing.
+        """
+        yield
+
+    def get_database(self):
+        """
+        Get the database of the storage, storages in the same database can write in one database
+        transaction. Return None if the storage does not have database transactions.
         """
-        return Transaction(self)
+        return None
 
     def transaction_enter(self) -> None:
         pass
@@ -0,0 +1,588 @@
+"""
+Key value storage which packs all values of a category in one versioned record.
+"""
+
+from contextlib import nullcontext
+from sqlalchemy.orm.exc import StaleDataError
+from muddery.server.database.storage.base_kv_storage import BaseKeyValueStorage
+from muddery.server.database.storage.category_lock import CategoryLock
+from muddery.server.database.storage.transaction import get_transaction, DELETED, UNCHANGED
+from muddery.common.utils.exception import MudderyError, ERR
+
+
+class BlobKVStorage(BaseKeyValueStorage):
+    """
+    Store a category's all key-values in one record as a blob, so loading or saving a category
+    only takes one query.
+
+    Records have version numbers. A record is only written when its version has not been
+    changed since it was read, otherwise the category is reloaded and the change is applied
+    again. This allows several processes to write the same table safely.
+
+    Pinned categories are kept in memory. Changes of them made by other processes are found
+    when writing them next time.
+
+    Writes in a task's transaction are kept in the transaction and written when it commits, the
+    same as StorageWithCache. Values are packed by the codec only once, with the whole blob.
+    """
+    # The number of times to retry a change when the record has been changed by others.
+    max_retries = 3
+
+    # Write changes to the database at once.
+    write_behind = False
+
+    # Values are packed with the blob, object storages need not pack them again.
+    packs_values = True
+
+    def __init__(self, storage, codec, version_field="version", data_field="data"):
+        """
+        :param storage: the storage of blob records, it should have a category field but no key field.
+        :param codec: the codec to pack a category's data to a string.
+        :param version_field: the record's version field.
+        :param data_field: the record's data field.
+        """
+        super(BlobKVStorage, self).__init__()
+
+        self.storage = storage
+        self.codec = codec
+        self.version_field = version_field
+        self.data_field = data_field
+
+        # Data of pinned categories.
+        # {category: (version, data)}
+        self.blobs = {}
+
+        # {category: the number of pins}
+        self.pins = {}
+
+        # Lock each category separately.
+        self.locks = CategoryLock()
+
+        # Categories changed in the current synchronous transaction.
+        self.trans_categories = None
+
+        # Blobs written by a committing task transaction, they are kept after the database
+        # commits. {category: (version, data)}
+        self.committing = {}
+
+    def unpack(self, record: dict) -> tuple:
+        """
+        Get the version and data of a record.
+        """
+        data = self.codec.decode(record[self.data_field])
+        return record[self.version_field], data if data is not None else {}
+
+    async def read(self, category: str) -> tuple:
+        """
+        Get a category's committed version and data. The version is 0 if the category does not
+        exist.
+        """
+        try:
+            return self.blobs[category]
+        except KeyError:
+            pass
+
+        record = await self.storage.load(category, "", None)
+        blob = self.unpack(record) if record else (0, {})
+
+        if category in self.pins:
+            self.blobs[category] = blob
+
+        return blob
+
+    async def read_data(self, category: str) -> tuple:
+        """
+        Get a category's data with changes of the current transaction.
+
+        Return:
+            (boolean, dict): whether the category exists, the category's data
+        """
+        changes = self.get_changes(category)
+        if changes is not None and changes.cleared:
+            data = changes.apply({})
+            return len(data) > 0, data
+
+        async with self.lock_category(category):
+            version, data = await self.read(category)
+
+        if changes is not None:
+            data = changes.apply(data)
+            return version > 0 or len(data) > 0, data
+
+        return version > 0, data
+
+    async def write(self, category: str, change, blob: tuple = None) -> tuple:
+        """
+        Apply a change to a category's data and save it. The caller must hold the category's lock.
+
+        Args:
+            category: (string) the category of data.
+            change: (callable) a function to modify the category's data dict.
+            blob: (tuple) the version and data to change, read the category if it is None.
+
+        Return:
+            (tuple): the new version and data.
+        """
+        for i in range(self.max_retries + 1):
+            if blob is None:
+                version, data = await self.read(category)
+            else:
+                version, data = blob
+                blob = None
+            data = dict(data)
+            change(data)
+
+            new_version = version + 1
+            record = {
+                self.version_field: new_version,
+                self.data_field: self.codec.encode(data),
+            }
+            saved = await self.storage.compare_and_save(
+                category,
+                "",
+                record,
+                self.version_field,
+                version if version > 0 else None
+            )
+
+            if saved:
+                return new_version, data
+
+            # The record has been changed, reload it.
+            self.blobs.pop(category, None)
+
+        raise StaleDataError("Can not save the data of %s, it has been changed." % category)
+
+    async def write_now(self, operation: str, category: str, *args) -> None:
+        """
+        Write a change to the database out of task transactions.
+        """
+        async with self.lock_category(category):
+            blob = await self.write(category, self.get_change(operation, *args))
+            if category in self.pins:
+                self.blobs[category] = blob
+            if self.trans_categories is not None:
+                self.trans_categories.add(category)
+
+    @staticmethod
+    def get_change(operation: str, *args):
+        """
+        Get the function to modify a category's data dict of an operation.
+        """
+        if operation == "add":
+            key, value = args
+            def change(data):
+                if key in data:
+                    raise MudderyError(ERR.duplicate_key, "Duplicate key %s." % key)
+                data[key] = value
+        elif operation == "save":
+            key, value = args
+            def change(data):
+                data[key] = value
+        elif operation == "save_many":
+            values = args[0]
+            def change(data):
+                data.update(values)
+        elif operation == "delete_many":
+            keys = args[0]
+            def change(data):
+                for key in keys:
+                    data.pop(key, None)
+        elif operation == "set_category":
+            values = args[0]
+            def change(data):
+                data.clear()
+                data.update(values)
+        else:
+            raise MudderyError(ERR.server_error, "Unknown operation %s." % operation)
+
+        return change
+
+    async def add(self, category, key, value=None):
+        """
+        Add a new attribute. If the key already exists, raise an exception.
+
+        Args:
+            category: (string) the category of data.
+            key: (string) the key.
+            value: (any) data.
+        """
+        trans = get_transaction()
+        if trans:
+            exists, data = await self.read_data(category)
+            if key in data:
+                raise MudderyError(ERR.duplicate_key, "Duplicate key %s." % key)
+            trans.set_value(self, category, key, value)
+            trans.add_write(self, "add", category, key, value)
+            return
+
+        await self.write_now("add", category, key, value)
+
+    async def save(self, category, key, value=None):
+        """
+        Set a value.
+
+        Args:
+            category: (string) the category of data.
+            key: (string) the key.
+            value: (any) data.
+        """
+        trans = get_transaction()
+        if trans:
+            trans.set_value(self, category, key, value)
+            trans.add_write(self, "save", category, key, value)
+            return
+
+        await self.write_now("save", category, key, value)
+
+    async def save_many(self, category: str, values: dict) -> None:
+        """
+        Set values of a category's keys.
+
+        Args:
+            category: (string) the category of data.
+            values: (dict) {key: value}
+        """
+        if not values:
+            return
+
+        values = dict(values)
+        trans = get_transaction()
+        if trans:
+            for key, value in values.items():
+                trans.set_value(self, category, key, value)
+            trans.add_write(self, "save_many", category, values)
+            return
+
+        await self.write_now("save_many", category, values)
+
+    async def has(self, category: str, key: str, check_category: bool = False) -> bool:
+        """
+        Check if the key exists.
+
+        Args:
+            category: (string) the category of data.
+            key: (string) attribute's key.
+            check_category: if check_category is True and does not has the category, it will raise a KeyError.
+        """
+        exists, data = await self.read_data(category)
+        if key in data:
+            return True
+
+        if check_category and not exists:
+            raise KeyError
+
+        return False
+
+    async def load(self, category, key, *default, for_update=False):
+        """
+        Get the value of a key.
+
+        Args:
+            category: (string) the category of data.
+            key: (string) data's key.
+            default: (any or none) default value.
+            for_update: (bool) in a transaction, lock the category until the transaction finishes.
+        """
+        if for_update:
+            trans = get_transaction()
+            if trans:
+                await trans.lock(self, category)
+
+        changes = self.get_changes(category)
+        if changes is not None:
+            value = changes.get(key)
+            if value is not UNCHANGED:
+                if value is not DELETED:
+                    return value
+                elif len(default) > 0:
+                    return default[0]
+                raise KeyError(key)
+
+        async with self.lock_category(category):
+            version, data = await self.read(category)
+
+        try:
+            return data[key]
+        except KeyError:
+            if len(default) > 0:
+                return default[0]
+            raise
+
+    async def load_many(self, category: str, keys: list, check_category: bool = False) -> dict:
+        """
+        Get values of keys in a category.
+
+        Args:
+            category: (string) the category of data.
+            keys: (list) data's keys.
+            check_category: if check_category is True and does not has the category, it will raise a KeyError.
+        """
+        exists, data = await self.read_data(category)
+        if check_category and not exists:
+            raise KeyError
+
+        return {key: data[key] for key in keys if key in data}
+
+    async def delete(self, category, key):
+        """
+        Delete a key.
+
+        Args:
+            category: (string) the category of data.
+            key: (string) attribute's key.
+        """
+        await self.delete_many(category, [key])
+
+    async def delete_many(self, category: str, keys: list) -> None:
+        """
+        Delete keys of a category.
+
+        Args:
+            category: (string) the category of data.
+            keys: (list) data's keys.
+        """
+        keys = list(keys)
+        trans = get_transaction()
+        if trans:
+            for key in keys:
+                trans.set_value(self, category, key, DELETED)
+            trans.add_write(self, "delete_many", category, keys)
+            return
+
+        exists, data = await self.read_data(category)
+        if not any(key in data for key in keys):
+            return
+
+        await self.write_now("delete_many", category, keys)
+
+    async def set_all(self, all_data: dict) -> None:
+        """
+        Set all data.
+        """
+        await self.storage.set_all({
+            category: {
+                "": {
+                    self.version_field: 1,
+                    self.data_field: self.codec.encode(data),
+                }
+            } for category, data in all_data.items()
+        })
+        self.blobs = {}
+
+    async def load_all(self) -> dict:
+        """
+        Get all data.
+        """
+        records = await self.storage.load_all()
+        all_data = {category: self.unpack(data[""])[1] for category, data in records.items()}
+
+        trans = get_transaction()
+        if trans:
+            for (storage_id, category), (storage, changes) in trans.changes.items():
+                if storage is self:
+                    all_data[category] = changes.apply(all_data.get(category, {}))
+
+        return all_data
+
+    async def set_category(self, category: str, data: dict) -> None:
+        """
+        Set a category of data.
+        """
+        data = dict(data)
+        trans = get_transaction()
+        if trans:
+            trans.clear_category(self, category)
+            for key, value in data.items():
+                trans.set_value(self, category, key, value)
+            trans.add_write(self, "set_category", category, data)
+            return
+
+        await self.write_now("set_category", category, data)
+
+    async def has_category(self, category: str) -> bool:
+        """
+        Check if the category exists.
+        """
+        exists, data = await self.read_data(category)
+        return exists
+
+    async def load_category(self, category, *default):
+        """
+        Get all values of a category.
+
+        Args:
+            category: (string) category's name.
+        """
+        exists, data = await self.read_data(category)
+        if not exists:
+            if len(default) > 0:
+                return default[0]
+            raise KeyError
+
+        return dict(data)
+
+    async def load_categories(self, categories: list) -> dict:
+        """
+        Get all data of categories.
+
+        Args:
+            categories: (list) categories' names.
+        """
+        all_data = {}
+        to_load = []
+        for category in categories:
+            if category in self.blobs:
+                all_data[category] = dict(self.blobs[category][1])
+            else:
+                to_load.append(category)
+
+        if to_load:
+            records = await self.storage.load_categories(to_load)
+            for category, data in records.items():
+                blob = self.unpack(data[""])
+                if category in self.pins:
+                    self.blobs[category] = blob
+                all_data[category] = dict(blob[1])
+
+        trans = get_transaction()
+        if trans:
+            for category in categories:
+                changes = trans.get_changes(self, category)
+                if changes is not None:
+                    all_data[category] = changes.apply(all_data.get(category, {}))
+
+        return all_data
+
+    async def delete_category(self, category):
+        """
+        Remove all values of a category.
+
+        Args:
+            category: (string) the category of data.
+        """
+        await self.delete_categories([category])
+
+    async def delete_categories(self, categories: list) -> None:
+        """
+        Remove all values of categories.
+
+        Args:
+            categories: (list) categories' names.
+        """
+        categories = list(categories)
+        if not categories:
+            return
+
+        trans = get_transaction()
+        if trans:
+            for category in categories:
+                trans.clear_category(self, category)
+            trans.add_write(self, "delete_categories", categories)
+            return
+
+        await self.storage.delete_categories(categories)
+        for category in categories:
+            self.blobs.pop(category, None)
+            if self.trans_categories is not None:
+                self.trans_categories.add(category)
+
+    def lock_category(self, category: str):
+        """
+        Lock a category. Categories locked by the current task's transaction are not locked again.
+        """
+        context = get_transaction()
+        if context is not None and context.has_lock(self, category):
+            return nullcontext()
+        return self.locks.category(category)
+
+    def get_changes(self, category: str):
+        """
+        Get the current transaction's changes of the category, return None if there is no change.
+        """
+        trans = get_transaction()
+        if trans:
+            return trans.get_changes(self, category)
+        return None
+
+    async def apply_write(self, operation: str, category: str, *args) -> None:
+        """
+        Write a change of a committing transaction to the database. The transaction holds the
+        category's lock. Written blobs are kept after the database commits.
+        """
+        if operation == "delete_categories":
+            # The category is a list of categories.
+            await self.storage.delete_categories(category)
+            for item in category:
+                self.blobs.pop(item, None)
+                self.committing[item] = (0, {})
+            return
+
+        # Continue from the blob written by the same transaction.
+        blob = self.committing.pop(category, None)
+        self.blobs.pop(category, None)
+        self.committing[category] = await self.write(category, self.get_change(operation, *args), blob)
+
+    async def commit_changes(self, category: str, changes) -> None:
+        """
+        Keep blobs of pinned categories after the transaction has been committed. The caller must
+        hold the category's lock.
+        """
+        try:
+            blob = self.committing.pop(category)
+        except KeyError:
+            return
+
+        if category in self.pins and blob[0] > 0:
+            self.blobs[category] = blob
+
+    async def sync_journal(self) -> None:
+        """
+        Blob storages have no journals.
+        """
+        pass
+
+    def pin(self, category: str) -> None:
+        """
+        Keep a category's data in memory until it is unpinned.
+        """
+        self.pins[category] = self.pins.get(category, 0) + 1
+
+    def unpin(self, category: str) -> None:
+        """
+        Release a pin of the category.
+        """
+        try:
+            self.pins[category] -= 1
+            if self.pins[category] <= 0:
+                del self.pins[category]
+                self.blobs.pop(category, None)
+        except KeyError:
+            pass
+
+    def db_transaction(self):
+        """
+        Run database operations of a block in the record storage's database transaction.
+        """
+        return self.storage.db_transaction()
+
+    def get_database(self):
+        """
+        Get the database of the record storage.
+        """
+        return self.storage.get_database()
+
+    def transaction_enter(self) -> None:
+        self.trans_categories = set()
+        self.storage.transaction_enter()
+
+    def transaction_success(self, exc_type, exc_value, trace) -> None:
+        self.trans_categories = None
+        self.storage.transaction_success(exc_type, exc_value, trace)
+
+    def transaction_failed(self, exc_type, exc_value, trace) -> None:
+        # Changes have been rolled back, reload them next time.
+        for category in self.trans_categories:
+            self.blobs.pop(category, None)
+        self.trans_categories = None
+        self.storage.transaction_failed(exc_type, exc_value, trace)
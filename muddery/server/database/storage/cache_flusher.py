@@ -0,0 +1,112 @@
+"""
+Flush write-behind caches to the database.
+"""
+
+import weakref
+import pytz
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from muddery.common.utils.singleton import Singleton
+from muddery.server.utils.logger import logger
+
+
+class CacheFlusher(Singleton):
+    """
+    Keep all write-behind storages and flush them at a regular interval.
+    """
+    def __init__(self):
+        self.storages = weakref.WeakSet()
+        self.scheduler = None
+        self.key = "CACHE_FLUSHER"
+
+        # The journal of write-behind changes.
+        self.journal = None
+
+    def open_journal(self, journal):
+        """
+        Record changes of all write-behind storages in the journal. It should be set before
+        creating storages.
+
+        :param journal: (WriteJournal) the journal.
+        """
+        self.journal = journal
+
+    def add(self, storage):
+        """
+        Add a storage to flush.
+
+        :param storage: (StorageWithCache) a write-behind storage.
+        """
+        self.storages.add(storage)
+
+    def start(self, interval):
+        """
+        Flush all storages every interval seconds.
+
+        :param interval: (number) seconds between two flushes.
+        """
+        if self.scheduler or not interval:
+            return
+
+        self.scheduler = AsyncIOScheduler(timezone=pytz.utc)
+        self.scheduler.add_job(self.flush_all, "interval", seconds=interval, id=self.key)
+        self.scheduler.start()
+
+    async def stop(self):
+        """
+        Stop the timer and flush all remaining changes.
+        """
+        if self.scheduler:
+            self.scheduler.shutdown(wait=False)
+            self.scheduler = None
+
+        await self.flush_all()
+
+        if self.journal:
+            await self.journal.close()
+
+    async def flush_all(self):
+        """
+        Write all dirty data to the database.
+        """
+        # Changes after this point are written to a new journal segment.
+        segment = self.journal.rotate() if self.journal else None
+
+        success = True
+        for storage in list(self.storages):
+            if not storage.has_dirty():
+                continue
+
+            try:
+                await storage.flush()
+            except Exception as e:
+                # The storage keeps its dirty data, try to flush it next time.
+                logger.log_err("Can not flush %s: %s" % (storage, e))
+                success = False
+
+        if self.journal and success:
+            # All changes in old segments are in the database now.
+            await self.journal.checkpoint(segment)
+
+    async def recover(self):
+        """
+        Write changes left in the journal by the last run to the database. It should be called
+        after creating storages and before loading data.
+        """
+        if not self.journal or not self.journal.old_segments:
+            return
+
+        storages = {storage.name: storage for storage in self.storages}
+        count = 0
+        for name, operation, category, args in self.journal.read(self.journal.old_segments):
+            try:
+                storage = storages[name]
+            except KeyError:
+                logger.log_err("Can not recover changes of %s, the storage does not exist." % name)
+                continue
+
+            await storage.replay(operation, category, *args)
+            count += 1
+
+        self.journal.remove(self.journal.old_segments)
+        self.journal.old_segments = []
+        logger.log_info("Recovered %s changes from the journal." % count)
@@ -0,0 +1,81 @@
+"""
+Locks of a key value storage's categories.
+"""
+
+import time
+from asyncio import Lock, Event
+from contextlib import asynccontextmanager
+
+
+class CategoryLock(object):
+    """
+    Lock categories separately, so operations on different categories can run at the same time.
+    Locking the whole table waits until all categories are released.
+    """
+    def __init__(self, metrics=None):
+        """
+        :param metrics: (StorageMetrics) record the time waiting for locks if it is set.
+        """
+        self.metrics = metrics
+
+        # Category's locks, they are removed when no one uses them.
+        # {category: [lock, number of users]}
+        self.locks = {}
+
+        # The number of coroutines using category locks.
+        self.users = 0
+
+        # Set when a category user leaves.
+        self.user_left = Event()
+
+        # Block new category users when locking the whole table.
+        self.table_lock = Lock()
+
+    @asynccontextmanager
+    async def category(self, category: str):
+        """
+        Lock a category.
+        """
+        start = time.perf_counter() if self.metrics else 0
+
+        async with self.table_lock:
+            self.users += 1
+
+            try:
+                item = self.locks[category]
+            except KeyError:
+                item = [Lock(), 0]
+                self.locks[category] = item
+            item[1] += 1
+
+        try:
+            async with item[0]:
+                if self.metrics:
+                    self.metrics.record_lock_wait(time.perf_counter() - start)
+                yield
+        finally:
+            item[1] -= 1
+            if item[1] == 0:
+                del self.locks[category]
+
+            self.users -= 1
+            self.user_left.set()
+
+    @asynccontextmanager
+    async def table(self, owned: int = 0):
+        """
+        Lock the whole table.
+
+        :param owned: the number of category locks held by the caller itself, they are not
+            waited for. A transaction holds its category locks until it finishes, so it would
+            wait for itself.
+        """
+        start = time.perf_counter() if self.metrics else 0
+
+        async with self.table_lock:
+            while self.users > owned:
+                self.user_left.clear()
+                await self.user_left.wait()
+            if self.metrics:
+                self.metrics.record_lock_wait(time.perf_counter() - start)
+            yield
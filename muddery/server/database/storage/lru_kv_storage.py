@@ -0,0 +1,271 @@
+"""
+Key value storage in memory with limited size.
+"""
+
+import time
+from collections import OrderedDict
+from muddery.server.database.storage.memory_kv_storage import MemoryKVStorage
+
+
+class LRUMemoryKVStorage(MemoryKVStorage):
+    """
+    A memory cache which evicts the least recently used categories.
+
+    It can only be used as a cache. If a category is not in the cache, it raises KeyError when
+    writing to it, so the caller can reload the whole category from the database.
+
+    Pinned categories, such as categories of online characters or categories with unflushed
+    changes, are never evicted.
+    """
+    def __init__(self, max_categories: int = 0, ttl: float = 0):
+        """
+        :param max_categories: the max number of categories in the cache, 0 means no limit.
+        :param ttl: seconds to keep an unused category, 0 means no limit.
+        """
+        super(LRUMemoryKVStorage, self).__init__()
+
+        self.max_categories = max_categories
+        self.ttl = ttl
+
+        # categories in the order of their last use
+        self.storage = OrderedDict()
+
+        # {category: last used time}
+        self.used_time = {}
+
+        # {category: the number of pins}
+        self.pins = {}
+
+        # If all data of the table is in the cache.
+        self.complete = False
+
+    def touch(self, category: str) -> None:
+        """
+        Mark a category as just used. Raise KeyError if the category is not in the cache or has expired.
+        """
+        if self.ttl and category not in self.pins:
+            if time.monotonic() - self.used_time[category] > self.ttl:
+                self.remove(category)
+                raise KeyError
+
+        self.storage.move_to_end(category)
+        self.used_time[category] = time.monotonic()
+
+    def remove(self, category: str) -> None:
+        """
+        Remove a category from the cache.
+        """
+        del self.storage[category]
+        del self.used_time[category]
+        self.complete = False
+
+    def evict(self, keep: str = None) -> None:
+        """
+        Remove expired categories and the least recently used categories beyond the limit.
+
+        :param keep: a category should not be evicted.
+        """
+        if self.ttl:
+            expire_time = time.monotonic() - self.ttl
+            expired = [c for c in self.storage if self.used_time[c] < expire_time and c not in self.pins and c != keep]
+            for category in expired:
+                self.remove(category)
+
+        if self.max_categories and len(self.storage) > self.max_categories:
+            over = len(self.storage) - self.max_categories
+            evicted = []
+            for category in self.storage:
+                if category not in self.pins and category != keep:
+                    evicted.append(category)
+                    if len(evicted) >= over:
+                        break
+
+            for category in evicted:
+                self.remove(category)
+
+    def pin(self, category: str) -> None:
+        """
+        Keep a category in the cache until it is unpinned.
+        """
+        self.pins[category] = self.pins.get(category, 0) + 1
+
+    def unpin(self, category: str) -> None:
+        """
+        Release a pin of the category.
+        """
+        try:
+            self.pins[category] -= 1
+            if self.pins[category] <= 0:
+                del self.pins[category]
+        except KeyError:
+            pass
+
+    async def add(self, category, key, value=None):
+        """
+        Add a new attribute. If the key already exists, raise an exception.
+
+        Args:
+            category: (string) the category of data.
+            key: (string) the key.
+            value: (any) data.
+        """
+        self.touch(category)
+        await super(LRUMemoryKVStorage, self).add(category, key, value)
+
+    async def save(self, category, key, value=None):
+        """
+        Set a value to the default value field.
+
+        Args:
+            category: (string) the category of data.
+            key: (string) the key.
+            value: (any) data.
+        """
+        self.touch(category)
+        await super(LRUMemoryKVStorage, self).save(category, key, value)
+
+    async def has(self, category: str, key: str, check_category: bool = False) -> bool:
+        """
+        Check if the key exists.
+
+        Args:
+            category: (string) the category of data.
+            key: (string) attribute's key.
+            check_category: if check_category is True and does not has the category, it will raise a KeyError.
+        """
+        try:
+            self.touch(category)
+        except KeyError:
+            if check_category:
+                raise
+            return False
+
+        return key in self.storage[category]
+
+    async def load(self, category, key, *default, for_update=False):
+        """
+        Get the default field value of a key.
+
+        Args:
+            category: (string) the category of data.
+            key: (string) data's key.
+            default: (any or none) default value.
+        """
+        try:
+            self.touch(category)
+        except KeyError:
+            if len(default) > 0:
+                return default[0]
+            raise
+
+        return await super(LRUMemoryKVStorage, self).load(category, key, *default)
+
+    async def load_many(self, category, keys, check_category=False):
+        """
+        Get values of keys in a category.
+
+        Args:
+            category: (string) the category of data.
+            keys: (list) data's keys.
+            check_category: if check_category is True and does not has the category, it will raise a KeyError.
+        """
+        try:
+            self.touch(category)
+        except KeyError:
+            if check_category:
+                raise
+            return {}
+
+        return await super(LRUMemoryKVStorage, self).load_many(category, keys)
+
+    async def load_categories(self, categories):
+        """
+        Get all data of categories in the cache.
+
+        Args:
+            categories: (list) categories' names.
+        """
+        data = {}
+        for category in categories:
+            try:
+                self.touch(category)
+            except KeyError:
+                continue
+            data[category] = self.storage[category].copy()
+        return data
+
+    async def delete(self, category, key):
+        """
+        delete a key.
+
+        Args:
+            category: (string) the category of data.
+            key: (string) attribute's key.
+        """
+        if category in self.storage:
+            self.storage.move_to_end(category)
+            self.used_time[category] = time.monotonic()
+        await super(LRUMemoryKVStorage, self).delete(category, key)
+
+    async def set_all(self, all_data: dict) -> None:
+        """
+        Set all data.
+        """
+        now = time.monotonic()
+        self.storage = OrderedDict(all_data)
+        self.used_time = {category: now for category in self.storage}
+        self.complete = True
+        self.evict()
+
+    async def load_all(self) -> dict:
+        """
+        Get all data. Raise KeyError if some categories have been evicted.
+        """
+        if not self.complete:
+            raise KeyError
+
+        return dict(self.storage)
+
+    async def set_category(self, category: str, data: dict) -> None:
+        """
+        Set a category of data to cache.
+        """
+        self.storage[category] = data.copy()
+        self.storage.move_to_end(category)
+        self.used_time[category] = time.monotonic()
+        self.evict(category)
+
+    async def load_category(self, category, *default):
+        """
+        Get all default field's values of a category.
+
+        Args:
+            category: (string) category's name.
+
+        Raises:
+            KeyError: If `raise_exception` is set and no matching Attribute
+                was found matching `category`.
+        """
+        self.touch(category)
+        return self.storage[category].copy()
+
+    async def has_category(self, category: str) -> bool:
+        """
+        Check if the category is in cache.
+        """
+        try:
+            self.touch(category)
+        except KeyError:
+            return False
+        return True
+
+    async def delete_category(self, category):
+        """
+        Remove all values of a category.
+
+        Args:
+            category: (string) the category of data.
+        """
+        if category in self.storage:
+            del self.storage[category]
+            del self.used_time[category]
@@ -83,6 +83,54 @@ class MemoryKVStorage(BaseKeyValueStorage):
             else:
                 raise e
 
+    async def load_many(self, category, keys, check_category=False):
+        """
+        Get values of keys in a category.
+
+        Args:
+            category: (string) the category of data.
+            keys: (list) data's keys.
+            check_category: if check_category is True and does not has the category, it will raise a KeyError.
+        """
+        if category not in self.storage:
+            if check_category:
+                raise KeyError
+            return {}
+
+        data = self.storage[category]
+        return {key: data[key] for key in keys if key in data}
+
+    async def save_many(self, category, values):
+        """
+        Set values of a category's keys.
+
+        Args:
+            category: (string) the category of data.
+            values: (dict) {key: value}
+        """
+        for key, value in values.items():
+            await self.save(category, key, value)
+
+    async def delete_many(self, category, keys):
+        """
+        Delete keys of a category.
+
+        Args:
+            category: (string) the category of data.
+            keys: (list) data's keys.
+        """
+        for key in keys:
+            await self.delete(category, key)
+
+    async def load_categories(self, categories):
+        """
+        Get all data of categories.
+
+        Args:
+            categories: (list) categories' names.
+        """
+        return {category: self.storage[category].copy() for category in categories if category in self.storage}
+
     async def delete(self, category, key):
         """
         delete a key.
@@ -148,3 +196,13 @@ class MemoryKVStorage(BaseKeyValueStorage):
             del self.storage[category]
         except KeyError:
             pass
+
+    async def delete_categories(self, categories):
+        """
+        Remove all values of categories.
+
+        Args:
+            categories: (list) categories' names.
+        """
+        for category in categories:
+            await self.delete_category(category)
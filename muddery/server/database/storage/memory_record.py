@@ -25,3 +25,39 @@ class MemoryRecord(object):
 
     def __delattr__(self, attr_name):
         raise Exception("Cannot delete record attributes!")
+
+
+class ColumnRecord(object):
+    """
+    A view of a row in a columnar table. Each table makes a subclass whose fields are properties
+    reading the table's columns, so a record only keeps its row's position.
+    """
+    __slots__ = ("_row",)
+
+    def __init__(self, row):
+        """
+        Args:
+            row: (int) the row's position in columns.
+        """
+        object.__setattr__(self, "_row", row)
+
+    @classmethod
+    def make_class(cls, name, fields, columns):
+        """
+        Make a record class of a table.
+
+        Args:
+            name: (string) the table's name.
+            fields: (list) fields' names.
+            columns: (list) columns' values, in the same order of fields.
+        """
+        attrs = {"__slots__": ()}
+        for field_name, column in zip(fields, columns):
+            attrs[field_name] = property(lambda self, column=column: column[self._row])
+        return type(name + "Record", (cls,), attrs)
+
+    def __setattr__(self, attr_name, value):
+        raise Exception("Cannot assign directly to record attributes!")
+
+    def __delattr__(self, attr_name):
+        raise Exception("Cannot delete record attributes!")
@@ -2,32 +2,82 @@
 Load and cache all worlddata.
 """
 
+import sys
+import time
 import importlib
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
 from sqlalchemy import UniqueConstraint, select
 from muddery.common.utils.exception import MudderyError
-from muddery.server.database.storage.memory_record import MemoryRecord
+from muddery.server.database.storage.memory_record import ColumnRecord
 
 
 class MemoryTable(object):
     """
     Load and cache a table's data.
+
+    Data is stored by columns. Each column is a tuple of values and strings are interned, so
+    repeated values share one object. Records are views of rows, they are made when queried.
+    An index maps a value to a row's position, or an array of positions if several rows have
+    the value.
+
+    Fields without declared indexes can be searched too. An index is built the first time they
+    are searched and kept for later searches. Only the most recently used ad-hoc indexes are kept.
+
+    A field's value can be compared by adding a suffix to the field's name:
+        field__lt, field__lte, field__gt, field__gte: compare with a value.
+        field__startswith: match a string's prefix.
+    These conditions use the field's sorted index.
     """
-    def __init__(self, session, model_path, model_name):
+    # The max number of ad-hoc indexes to keep.
+    max_adhoc_indexes = 16
+
+    # Comparison suffixes of conditions.
+    range_operators = {"lt", "lte", "gt", "gte", "startswith"}
+
+    def __init__(self, session, model_path, model_name, snapshot=None):
+        """
+        Args:
+            session: the database's session.
+            model_path: (string) the module of models.
+            model_name: (string) the table's model.
+            snapshot: (dict) load data from the table's snapshot instead of the database.
+        """
         self.model_name = model_name
         module = importlib.import_module(model_path)
         self.session = session
         self.model = getattr(module, model_name)
         self.columns = self.model.__table__.columns.keys()
 
-        self.records = []
+        self.size = 0
+        self.column_data = []
+        self.record_class = None
         self.table_fields = {}
-        self.index = {}     # index: {field's value: recode's index}
-        self.reload()
+        self.index = {}     # index: {field's value: record's position or an array of positions}
+
+        # Indexes built when searching, the least recently used ones are removed first.
+        # {index's name: index}, sorted indexes' names begin with "~".
+        self.adhoc_indexes = OrderedDict()
+
+        # {index's name: {"lookups": number, "build_time": seconds, "adhoc": bool}}
+        self.index_stats = {}
+        self.evicted_indexes = 0
+
+        if snapshot is None:
+            self.reload()
+        else:
+            self.load_snapshot(snapshot)
 
     def clear(self):
-        self.records = []
+        self.size = 0
+        self.column_data = []
+        self.record_class = None
         self.table_fields = {}
         self.index = {}
+        self.adhoc_indexes = OrderedDict()
+        self.index_stats = {}
+        self.evicted_indexes = 0
 
     def reload(self):
         self.clear()
@@ -36,29 +86,23 @@ class MemoryTable(object):
             self.table_fields[field_name] = i
 
         # load records
-        stmt = select(self.model)
-        result = self.session.execute(stmt)
-        records = result.scalars()
-        for r in records:
-            row_data = [getattr(r, field_name) for field_name in self.columns]
-            self.records.append(MemoryRecord(self.table_fields, row_data))
-
-        # set unique index
-        for field_name in self.columns:
-            if field_name != "id" and self.model.__table__.columns[field_name].unique:
-                self.index[field_name] = dict((getattr(record, field_name), [i]) for i, record in enumerate(self.records))
+        table = self.model.__table__
+        stmt = select(*[table.columns[field_name] for field_name in self.columns])
+        rows = self.session.execute(stmt).all()
+        self.size = len(rows)
+
+        if rows:
+            self.column_data = [self.pack_column(column) for column in zip(*rows)]
+        else:
+            self.column_data = [() for field_name in self.columns]
 
-        # set common index
+        self.record_class = ColumnRecord.make_class(self.model_name, self.columns, self.column_data)
+
+        # set unique index and common index
         for field_name in self.columns:
-            if field_name != "id" and self.model.__table__.columns[field_name].index:
-                all_values = {}
-                for i, record in enumerate(self.records):
-                    key = getattr(record, field_name)
-                    if key in all_values:
-                        all_values[key].append(i)
-                    else:
-                        all_values[key] = [i]
-                self.index[field_name] = all_values
+            column = table.columns[field_name]
+            if field_name != "id" and (column.unique or column.index):
+                self.index[field_name] = self.build_index(self.column_data[self.table_fields[field_name]])
 
         # index together or unique together
         indexes = []
@@ -72,16 +116,110 @@ class MemoryTable(object):
                     indexes.append(table_args.columns.keys())
 
         for set_fields in indexes:
+            # Keys are in the same order of fields in the index's name.
             index_fields = sorted(set_fields)
-            all_values = {}
-            for i, record in enumerate(self.records):
-                keys = tuple(getattr(record, field_name) for field_name in set_fields)
-                if keys in all_values:
-                    all_values[keys].append(i)
-                else:
-                    all_values[keys] = [i]
+            columns = [self.column_data[self.table_fields[field_name]] for field_name in index_fields]
             index_name = ".".join(index_fields)
-            self.index[index_name] = all_values
+            self.index[index_name] = self.build_index(zip(*columns))
+
+    def get_snapshot(self):
+        """
+        Get the table's data and declared indexes, they can be saved and loaded later without
+        querying the database.
+        """
+        return {
+            "columns": list(self.columns),
+            "size": self.size,
+            "column_data": self.column_data,
+            "index": self.index,
+        }
+
+    def load_snapshot(self, snapshot):
+        """
+        Load data and indexes from a snapshot.
+        """
+        if snapshot["columns"] != list(self.columns):
+            raise MudderyError("%s's snapshot does not match its model." % self.model_name)
+
+        self.clear()
+
+        for i, field_name in enumerate(self.columns):
+            self.table_fields[field_name] = i
+
+        self.size = snapshot["size"]
+        self.column_data = snapshot["column_data"]
+        self.record_class = ColumnRecord.make_class(self.model_name, self.columns, self.column_data)
+        self.index = snapshot["index"]
+
+    def get_key_rows(self, key_field):
+        """
+        Group rows' values by a field, rows' ids are not included.
+
+        Return:
+            (dict): {field's value: [row's values]}
+        """
+        key_column = self.column_data[self.table_fields[key_field]]
+        columns = [self.column_data[i] for field_name, i in self.table_fields.items() if field_name != "id"]
+
+        key_rows = {}
+        for key, row in zip(key_column, zip(*columns)):
+            rows = key_rows.get(key)
+            if rows is None:
+                key_rows[key] = [row]
+            else:
+                rows.append(row)
+        return key_rows
+
+    def get_changed_keys(self, old_table, key_field="key"):
+        """
+        Compare with the table's old data, get keys of added, changed and removed records.
+
+        Args:
+            old_table: (MemoryTable) the table's old data.
+            key_field: (string) the field of records' keys.
+
+        Return:
+            (set): changed keys, or None if changes can not be found by keys.
+        """
+        if list(old_table.columns) == list(self.columns) and old_table.column_data == self.column_data:
+            return set()
+
+        if key_field not in self.table_fields or list(old_table.columns) != list(self.columns):
+            return None
+
+        old_rows = old_table.get_key_rows(key_field)
+        new_rows = self.get_key_rows(key_field)
+        return {key for key in old_rows.keys() | new_rows.keys() if old_rows.get(key) != new_rows.get(key)}
+
+    @staticmethod
+    def pack_column(values):
+        """
+        Make a column's tuple, share the same strings.
+        """
+        intern = sys.intern
+        return tuple(intern(value) if type(value) is str else value for value in values)
+
+    @staticmethod
+    def build_index(keys):
+        """
+        Build an index of rows' keys.
+
+        Args:
+            keys: (iterable) every row's key.
+
+        Return:
+            (dict): {key: row's position, or an array of rows' positions}
+        """
+        index = {}
+        for i, key in enumerate(keys):
+            posting = index.get(key)
+            if posting is None:
+                index[key] = i
+            elif type(posting) is int:
+                index[key] = array("I", (posting, i))
+            else:
+                posting.append(i)
+        return index
 
     def fields(self):
         """
@@ -93,47 +231,227 @@ class MemoryTable(object):
         """
         Get all data.
         """
-        return [record for i, record in enumerate(self.records)]
+        record_class = self.record_class
+        return [record_class(i) for i in range(self.size)]
 
     def first(self):
         """
         Get the first record.
         """
-        if len(self.records) > 0:
-            return self.records[0]
+        if self.size > 0:
+            return self.record_class(0)
 
     def get(self, record_id):
         """
         Get data by record's id.
         """
-        if 0 <= record_id < len(self.records):
-            return self.records[record_id]
+        if 0 <= record_id < self.size:
+            return self.record_class(record_id)
 
     def filter(self, **conditions):
         """
-        Filter data by record's value. Fields must have index. If filter multi fields, put them in a tuple.
+        Filter data by record's value. If filter multi fields, put them in a tuple.
 
         Args:
-            kwargs: (dict) query conditions
+            kwargs: (dict) query conditions, see the class's doc for comparison conditions.
         """
         if len(conditions) == 0:
             return self.all()
 
+        equals = {}
+        ranges = {}
+        for name, value in conditions.items():
+            field_name, sep, operator = name.rpartition("__")
+            if sep and operator in self.range_operators:
+                ranges.setdefault(field_name, {})[operator] = value
+            else:
+                equals[name] = value
+
+        for field_name in list(equals.keys()) + list(ranges.keys()):
+            if field_name not in self.table_fields:
+                raise MudderyError("Only fields can be searched, can not find %s's %s" % (self.model_name, field_name))
+
+        if not ranges:
+            return self.to_records(self.find_equal(equals))
+
+        if equals:
+            # Search equal fields by their index, then compare other fields.
+            posting = self.find_equal(equals)
+            if posting is None:
+                return []
+            rows = [posting] if type(posting) is int else posting
+            range_items = list(ranges.items())
+        else:
+            # Search the first compared field by its sorted index, then compare other fields.
+            range_items = list(ranges.items())
+            field_name, operators = range_items.pop(0)
+            rows = self.find_range(field_name, operators)
+
+        if range_items:
+            columns = self.column_data
+            fields = self.table_fields
+            range_checks = [(columns[fields[name]], operators) for name, operators in range_items]
+            try:
+                rows = [i for i in rows if all(self.match_range(column[i], operators) for column, operators in range_checks)]
+            except TypeError:
+                raise MudderyError("Can not compare %s's values with %s" % (self.model_name, dict(range_items)))
+
+        return self.to_records(rows)
+
+    def to_records(self, posting):
+        """
+        Get records of an index's posting or a list of rows' positions.
+        """
+        if posting is None:
+            return []
+        elif type(posting) is int:
+            return [self.record_class(posting)]
+        else:
+            record_class = self.record_class
+            return [record_class(i) for i in posting]
+
+    def find_equal(self, conditions):
+        """
+        Find rows whose fields equal to values.
+
+        Return:
+            the index's posting, or None if there is no such row.
+        """
         if len(conditions) == 1:
-            keys = list(conditions.keys())
-            index_name = keys[0]
-            values = conditions[index_name]
+            index_name, values = next(iter(conditions.items()))
         else:
-            unique_fields = sorted(set(conditions.keys()))
+            unique_fields = sorted(conditions.keys())
             index_name = ".".join(unique_fields)
             values = tuple(conditions[field_name] for field_name in unique_fields)
 
-        if index_name not in self.index:
-            raise MudderyError("Only indexed fields can be searched, can not find %s's %s" % (self.model_name, index_name))
+        index = self.get_index(index_name)
+        return index.get(values)
+
+    def find_range(self, field_name, operators):
+        """
+        Find rows whose field matches comparison conditions, rows are in the order of the
+        field's values.
+
+        Args:
+            field_name: (string) the field's name.
+            operators: (dict) {operator: value}
+        """
+        keys, rows = self.get_index("~" + field_name)
+
+        begin = 0
+        end = len(keys)
+        try:
+            for operator, value in operators.items():
+                if operator == "gt":
+                    begin = max(begin, bisect_right(keys, value))
+                elif operator == "gte":
+                    begin = max(begin, bisect_left(keys, value))
+                elif operator == "lt":
+                    end = min(end, bisect_left(keys, value))
+                elif operator == "lte":
+                    end = min(end, bisect_right(keys, value))
+                elif operator == "startswith":
+                    begin = max(begin, bisect_left(keys, value))
+                    if value:
+                        # The first string after all strings with the prefix.
+                        end = min(end, bisect_left(keys, value[:-1] + chr(ord(value[-1]) + 1)))
+        except TypeError:
+            raise MudderyError("Can not compare %s's %s with %s" % (self.model_name, field_name, operators))
 
-        index = self.index[index_name]
+        return rows[begin:end] if begin < end else []
 
-        if values in index:
-            return [self.records[i] for i in index[values]]
+    @staticmethod
+    def match_range(value, operators):
+        """
+        Check if a value matches comparison conditions.
+        """
+        if value is None:
+            return False
+
+        for operator, target in operators.items():
+            if operator == "gt":
+                if not value > target:
+                    return False
+            elif operator == "gte":
+                if not value >= target:
+                    return False
+            elif operator == "lt":
+                if not value < target:
+                    return False
+            elif operator == "lte":
+                if not value <= target:
+                    return False
+            elif operator == "startswith":
+                if not (type(value) is str and value.startswith(target)):
+                    return False
+        return True
+
+    def get_index(self, index_name):
+        """
+        Get an index by its name, build an ad-hoc index if it does not exist.
+        """
+        try:
+            index = self.index[index_name]
+        except KeyError:
+            index = self.get_adhoc_index(index_name)
+
+        stats = self.index_stats.get(index_name)
+        if stats is None:
+            stats = {"lookups": 0, "build_time": 0, "adhoc": index_name not in self.index}
+            self.index_stats[index_name] = stats
+        stats["lookups"] += 1
+
+        return index
+
+    def get_adhoc_index(self, index_name):
+        """
+        Get an ad-hoc index, build it if it does not exist.
+        """
+        try:
+            index = self.adhoc_indexes[index_name]
+            self.adhoc_indexes.move_to_end(index_name)
+            return index
+        except KeyError:
+            pass
+
+        start = time.perf_counter()
+        if index_name[0] == "~":
+            index = self.build_sorted_index(self.column_data[self.table_fields[index_name[1:]]])
         else:
-            return []
+            columns = [self.column_data[self.table_fields[field_name]] for field_name in index_name.split(".")]
+            index = self.build_index(columns[0] if len(columns) == 1 else zip(*columns))
+        build_time = time.perf_counter() - start
+
+        self.adhoc_indexes[index_name] = index
+        while len(self.adhoc_indexes) > self.max_adhoc_indexes:
+            self.adhoc_indexes.popitem(last=False)
+            self.evicted_indexes += 1
+
+        stats = self.index_stats.setdefault(index_name, {"lookups": 0, "build_time": 0, "adhoc": True})
+        stats["build_time"] += build_time
+        return index
+
+    def build_sorted_index(self, column):
+        """
+        Sort rows by a column's values, rows whose value is None are not in the index.
+
+        Return:
+            (list, array): sorted values and their rows' positions.
+        """
+        try:
+            rows = sorted((i for i, value in enumerate(column) if value is not None), key=column.__getitem__)
+        except TypeError:
+            raise MudderyError("Can not sort %s's values, they are in different types." % self.model_name)
+
+        return [column[i] for i in rows], array("I", rows)
+
+    def get_index_stats(self):
+        """
+        Get indexes' usage.
+        """
+        return {
+            "indexes": {name: dict(stats, cached=name in self.index or name in self.adhoc_indexes)
+                        for name, stats in self.index_stats.items()},
+            "adhoc_indexes": len(self.adhoc_indexes),
+            "evicted_indexes": self.evicted_indexes,
+        }
@@ -0,0 +1,164 @@
+"""
+Collect storages' performance data in the process.
+"""
+
+import weakref
+from bisect import bisect_left
+from muddery.common.utils.singleton import Singleton
+
+
+# Upper bounds of latency histograms' buckets in seconds, the last bucket has no upper bound.
+LATENCY_BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0)
+
+
+class OperationMetrics(object):
+    """
+    Counters of a storage operation.
+    """
+    __slots__ = ("count", "errors", "total_time", "max_time", "rows", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.rows = 0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def dump(self) -> dict:
+        histogram = {"<=%s" % bound: number for bound, number in zip(LATENCY_BUCKETS, self.buckets)}
+        histogram[">%s" % LATENCY_BUCKETS[-1]] = self.buckets[-1]
+
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "total_time": self.total_time,
+            "avg_time": self.total_time / self.count if self.count else 0,
+            "max_time": self.max_time,
+            "rows": self.rows,
+            "histogram": histogram,
+        }
+
+
+class StorageMetrics(object):
+    """
+    Performance data of a table's storage: database operations' counts and latencies, rows
+    loaded from the database, time waiting for locks and cache lookups.
+
+    Recording a value only updates some counters, so it can be kept on in production.
+    """
+    def __init__(self, name: str):
+        self.name = name
+
+        # {operation's name: OperationMetrics}
+        self.operations = {}
+
+        self.lock_waits = 0
+        self.lock_wait_time = 0.0
+        self.lock_wait_max = 0.0
+
+        # The cached storage which counts cache lookups.
+        self.cache_source = None
+
+    def bind_cache(self, storage) -> None:
+        """
+        Set the cached storage whose cache lookups are reported.
+
+        :param storage: (StorageWithCache) the storage.
+        """
+        self.cache_source = weakref.ref(storage)
+
+    def record_operation(self, operation: str, seconds: float, rows: int = 0, error: bool = False) -> None:
+        """
+        Record a database operation.
+
+        :param operation: the operation's name.
+        :param seconds: the time the operation took.
+        :param rows: the number of rows loaded.
+        :param error: the operation failed.
+        """
+        try:
+            metrics = self.operations[operation]
+        except KeyError:
+            metrics = OperationMetrics()
+            self.operations[operation] = metrics
+
+        metrics.count += 1
+        metrics.total_time += seconds
+        if seconds > metrics.max_time:
+            metrics.max_time = seconds
+        metrics.rows += rows
+        if error:
+            metrics.errors += 1
+        metrics.buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+    def record_lock_wait(self, seconds: float) -> None:
+        """
+        Record the time waiting for a lock.
+        """
+        self.lock_waits += 1
+        self.lock_wait_time += seconds
+        if seconds > self.lock_wait_max:
+            self.lock_wait_max = seconds
+
+    def reset(self) -> None:
+        """
+        Clear all counters.
+        """
+        self.operations = {}
+        self.lock_waits = 0
+        self.lock_wait_time = 0.0
+        self.lock_wait_max = 0.0
+
+        storage = self.cache_source() if self.cache_source else None
+        if storage is not None:
+            storage.reset_stats()
+
+    def dump(self) -> dict:
+        """
+        Get all data in a dict.
+        """
+        storage = self.cache_source() if self.cache_source else None
+        return {
+            "operations": {name: metrics.dump() for name, metrics in self.operations.items()},
+            "rows_loaded": sum(metrics.rows for metrics in self.operations.values()),
+            "lock_waits": self.lock_waits,
+            "lock_wait_time": self.lock_wait_time,
+            "lock_wait_max": self.lock_wait_max,
+            "cache": storage.get_stats() if storage is not None else None,
+        }
+
+
+class StorageMetricsRegistry(Singleton):
+    """
+    Keep all tables' storage metrics, so they can be dumped by commands or http requests.
+    """
+    def __init__(self):
+        # {table's name: StorageMetrics}
+        self.metrics = {}
+
+    def get(self, name: str) -> StorageMetrics:
+        """
+        Get a table's metrics, create it if it does not exist.
+
+        :param name: the table's name.
+        """
+        try:
+            return self.metrics[name]
+        except KeyError:
+            metrics = StorageMetrics(name)
+            self.metrics[name] = metrics
+            return metrics
+
+    def dump(self) -> dict:
+        """
+        Get all tables' metrics.
+        """
+        return {name: metrics.dump() for name, metrics in self.metrics.items()}
+
+    def reset(self) -> None:
+        """
+        Clear all tables' counters.
+        """
+        for metrics in self.metrics.values():
+            metrics.reset()
@@ -2,21 +2,83 @@
 Key value storage in relational database with write back memory cache.
 """
 
+import time
+import asyncio
+from asyncio import Lock
+from contextlib import nullcontext
 from muddery.server.database.storage.base_kv_storage import BaseKeyValueStorage
-from muddery.server.database.storage.transaction import Transaction
+from muddery.server.database.storage.category_lock import CategoryLock
+from muddery.server.database.storage.transaction import get_transaction, DELETED, UNCHANGED
+from muddery.server.utils.logger import logger
+from muddery.common.utils.exception import MudderyError, ERR
 
 
 class StorageWithCache(BaseKeyValueStorage):
     """
     The storage of object attributes.
+
+    In write-behind mode, changes are written to the cache at once and recorded as dirty keys.
+    Dirty keys are written to the storage in batches when calling flush().
+
+    A category in the cache always has all of its data, categories not in the storage are cached
+    as empty categories. So if a key is not in a cached category, it does not exist and there is
+    no need to query the storage.
     """
-    def __init__(self, storage: BaseKeyValueStorage, cache: BaseKeyValueStorage):
+    def __init__(self, storage: BaseKeyValueStorage, cache: BaseKeyValueStorage, write_behind: bool = False,
+                 flush_threshold: int = 0, metrics=None, name: str = "", journal=None):
+        """
+        :param storage: the storage in the database.
+        :param cache: the memory cache.
+        :param write_behind: write changes to the cache first and flush them to the storage later.
+        :param flush_threshold: flush dirty keys when the number of them reaches this value, 0 means no limit.
+        :param metrics: (StorageMetrics) record storage operations and lock waits if it is set.
+        :param name: the storage's name in the journal.
+        :param journal: (WriteJournal) record write-behind changes before they are flushed.
+        """
         super(StorageWithCache, self).__init__()
 
         self.storage = storage
         self.cache = cache
         self.all_cached = False
 
+        self.name = name
+        self.journal = journal if write_behind else None
+
+        self.metrics = metrics
+        if metrics:
+            metrics.bind_cache(self)
+
+        # Lock each category separately.
+        self.locks = CategoryLock(metrics)
+
+        self.write_behind = write_behind
+        self.flush_threshold = flush_threshold
+        self.flush_scheduled = False
+
+        # The task flushing dirty keys when there are too many of them.
+        self.flush_task = None
+
+        # Dirty keys waiting to flush. {(category, key): deleted}
+        self.dirty_keys = {}
+
+        # Categories waiting to be removed from the storage.
+        self.dirty_deleted_categories = set()
+
+        # Categories which have dirty data. They are pinned in the cache until flushed.
+        self.dirty_categories = set()
+
+        # Only one flush at the same time.
+        self.flush_lock = Lock()
+
+        # Lookups found in the cache.
+        self.hits = 0
+
+        # Lookups of absent keys answered by the cache.
+        self.negative_hits = 0
+
+        # Lookups which need to query the storage.
+        self.misses = 0
+
     async def add(self, category: str, key: str, value: any = None) -> None:
         """
         Add a new attribute. If the key already exists, raise an exception.
@@ -26,12 +88,30 @@ class StorageWithCache(BaseKeyValueStorage):
             key: (string) the key.
             value: (any) data.
         """
-        async with self.lock:
-            await self.storage.add(category, key, value)
+        trans = get_transaction()
+        if trans:
+            if key in await self.load_category(category):
+                raise MudderyError(ERR.duplicate_key, "Duplicate key %s." % key)
+            trans.set_value(self, category, key, self.copy_value(value))
+            trans.add_write(self, "add", category, key, self.copy_value(value))
+            return
 
-            try:
+        async with self.lock_category(category):
+            if self.write_behind:
+                await self.ensure_category_cache(category)
                 await self.cache.add(category, key, value)
-            except KeyError:
+                self.mark_dirty(category, key)
+                self.journal_write("add", category, key, value)
+                await self.sync_journal()
+                return
+
+            await self.call_storage("add", category, key, value)
+
+            # Only update cached categories, others will be loaded from the storage when used.
+            if await self.cache.has_category(category):
+                await self.cache.add(category, key, value)
+            elif self.all_cached:
+                # All data must be in the cache, load the new category.
                 await self.set_category_cache(category)
 
     async def save(self, category: str, key: str, value: any = None) -> None:
@@ -43,12 +123,29 @@ class StorageWithCache(BaseKeyValueStorage):
             key: (string) the key.
             value: (any) data.
         """
-        async with self.lock:
-            await self.storage.save(category, key, value)
+        trans = get_transaction()
+        if trans:
+            current = await self.load(category, key, None)
+            trans.set_value(self, category, key, self.merge_value(current, value))
+            trans.add_write(self, "save", category, key, self.copy_value(value))
+            return
 
-            try:
+        async with self.lock_category(category):
+            if self.write_behind:
+                await self.ensure_category_cache(category)
                 await self.cache.save(category, key, value)
-            except KeyError:
+                self.mark_dirty(category, key)
+                self.journal_write("save", category, key, value)
+                await self.sync_journal()
+                return
+
+            await self.call_storage("save", category, key, value)
+
+            # Only update cached categories, others will be loaded from the storage when used.
+            if await self.cache.has_category(category):
+                await self.cache.save(category, key, value)
+            elif self.all_cached:
+                # All data must be in the cache, load the new category.
                 await self.set_category_cache(category)
 
     async def has(self, category: str, key: str, check_category: bool = False) -> bool:
@@ -60,23 +157,53 @@ class StorageWithCache(BaseKeyValueStorage):
             key: (string) attribute's key.
             check_category: if check_category is True and does not has the category, it will raise a KeyError.
         """
-        async with self.lock:
+        changes = self.get_changes(category)
+        if changes is not None:
+            value = changes.get(key)
+            if value is not UNCHANGED:
+                return value is not DELETED
+
+        async with self.lock_category(category):
             try:
-                return await self.cache.has(category, key, check_category=True)
+                result = await self.cache.has(category, key, check_category=True)
             except KeyError:
+                self.misses += 1
                 category_data = await self.set_category_cache(category)
                 return key in category_data
 
+            if result:
+                self.hits += 1
+            else:
+                self.negative_hits += 1
+            return result
+
     async def all(self) -> dict:
         """
         Get all data.
         :return:
         """
-        async with self.lock:
+        # Categories locked by the transaction are not waited for.
+        trans = get_transaction()
+        async with self.locks.table(trans.count_locks(self) if trans else 0):
             if self.all_cached:
-                return await self.cache.load_all()
-            else:
-                return await self.set_all_cache()
+                try:
+                    all_data = await self.cache.load_all()
+                except KeyError:
+                    # Some data has been evicted from the cache.
+                    self.all_cached = False
+
+            if not self.all_cached:
+                if self.write_behind:
+                    # The storage must be up to date before loading all data from it.
+                    await self.flush()
+                all_data = await self.set_all_cache()
+
+        if trans:
+            for (storage_id, category), (storage, changes) in trans.changes.items():
+                if storage is self:
+                    all_data[category] = changes.apply(all_data.get(category, {}))
+
+        return all_data
 
     async def load(self, category: str, key: str, *default, for_update=False) -> any:
         """
@@ -86,23 +213,53 @@ class StorageWithCache(BaseKeyValueStorage):
             category: (string) the category of data.
             key: (string) data's key.
             default: (any or none) default value.
+            for_update: (bool) in a transaction, lock the category until the transaction finishes.
 
         Raises:
             KeyError: If `raise_exception` is set and no matching Attribute
                 was found matching `key` and no default value set.
         """
-        async with self.lock:
-            try:
-                return await self.cache.load(category, key)
-            except KeyError:
-                category_data = await self.set_category_cache(category)
-                try:
-                    return category_data[key]
-                except KeyError as e:
-                    if len(default) > 0:
+        trans = get_transaction()
+        if trans:
+            if for_update:
+                await trans.lock(self, category)
+
+            changes = trans.get_changes(self, category)
+            if changes is not None:
+                value = changes.get(key)
+                if value is not UNCHANGED:
+                    if value is not DELETED:
+                        return value
+                    elif len(default) > 0:
                         return default[0]
                     else:
-                        raise e
+                        raise KeyError(key)
+
+        async with self.lock_category(category):
+            try:
+                value = await self.cache.load(category, key)
+                self.hits += 1
+                return value
+            except KeyError:
+                pass
+
+            if await self.cache.has_category(category):
+                # The key does not exist.
+                self.negative_hits += 1
+                if len(default) > 0:
+                    return default[0]
+                else:
+                    raise KeyError(key)
+
+            self.misses += 1
+            category_data = await self.set_category_cache(category)
+            try:
+                return category_data[key]
+            except KeyError as e:
+                if len(default) > 0:
+                    return default[0]
+                else:
+                    raise e
 
     async def load_category(self, category: str, *default) -> dict:
         """
@@ -115,10 +272,27 @@ class StorageWithCache(BaseKeyValueStorage):
             KeyError: If `raise_exception` is set and no matching Attribute
                 was found matching `category`.
         """
-        async with self.lock:
+        changes = self.get_changes(category)
+        if changes is not None:
+            return changes.apply({} if changes.cleared else await self.load_committed_category(category))
+
+        return await self.load_committed_category(category, *default)
+
+    async def load_committed_category(self, category: str, *default) -> dict:
+        """
+        Get all committed values of a category, changes of the current transaction are not
+        included.
+
+        Args:
+            category: (string) category's name.
+        """
+        async with self.lock_category(category):
             try:
-                return await self.cache.load_category(category)
+                category_data = await self.cache.load_category(category)
+                self.hits += 1
+                return category_data
             except KeyError:
+                self.misses += 1
                 category_data = await self.set_category_cache(category)
                 if category_data is not None:
                     return category_data
@@ -128,6 +302,139 @@ class StorageWithCache(BaseKeyValueStorage):
                     else:
                         raise KeyError
 
+    async def load_many(self, category: str, keys: list, check_category: bool = False) -> dict:
+        """
+        Get values of keys in a category.
+
+        Args:
+            category: (string) the category of data.
+            keys: (list) data's keys.
+            check_category: not used, categories not found are treated as empty categories.
+
+        Return:
+            (dict): {key: value}, keys not found are omitted.
+        """
+        if self.get_changes(category) is not None:
+            category_data = await self.load_category(category)
+            return {key: category_data[key] for key in keys if key in category_data}
+
+        async with self.lock_category(category):
+            try:
+                values = await self.cache.load_many(category, keys, check_category=True)
+                self.hits += 1
+                return values
+            except KeyError:
+                self.misses += 1
+                category_data = await self.set_category_cache(category)
+                return {key: category_data[key] for key in keys if key in category_data}
+
+    async def save_many(self, category: str, values: dict) -> None:
+        """
+        Set values of a category's keys.
+
+        Args:
+            category: (string) the category of data.
+            values: (dict) {key: value}
+        """
+        if not values:
+            return
+
+        trans = get_transaction()
+        if trans:
+            current = await self.load_category(category)
+            for key, value in values.items():
+                trans.set_value(self, category, key, self.merge_value(current.get(key), value))
+            trans.add_write(self, "save_many", category, {
+                key: self.copy_value(value) for key, value in values.items()
+            })
+            return
+
+        async with self.lock_category(category):
+            if self.write_behind:
+                await self.ensure_category_cache(category)
+                await self.cache.save_many(category, values)
+                for key in values:
+                    self.mark_dirty(category, key)
+                self.journal_write("save_many", category, values)
+                await self.sync_journal()
+                return
+
+            await self.call_storage("save_many", category, values)
+
+            # Only update cached categories, others will be loaded from the storage when used.
+            if await self.cache.has_category(category):
+                await self.cache.save_many(category, values)
+            elif self.all_cached:
+                # All data must be in the cache, load the new category.
+                await self.set_category_cache(category)
+
+    async def delete_many(self, category: str, keys: list) -> None:
+        """
+        Delete keys of a category.
+
+        Args:
+            category: (string) the category of data.
+            keys: (list) data's keys.
+        """
+        if not keys:
+            return
+
+        trans = get_transaction()
+        if trans:
+            for key in keys:
+                trans.set_value(self, category, key, DELETED)
+            trans.add_write(self, "delete_many", category, list(keys))
+            return
+
+        async with self.lock_category(category):
+            if self.write_behind:
+                await self.ensure_category_cache(category)
+                for key in keys:
+                    self.mark_dirty(category, key, deleted=True)
+                self.journal_write("delete_many", category, list(keys))
+                await self.cache.delete_many(category, keys)
+                await self.sync_journal()
+                return
+
+            await self.call_storage("delete_many", category, keys)
+            await self.cache.delete_many(category, keys)
+
+    async def load_categories(self, categories: list) -> dict:
+        """
+        Get all data of categories. Load categories not in the cache in one query.
+
+        Args:
+            categories: (list) categories' names.
+
+        Return:
+            (dict): {category: {key: value}}, categories not found have empty values.
+        """
+        all_data = await self.cache.load_categories(categories)
+        missing = [category for category in categories if category not in all_data]
+        self.hits += len(all_data)
+        self.misses += len(missing)
+
+        if missing:
+            loaded = await self.call_storage("load_categories", missing)
+            for category in missing:
+                async with self.lock_category(category):
+                    if await self.cache.has_category(category):
+                        # Another coroutine has loaded it.
+                        all_data[category] = await self.cache.load_category(category)
+                    else:
+                        data = loaded.get(category, {})
+                        await self.cache.set_category(category, data)
+                        all_data[category] = data
+
+        trans = get_transaction()
+        if trans:
+            for category in categories:
+                changes = trans.get_changes(self, category)
+                if changes is not None:
+                    all_data[category] = changes.apply(all_data[category])
+
+        return all_data
+
     async def delete(self, category: str, key: str) -> dict:
         """
         delete a key.
@@ -139,8 +446,22 @@ class StorageWithCache(BaseKeyValueStorage):
         Return:
             (dict): deleted values
         """
-        async with self.lock:
-            await self.storage.delete(category, key)
+        trans = get_transaction()
+        if trans:
+            trans.set_value(self, category, key, DELETED)
+            trans.add_write(self, "delete", category, key)
+            return
+
+        async with self.lock_category(category):
+            if self.write_behind:
+                await self.ensure_category_cache(category)
+                self.mark_dirty(category, key, deleted=True)
+                self.journal_write("delete", category, key)
+                result = await self.cache.delete(category, key)
+                await self.sync_journal()
+                return result
+
+            await self.call_storage("delete", category, key)
             return await self.cache.delete(category, key)
 
     async def delete_category(self, category: str) -> dict:
@@ -153,16 +474,63 @@ class StorageWithCache(BaseKeyValueStorage):
         Return:
             (dict): deleted values
         """
-        async with self.lock:
-            await self.storage.delete_category(category)
-            return await self.cache.delete_category(category)
+        trans = get_transaction()
+        if trans:
+            trans.clear_category(self, category)
+            trans.add_write(self, "delete_category", category)
+            return
+
+        async with self.lock_category(category):
+            if self.write_behind:
+                # Keep an empty category in the cache, so it will not be reloaded from the storage before flushing.
+                await self.cache.set_category(category, {})
+                self.mark_category_deleted(category)
+                self.journal_write("delete_category", category)
+                await self.sync_journal()
+                return
+
+            await self.call_storage("delete_category", category)
+
+            # Keep an empty category in the cache, so lookups of it need not query the storage.
+            await self.cache.set_category(category, {})
+
+    async def delete_categories(self, categories: list) -> None:
+        """
+        Remove all values of categories in one batch, and evict them from the cache.
+
+        Args:
+            categories: (list) categories' names.
+        """
+        categories = list(categories)
+        if not categories:
+            return
+
+        trans = get_transaction()
+        if trans:
+            for category in categories:
+                trans.clear_category(self, category, evict=True)
+            trans.add_write(self, "delete_categories", categories)
+            return
+
+        if self.write_behind:
+            for category in categories:
+                async with self.lock_category(category):
+                    # Keep empty categories in the cache until they are removed from the storage.
+                    await self.cache.set_category(category, {})
+                    self.mark_category_deleted(category)
+            self.journal_write("delete_categories", categories)
+            await self.sync_journal()
+            return
+
+        await self.call_storage("delete_categories", categories)
+        await self.evict_categories(categories)
 
     async def set_all_cache(self) -> dict:
         """
         Load all data from db if have not loaded this category.
         :return:
         """
-        all_data = await self.storage.load_all()
+        all_data = await self.call_storage("load_all")
         await self.cache.set_all(all_data)
         self.all_cached = True
         return all_data
@@ -174,13 +542,470 @@ class StorageWithCache(BaseKeyValueStorage):
         :return:
         """
         try:
-            data = await self.storage.load_category(category)
+            data = await self.call_storage("load_category", category)
         except KeyError:
             data = {}
 
         await self.cache.set_category(category, data)
         return data
 
+    async def ensure_category_cache(self, category: str) -> None:
+        """
+        Load a category's data to the cache if it is not in the cache.
+        """
+        if not await self.cache.has_category(category):
+            await self.set_category_cache(category)
+
+    def lock_category(self, category: str):
+        """
+        Lock a category. Categories locked by the current task's transaction are not locked again.
+        """
+        context = get_transaction()
+        if context is not None and context.has_lock(self, category):
+            return nullcontext()
+        return self.locks.category(category)
+
+    def get_changes(self, category: str):
+        """
+        Get the current transaction's changes of the category, return None if there is no change.
+        """
+        trans = get_transaction()
+        if trans:
+            return trans.get_changes(self, category)
+        return None
+
+    async def commit_changes(self, category: str, changes) -> None:
+        """
+        Write a committed transaction's changes of a category to the cache. The caller must hold
+        the category's lock.
+
+        :param category: the category's name.
+        :param changes: (CategoryChanges) the category's changes.
+        """
+        if changes.cleared:
+            if changes.evict and not self.write_behind:
+                await self.cache.delete_category(category)
+            else:
+                await self.cache.set_category(category, changes.apply({}))
+            return
+
+        if self.write_behind:
+            # Categories with dirty data must have all their data in the cache.
+            await self.ensure_category_cache(category)
+        elif not await self.cache.has_category(category):
+            if self.all_cached:
+                # All data must be in the cache, load the new category.
+                await self.set_category_cache(category)
+
+            # Otherwise it will be loaded from the storage when used.
+            return
+
+        for key, value in changes.values.items():
+            if value is DELETED:
+                await self.cache.delete(category, key)
+            else:
+                await self.cache.save(category, key, value)
+
+    async def apply_write(self, operation: str, category: str, *args) -> None:
+        """
+        Write a change of a committed transaction to the storage, or mark it as dirty in
+        write-behind mode.
+        """
+        if not self.write_behind:
+            await self.call_storage(operation, category, *args)
+            return
+
+        if operation == "delete_categories":
+            # The category is a list of categories.
+            for item in category:
+                self.mark_category_deleted(item)
+        elif operation == "delete_category":
+            self.mark_category_deleted(category)
+        elif operation == "delete":
+            self.mark_dirty(category, args[0], deleted=True)
+        elif operation == "delete_many":
+            for key in args[0]:
+                self.mark_dirty(category, key, deleted=True)
+        elif operation == "save_many":
+            for key in args[0]:
+                self.mark_dirty(category, key)
+        else:
+            self.mark_dirty(category, args[0])
+
+        self.journal_write(operation, category, *args)
+
+    def journal_write(self, operation: str, category: str, *args) -> None:
+        """
+        Record a write-behind change in the journal.
+        """
+        if self.journal:
+            self.journal.append(self.name, operation, category, args)
+
+    async def sync_journal(self) -> None:
+        """
+        Wait until recorded changes are safe on the disk. Raise the error if they can not be
+        written.
+        """
+        if self.journal:
+            try:
+                await self.journal.sync()
+            except Exception as e:
+                logger.log_err("Can not write changes of %s to the journal: %s" % (self.name, e))
+                raise
+
+    async def replay(self, operation: str, category: str, *args) -> None:
+        """
+        Write a change recovered from the journal to the storage. Changes may have been written
+        already, so adding a key works as saving it.
+        """
+        if operation == "add":
+            operation = "save"
+        await self.call_storage(operation, category, *args)
+
+        # Drop stale caches.
+        self.all_cached = False
+        for item in (category if operation == "delete_categories" else [category]):
+            async with self.lock_category(item):
+                await self.cache.delete_category(item)
+
+    async def call_storage(self, operation: str, *args) -> any:
+        """
+        Call an operation of the storage, record its time and the number of loaded rows if
+        metrics are enabled.
+        """
+        if not self.metrics:
+            return await getattr(self.storage, operation)(*args)
+
+        start = time.perf_counter()
+        try:
+            result = await getattr(self.storage, operation)(*args)
+        except Exception as e:
+            # KeyError means the data does not exist, it is not a failure.
+            self.metrics.record_operation(operation, time.perf_counter() - start, error=not isinstance(e, KeyError))
+            raise
+
+        rows = 0
+        if operation == "load_category":
+            rows = len(result)
+        elif operation == "load_categories" or operation == "load_all":
+            rows = sum(len(data) for data in result.values())
+
+        self.metrics.record_operation(operation, time.perf_counter() - start, rows)
+        return result
+
+    async def evict_categories(self, categories: list) -> None:
+        """
+        Remove categories from the cache, they will be loaded from the storage next time.
+        """
+        self.all_cached = False
+        for category in categories:
+            async with self.lock_category(category):
+                await self.cache.delete_category(category)
+
+    @staticmethod
+    def copy_value(value: any) -> any:
+        """
+        Copy a dict value, so it will not be changed by later writes.
+        """
+        return dict(value) if type(value) == dict else value
+
+    @staticmethod
+    def merge_value(current: any, value: any) -> any:
+        """
+        Get the value after saving a value, saving a dict updates the current dict.
+        """
+        if type(current) == dict:
+            result = dict(current)
+            result.update(value)
+            return result
+        return dict(value) if type(value) == dict else value
+
+    def mark_category_deleted(self, category: str) -> None:
+        """
+        Record a deleted category which need to be removed from the storage.
+        """
+        self.dirty_keys = {k: v for k, v in self.dirty_keys.items() if k[0] != category}
+        self.dirty_deleted_categories.add(category)
+        self.pin_dirty(category)
+        self.schedule_flush()
+
+    def mark_dirty(self, category: str, key: str, deleted: bool = False) -> None:
+        """
+        Record a changed key which need to be written to the storage.
+        """
+        self.dirty_keys[(category, key)] = deleted
+        self.pin_dirty(category)
+        self.schedule_flush()
+
+    def pin_dirty(self, category: str) -> None:
+        """
+        Keep a category with dirty data in the cache.
+        """
+        if category not in self.dirty_categories:
+            self.dirty_categories.add(category)
+            self.cache.pin(category)
+
+    def pin(self, category: str) -> None:
+        """
+        Keep a category in the cache, it will not be evicted until unpinned.
+        """
+        self.cache.pin(category)
+
+    def unpin(self, category: str) -> None:
+        """
+        Release a pin of the category.
+        """
+        self.cache.unpin(category)
+
+    def get_stats(self) -> dict:
+        """
+        Get counters of cache lookups.
+        """
+        return {
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+        }
+
+    def reset_stats(self) -> None:
+        """
+        Reset counters of cache lookups.
+        """
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+    def schedule_flush(self) -> None:
+        """
+        Flush dirty keys in a new task if there are too many of them.
+        """
+        if self.flush_scheduled or not self.flush_threshold:
+            return
+
+        if len(self.dirty_keys) + len(self.dirty_deleted_categories) >= self.flush_threshold:
+            self.flush_scheduled = True
+            self.flush_task = asyncio.create_task(self.flush())
+            self.flush_task.add_done_callback(self.flush_done)
+
+    def flush_done(self, task) -> None:
+        """
+        Called when a scheduled flush finishes.
+        """
+        if self.flush_task is task:
+            self.flush_task = None
+
+        if not task.cancelled() and task.exception() is not None:
+            # Dirty keys are kept, they will be flushed next time.
+            logger.log_err("Can not flush %s: %s" % (self.name, task.exception()))
+
+    def has_dirty(self) -> bool:
+        """
+        Check if there are changes not written to the storage.
+        """
+        return len(self.dirty_keys) > 0 or len(self.dirty_deleted_categories) > 0
+
+    async def flush(self, categories: list = None, keys: list = None) -> None:
+        """
+        Write dirty keys to the storage in one transaction.
+
+        :param categories: only write these categories' dirty keys.
+        :param keys: only write these dirty keys, [(category, key)]. Write all dirty keys if
+            both categories and keys are None.
+        """
+        async with self.flush_lock:
+            await self.flush_dirty(categories, keys)
+
+    async def flush_dirty(self, categories: list = None, keys: list = None) -> None:
+        """
+        Write dirty keys to the storage. The caller must hold the flush lock.
+
+        :param categories: only write these categories' dirty keys.
+        :param keys: only write these dirty keys, [(category, key)]. Write all dirty keys if
+            both categories and keys are None.
+        """
+        if categories is None and keys is None:
+            self.flush_scheduled = False
+            if not self.has_dirty():
+                return
+
+        dirty = self.take_dirty(categories, keys)
+        dirty_keys, deleted_categories, dirty_categories = dirty
+        if not dirty_keys and not deleted_categories:
+            return
+
+        try:
+            async with self.storage.db_transaction():
+                await self.write_dirty(dirty_keys, deleted_categories)
+        except Exception as e:
+            self.restore_dirty(dirty)
+            logger.log_trace("Can not flush the cache: %s" % e)
+            raise
+
+        self.release_dirty(dirty)
+
+    async def write_through(self, writes: list) -> tuple:
+        """
+        Write a committed transaction's changes to the storage at once instead of marking them
+        as dirty. Dirty data of changed keys and categories are written before them. The caller
+        must hold the flush lock and run it in the storage's database transaction.
+
+        Changes are recorded in the journal before the database transaction commits, so older
+        changes in the journal can not be recovered after them.
+
+        :param writes: [(operation, category, args)]
+
+        Return:
+            (tuple): dirty data which have been written. Call release_dirty() with it after the
+                database transaction commits, or restore_dirty() if it fails.
+        """
+        categories = set()
+        keys = set()
+        deleted_keys = set()
+        for operation, category, args in writes:
+            if operation == "delete_categories":
+                categories.update(category)
+            elif operation == "delete_category":
+                categories.add(category)
+            elif operation == "save_many":
+                keys.update((category, key) for key in args[0])
+            elif operation == "delete_many":
+                deleted_keys.update((category, key) for key in args[0])
+            elif operation == "delete":
+                deleted_keys.add((category, args[0]))
+            else:
+                keys.add((category, args[0]))
+
+        dirty = self.take_dirty(categories, keys | deleted_keys)
+        try:
+            # Dirty data which will be deleted by the changes need not to be written.
+            dirty_keys = {
+                item: deleted for item, deleted in dirty[0].items()
+                if item[0] not in categories and item not in deleted_keys
+            }
+            await self.write_dirty(dirty_keys, dirty[1] - categories)
+            for operation, category, args in writes:
+                await self.call_storage(operation, category, *args)
+                self.journal_write(operation, category, *args)
+            await self.sync_journal()
+        except Exception:
+            self.restore_dirty(dirty)
+            raise
+
+        return dirty
+
+    def take_dirty(self, categories: list = None, keys: list = None) -> tuple:
+        """
+        Remove dirty data from dirty records to write them.
+
+        :param categories: only take these categories' dirty keys.
+        :param keys: only take these dirty keys, [(category, key)]. Take all dirty keys if
+            both categories and keys are None.
+
+        Return:
+            (tuple): (dirty keys, deleted categories, categories to unpin after writing)
+        """
+        if categories is None and keys is None:
+            dirty = (self.dirty_keys, self.dirty_deleted_categories, self.dirty_categories)
+            self.dirty_keys = {}
+            self.dirty_deleted_categories = set()
+            self.dirty_categories = set()
+            return dirty
+
+        categories = set(categories) if categories else set()
+        keys = set(keys) if keys else set()
+
+        # A deleted category must be removed before writing its new keys.
+        categories.update(item[0] for item in keys if item[0] in self.dirty_deleted_categories)
+
+        dirty_keys = {
+            item: deleted for item, deleted in self.dirty_keys.items() if item[0] in categories or item in keys
+        }
+        deleted_categories = self.dirty_deleted_categories & categories
+
+        if dirty_keys:
+            self.dirty_keys = {item: deleted for item, deleted in self.dirty_keys.items() if item not in dirty_keys}
+        self.dirty_deleted_categories -= deleted_categories
+
+        # Categories without other dirty data are unpinned after writing.
+        remains = set(item[0] for item in self.dirty_keys) | self.dirty_deleted_categories
+        dirty_categories = (set(item[0] for item in dirty_keys) | deleted_categories) - remains
+        dirty_categories &= self.dirty_categories
+        self.dirty_categories -= dirty_categories
+
+        return dirty_keys, deleted_categories, dirty_categories
+
+    async def write_dirty(self, dirty_keys: dict, deleted_categories: set) -> None:
+        """
+        Write dirty data to the storage.
+
+        :param dirty_keys: {(category, key): deleted}
+        :param deleted_categories: categories to remove.
+        """
+        if deleted_categories:
+            await self.call_storage("delete_categories", list(deleted_categories))
+
+        # Delete keys of a category in one batch.
+        deleted_keys = {}
+        for (category, key), deleted in dirty_keys.items():
+            if deleted:
+                deleted_keys.setdefault(category, []).append(key)
+        for category, keys in deleted_keys.items():
+            await self.call_storage("delete_many", category, keys)
+
+        # Save keys of a category in one batch.
+        saved_values = {}
+        for (category, key), deleted in dirty_keys.items():
+            if not deleted:
+                try:
+                    value = await self.cache.load(category, key)
+                except KeyError:
+                    # The cache has been removed.
+                    continue
+                if type(value) == dict:
+                    value = value.copy()
+                saved_values.setdefault(category, {})[key] = value
+        for category, values in saved_values.items():
+            await self.call_storage("save_many", category, values)
+
+    def restore_dirty(self, dirty: tuple) -> None:
+        """
+        Put dirty data back to dirty records after failing to write them, they will be written
+        next time.
+
+        :param dirty: the result of take_dirty().
+        """
+        dirty_keys, deleted_categories, dirty_categories = dirty
+        self.dirty_deleted_categories.update(deleted_categories)
+        for dirty_key, deleted in dirty_keys.items():
+            self.dirty_keys.setdefault(dirty_key, deleted)
+        for category in dirty_categories:
+            if category in self.dirty_categories:
+                # It has been pinned again.
+                self.cache.unpin(category)
+            else:
+                self.dirty_categories.add(category)
+
+    def release_dirty(self, dirty: tuple) -> None:
+        """
+        Unpin categories whose dirty data have been written.
+
+        :param dirty: the result of take_dirty().
+        """
+        for category in dirty[2]:
+            self.cache.unpin(category)
+
+    def db_transaction(self):
+        """
+        Run database operations of a block in the storage's database transaction.
+        """
+        return self.storage.db_transaction()
+
+    def get_database(self):
+        """
+        Get the database of the storage.
+        """
+        return self.storage.get_database()
+
     def transaction_enter(self):
         self.storage.transaction_enter()
         self.cache.transaction_enter()
@@ -3,12 +3,31 @@ Key value storage in relational database.
 """
 
 import importlib
+from contextlib import nullcontext, asynccontextmanager
 from sqlalchemy.orm.exc import NoResultFound
-from sqlalchemy import select, update, delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy import select, update, insert, delete, bindparam
 from sqlalchemy import func
+from sqlalchemy import UniqueConstraint, PrimaryKeyConstraint
+from sqlalchemy.dialects import sqlite, mysql
 from muddery.server.database.storage.base_kv_storage import BaseKeyValueStorage
 
 
+# The max number of values in an IN clause.
+IN_CHUNK_SIZE = 500
+
+# The number of rows fetched at a time when loading the whole table.
+LOAD_ALL_BATCH_SIZE = 1000
+
+
+def chunks(values: list) -> list:
+    """
+    Split values into lists which can be put into IN clauses.
+    """
+    for i in range(0, len(values), IN_CHUNK_SIZE):
+        yield values[i:i + IN_CHUNK_SIZE]
+
+
 class TableKVStorage(BaseKeyValueStorage):
     """
     The storage of object attributes.
@@ -52,6 +71,33 @@ class TableKVStorage(BaseKeyValueStorage):
         if default_value_field:
             exclude_fields.add(default_value_field)
 
+        # Fields of the unique constraint on the category and the key, used by upserts.
+        self.conflict_fields = self.get_conflict_fields()
+
+        # Fields must be set when inserting a row.
+        self.required_fields = set(
+            c.name for c in self.model.__table__.columns
+            if not c.nullable and c.default is None and c.server_default is None and
+            not (c.primary_key and c.autoincrement in ("auto", True))
+        )
+
+        # Upsert statements of different fields.
+        # {(dialect, fields): statement}
+        self.upsert_stmts = {}
+
+        # Columns to query. Rows are read as tuples without building ORM objects.
+        if default_value_field is None:
+            self.select_fields = list(self.columns)
+        else:
+            self.select_fields = [field for field in (category_field, key_field) if field]
+            self.select_fields.append(default_value_field)
+
+        table = self.model.__table__
+        self.select_columns = [table.c[field] for field in self.select_fields]
+        self.category_index = self.select_fields.index(category_field) if category_field else None
+        self.key_index = self.select_fields.index(key_field) if key_field else None
+        self.value_index = self.select_fields.index(default_value_field) if default_value_field else None
+
     async def add(self, category, key, value=None):
         """
         Add a new attribute. If the key already exists, raise an exception.
@@ -94,6 +140,12 @@ class TableKVStorage(BaseKeyValueStorage):
         else:
             data = {self.default_value_field: value}
 
+        row = self.upsert_row(category, key, data)
+        stmt = self.upsert_stmt(self.session.get_bind().dialect.name, row)
+        if stmt is not None:
+            self.session.execute(stmt, row)
+            return
+
         stmt = update(self.model).values(**data)
 
         if self.category_field:
@@ -165,7 +217,7 @@ class TableKVStorage(BaseKeyValueStorage):
             KeyError: If `raise_exception` is set and no matching Attribute
                 was found matching `key` and no default value set.
         """
-        stmt = select(self.model)
+        stmt = self.select_rows()
 
         if for_update:
             stmt = stmt.with_for_update()
@@ -179,19 +231,14 @@ class TableKVStorage(BaseKeyValueStorage):
         result = self.session.execute(stmt)
 
         try:
-            record = result.scalars().one()
+            row = result.one()
         except NoResultFound:
             if len(default) > 0:
                 return default[0]
             else:
                 raise KeyError
 
-        if self.default_value_field is not None:
-            return getattr(record, self.default_value_field)
-        else:
-            return {
-                k: getattr(record, k) for k in self.columns
-            }
+        return self.row_value(row)
 
     async def delete(self, category, key):
         """
@@ -236,36 +283,9 @@ class TableKVStorage(BaseKeyValueStorage):
         Get all data.
         :return:
         """
-        stmt = select(self.model)
+        stmt = self.select_rows().execution_options(yield_per=LOAD_ALL_BATCH_SIZE)
         result = self.session.execute(stmt)
-        records = result.scalars().all()
-
-        all_data = {}
-        if self.category_field:
-            for r in records:
-                category = getattr(r, self.category_field)
-                if category not in all_data:
-                    all_data[category] = {}
-
-                key = getattr(r, self.key_field) if self.key_field else ""
-                all_data[category][key] = {k: getattr(r, k) for k in self.columns}
-        elif self.key_field:
-            all_data[""] = {
-                getattr(r, self.key_field): {
-                    k: getattr(r, k) for k in self.columns
-                } for r in records
-            }
-        elif len(records) > 0:
-            all_data[""][""] = {k: getattr(records[0], k) for k in self.columns}
-        else:
-            all_data[""][""] = {}
-
-        if self.default_value_field is not None:
-            all_data = {
-                key: value[self.default_value_field] for category, data in all_data.items() for key, value in data.items()
-            }
-
-        return all_data
+        return self.rows_to_all_data(result)
 
     async def set_category(self, category: str, data: dict) -> None:
         """
@@ -308,31 +328,13 @@ class TableKVStorage(BaseKeyValueStorage):
         Args:
             category: (string) category's name.
         """
-        stmt = select(self.model)
+        stmt = self.select_rows()
 
         if self.category_field:
             stmt = stmt.where(getattr(self.model, self.category_field) == category)
 
         result = self.session.execute(stmt)
-        records = result.scalars().all()
-
-        if self.key_field:
-            if self.default_value_field:
-                data = {
-                    getattr(record, self.key_field): getattr(record, self.default_value_field) for record in records
-                }
-            else:
-                data = {
-                    getattr(record, self.key_field): {
-                        k: getattr(record, k) for k in self.columns
-                    } for record in records
-                }
-        else:
-            data = {
-                "": {
-                    k: getattr(record, k) for k in self.columns
-                } for record in records
-            }
+        data = {self.row_key(row): self.row_value(row) for row in result}
 
         if len(data) == 0:
             if len(default) > 0:
@@ -356,6 +358,459 @@ class TableKVStorage(BaseKeyValueStorage):
 
         self.session.execute(stmt)
 
+    def begin(self):
+        """
+        Begin a transaction if the session is not in a transaction.
+        """
+        if self.session.in_transaction():
+            return nullcontext()
+        return self.session.begin()
+
+    @asynccontextmanager
+    async def db_transaction(self):
+        """
+        Run database operations of a block in one database transaction.
+        """
+        with self.begin():
+            yield
+
+    def get_database(self):
+        """
+        Get the database engine of the storage.
+        """
+        return self.session.get_bind()
+
+    def get_conflict_fields(self) -> tuple:
+        """
+        Get fields of the unique constraint which exactly covers the category field and the key field.
+        Return None if there is no such constraint.
+        """
+        fields = set()
+        if self.category_field:
+            fields.add(self.category_field)
+        if self.key_field:
+            fields.add(self.key_field)
+
+        if not fields:
+            return None
+
+        table = self.model.__table__
+        unique_columns = [
+            c.columns.keys() for c in table.constraints if isinstance(c, (UniqueConstraint, PrimaryKeyConstraint))
+        ]
+        unique_columns.extend(index.columns.keys() for index in table.indexes if index.unique)
+
+        for columns in unique_columns:
+            if set(columns) == fields:
+                return tuple(columns)
+
+        return None
+
+    def upsert_row(self, category: str, key: str, data: dict) -> dict:
+        """
+        Make a row to upsert.
+        """
+        row = dict(data)
+        if self.category_field:
+            row[self.category_field] = category
+        if self.key_field:
+            row[self.key_field] = key
+        return row
+
+    def upsert_stmt(self, dialect: str, row: dict) -> any:
+        """
+        Get a single statement which inserts the row or updates the existing row with the same
+        category and key. Only fields in the row are updated.
+
+        Return None if the table or the database does not support it, or the row can not be
+        inserted as a new record, then the caller should update and insert separately.
+
+        Args:
+            dialect: (string) the database dialect's name.
+            row: (dict) the row's values, including the category and the key.
+        """
+        if not self.conflict_fields or not self.required_fields.issubset(row):
+            return None
+
+        fields = tuple(sorted(row.keys()))
+        try:
+            return self.upsert_stmts[(dialect, fields)]
+        except KeyError:
+            pass
+
+        table = self.model.__table__
+        update_fields = [field for field in fields if field not in self.conflict_fields]
+
+        if dialect == "sqlite":
+            stmt = sqlite.insert(table)
+            if update_fields:
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=self.conflict_fields,
+                    set_={field: stmt.excluded[field] for field in update_fields}
+                )
+            else:
+                stmt = stmt.on_conflict_do_nothing(index_elements=self.conflict_fields)
+        elif dialect == "mysql":
+            stmt = mysql.insert(table)
+            if not update_fields:
+                # Set a field to itself to do nothing.
+                update_fields = self.conflict_fields[:1]
+            stmt = stmt.on_duplicate_key_update({field: stmt.inserted[field] for field in update_fields})
+        else:
+            stmt = None
+
+        self.upsert_stmts[(dialect, fields)] = stmt
+        return stmt
+
+    def compare_and_save_stmt(self, dialect: str, category: str, key: str, value: any, field: str, expected: any) -> any:
+        """
+        Make a statement which saves the value only if the record's field has the expected value.
+        If the expected value is None, the statement inserts the value and ignores existing keys.
+        """
+        if value is None:
+            data = {}
+        elif self.default_value_field is None:
+            data = value
+        else:
+            data = {self.default_value_field: value}
+
+        table = self.model.__table__
+        if expected is None:
+            row = self.upsert_row(category, key, data)
+            if dialect == "sqlite":
+                return sqlite.insert(table).values(row).on_conflict_do_nothing()
+            elif dialect == "mysql":
+                return mysql.insert(table).values(row).prefix_with("IGNORE")
+            else:
+                return insert(table).values(row)
+
+        stmt = update(table).values(data).where(table.c[field] == expected)
+        if self.category_field:
+            stmt = stmt.where(table.c[self.category_field] == category)
+        if self.key_field:
+            stmt = stmt.where(table.c[self.key_field] == key)
+        return stmt
+
+    def upsert_many_params(self, dialect: str, category: str, values: dict) -> tuple:
+        """
+        Make parameters to upsert values in batches.
+
+        Return:
+            (list, dict): [(upsert statement, [rows])], {key: value} values can not be upserted
+        """
+        upserts = {}
+        others = {}
+
+        for key, value in values.items():
+            if value is None:
+                data = {}
+            elif self.default_value_field is None:
+                data = value
+            else:
+                data = {self.default_value_field: value}
+
+            row = self.upsert_row(category, key, data)
+            stmt = self.upsert_stmt(dialect, row)
+            if stmt is None:
+                others[key] = value
+                continue
+
+            # Rows upserted at once must have the same fields.
+            fields = tuple(sorted(row.keys()))
+            if fields not in upserts:
+                upserts[fields] = (stmt, [])
+            upserts[fields][1].append(row)
+
+        return list(upserts.values()), others
+
+    def select_rows(self):
+        """
+        Statement to query rows of the table's columns.
+        """
+        return select(*self.select_columns)
+
+    def row_category(self, row) -> any:
+        """
+        Get a row's category.
+        """
+        return row[self.category_index] if self.category_index is not None else ""
+
+    def row_key(self, row) -> any:
+        """
+        Get a row's key.
+        """
+        return row[self.key_index] if self.key_index is not None else ""
+
+    def row_value(self, row) -> any:
+        """
+        Get a row's value.
+        """
+        if self.value_index is not None:
+            return row[self.value_index]
+        else:
+            return dict(zip(self.select_fields, row))
+
+    def rows_to_all_data(self, rows) -> dict:
+        """
+        Convert rows of the whole table to the result of load_all().
+        """
+        return self.categories_to_all_data(self.values_to_categories(rows))
+
+    def categories_to_all_data(self, all_data: dict) -> dict:
+        """
+        Convert grouped rows of the whole table to the result of load_all().
+        """
+        if not self.category_field and not self.key_field and not all_data:
+            all_data[""] = {"": {}}
+
+        if self.default_value_field is not None:
+            all_data = {
+                key: value for category, data in all_data.items() for key, value in data.items()
+            }
+
+        return all_data
+
+    def load_many_stmts(self, category: str, keys: list) -> list:
+        """
+        Statements to query keys of a category.
+        """
+        if not self.key_field:
+            keys = [""]
+
+        for part in chunks(list(keys)):
+            stmt = self.select_rows()
+            if self.category_field:
+                stmt = stmt.where(getattr(self.model, self.category_field) == category)
+            if self.key_field:
+                stmt = stmt.where(getattr(self.model, self.key_field).in_(part))
+            yield stmt
+
+    def delete_many_stmts(self, category: str, keys: list) -> list:
+        """
+        Statements to delete keys of a category.
+        """
+        if not self.key_field:
+            keys = [""]
+
+        for part in chunks(list(keys)):
+            stmt = delete(self.model)
+            if self.category_field:
+                stmt = stmt.where(getattr(self.model, self.category_field) == category)
+            if self.key_field:
+                stmt = stmt.where(getattr(self.model, self.key_field).in_(part))
+            yield stmt
+
+    def delete_categories_stmts(self, categories: list) -> list:
+        """
+        Statements to delete categories.
+        """
+        if not self.category_field:
+            yield delete(self.model)
+            return
+
+        for part in chunks(list(categories)):
+            yield delete(self.model).where(getattr(self.model, self.category_field).in_(part))
+
+    def load_categories_stmts(self, categories: list) -> list:
+        """
+        Statements to query categories.
+        """
+        if not self.category_field:
+            yield self.select_rows()
+            return
+
+        for part in chunks(list(categories)):
+            yield self.select_rows().where(getattr(self.model, self.category_field).in_(part))
+
+    def save_many_params(self, category: str, values: dict, exist_keys: set) -> tuple:
+        """
+        Make parameters to update existing keys and insert new keys.
+
+        Return:
+            (list, list): [(update statement, [parameters])], [[insert parameters]]
+        """
+        table = self.model.__table__
+        updates = {}
+        inserts = {}
+
+        for key, value in values.items():
+            if value is None:
+                data = {}
+            elif self.default_value_field is None:
+                data = dict(value)
+            else:
+                data = {self.default_value_field: value}
+
+            if key in exist_keys:
+                if not data:
+                    continue
+
+                # Group updates by their fields, so each group can be executed at once.
+                fields = tuple(sorted(data.keys()))
+                if fields not in updates:
+                    stmt = update(table).values({field: bindparam("v_" + field) for field in fields})
+                    if self.category_field:
+                        stmt = stmt.where(table.c[self.category_field] == bindparam("k_category"))
+                    if self.key_field:
+                        stmt = stmt.where(table.c[self.key_field] == bindparam("k_key"))
+                    updates[fields] = (stmt, [])
+
+                params = {"v_" + field: data[field] for field in fields}
+                params["k_category"] = category
+                params["k_key"] = key
+                updates[fields][1].append(params)
+            else:
+                if self.category_field:
+                    data[self.category_field] = category
+                if self.key_field:
+                    data[self.key_field] = key
+
+                # Rows inserted at once must have the same fields.
+                fields = tuple(sorted(data.keys()))
+                if fields not in inserts:
+                    inserts[fields] = []
+                inserts[fields].append(data)
+
+        return list(updates.values()), list(inserts.values())
+
+    def values_to_categories(self, rows, all_data: dict = None) -> dict:
+        """
+        Group rows by categories.
+
+        :param rows: rows to group.
+        :param all_data: add rows to these grouped rows.
+        """
+        if all_data is None:
+            all_data = {}
+        for row in rows:
+            category = self.row_category(row)
+            try:
+                data = all_data[category]
+            except KeyError:
+                data = {}
+                all_data[category] = data
+            data[self.row_key(row)] = self.row_value(row)
+        return all_data
+
+    async def load_many(self, category: str, keys: list, check_category: bool = False) -> dict:
+        """
+        Get values of keys in a category.
+
+        Args:
+            category: (string) the category of data.
+            keys: (list) data's keys.
+            check_category: if check_category is True and does not has the category, it will raise a KeyError.
+
+        Return:
+            (dict): {key: value}, keys not found are omitted.
+        """
+        data = {}
+        for stmt in self.load_many_stmts(category, keys):
+            result = self.session.execute(stmt)
+            for row in result:
+                data[self.row_key(row)] = self.row_value(row)
+
+        if not data and check_category and not await self.has_category(category):
+            raise KeyError
+
+        return data
+
+    async def save_many(self, category: str, values: dict) -> None:
+        """
+        Set values of a category's keys.
+
+        Args:
+            category: (string) the category of data.
+            values: (dict) {key: value}
+        """
+        if not values:
+            return
+
+        with self.begin():
+            upserts, values = self.upsert_many_params(self.session.get_bind().dialect.name, category, values)
+            for stmt, rows in upserts:
+                self.session.execute(stmt, rows)
+
+            if not values:
+                return
+
+            exist_keys = set()
+            if self.key_field:
+                for stmt in self.load_many_stmts(category, values.keys()):
+                    stmt = stmt.with_only_columns([getattr(self.model, self.key_field)])
+                    exist_keys.update(self.session.execute(stmt).scalars())
+            elif await self.has_category(category):
+                exist_keys.add("")
+
+            updates, inserts = self.save_many_params(category, values, exist_keys)
+            for stmt, params in updates:
+                self.session.execute(stmt, params)
+
+            for params in inserts:
+                self.session.execute(insert(self.model.__table__), params)
+
+    async def compare_and_save(self, category: str, key: str, value: any, field: str, expected: any) -> bool:
+        """
+        Save the value only if the record's field still has the expected value.
+
+        Args:
+            category: (string) the category of data.
+            key: (string) the key.
+            value: (any) data.
+            field: (string) the field to compare.
+            expected: (any) the expected value of the field. If it is None, only add the value when
+                the key does not exist.
+
+        Return:
+            (bool): if the value is saved.
+        """
+        stmt = self.compare_and_save_stmt(self.session.get_bind().dialect.name, category, key, value, field, expected)
+        try:
+            result = self.session.execute(stmt)
+        except IntegrityError:
+            # the key already exists
+            return False
+        return result.rowcount > 0
+
+    async def delete_many(self, category: str, keys: list) -> None:
+        """
+        Delete keys of a category.
+
+        Args:
+            category: (string) the category of data.
+            keys: (list) data's keys.
+        """
+        with self.begin():
+            for stmt in self.delete_many_stmts(category, keys):
+                self.session.execute(stmt)
+
+    async def delete_categories(self, categories: list) -> None:
+        """
+        Remove all values of categories.
+
+        Args:
+            categories: (list) categories' names.
+        """
+        with self.begin():
+            for stmt in self.delete_categories_stmts(categories):
+                self.session.execute(stmt)
+
+    async def load_categories(self, categories: list) -> dict:
+        """
+        Get all data of categories.
+
+        Args:
+            categories: (list) categories' names.
+
+        Return:
+            (dict): {category: {key: value}}, categories not found are omitted.
+        """
+        all_data = {}
+        for stmt in self.load_categories_stmts(categories):
+            result = self.session.execute(stmt)
+            all_data.update(self.values_to_categories(result))
+        return all_data
+
     def transaction_enter(self) -> None:
         self.trans = self.session.begin()
         self.trans.__enter__()
@@ -1,13 +1,61 @@
-
 import weakref
+import asyncio
+from contextvars import ContextVar
+from contextlib import AsyncExitStack
+from muddery.common.utils.exception import MudderyError, ERR
+
+
+# The transaction of the current task.
+current_transaction = ContextVar("current_transaction", default=None)
+
+
+# The value of a key deleted in a transaction.
+DELETED = object()
+
+# The key has not been changed in a transaction.
+UNCHANGED = object()
+
+
+def get_transaction():
+    """
+    Get the transaction of the current task, return None if there is no transaction.
+
+    Tasks created in a transaction inherit the context variable, but they are not in the
+    transaction. They can not read its uncommitted changes or use its locks.
+    """
+    context = current_transaction.get()
+    if context is not None and context.task is asyncio.current_task():
+        return context
+    return None
 
 
 class Transaction(object):
     """
     Guarantee the transaction execution of a given block.
+
+    Use "async with" to begin a transaction of the current task. Writes to cached storages in the
+    block are kept in the transaction, only the task itself can read them. They are written to
+    the database and then to caches when the outermost block exits. If a block raises an
+    exception, its changes are dropped. Nested blocks work as savepoints.
+
+    Categories loaded with "for_update" in the block are locked until the transaction finishes,
+    so other tasks can not change them between reading and writing.
+
+    Tasks created in the block are not in the transaction. Their writes are committed at once and
+    they wait for categories locked by the transaction like other tasks, so do not wait for them
+    in the block if they write these categories.
+
+    If the transaction writes through, changes of write-behind storages are written to the
+    database in the same database transaction too, instead of being flushed later.
+
+    The synchronous "with" block only wraps the storage's own transaction.
     """
-    def __init__(self, storage):
+    def __init__(self, storage, write_through: bool = False):
         self.storage = weakref.proxy(storage)
+        self.write_through = write_through
+        self.context = None
+        self.token = None
+        self.savepoint = None
 
     def __enter__(self):
         self.storage.transaction_enter()
@@ -17,3 +65,276 @@ class Transaction(object):
             self.storage.transaction_success(exc_type, exc_value, traceback)
         else:
             self.storage.transaction_failed(exc_type, exc_value, traceback)
+
+    async def __aenter__(self):
+        self.context = get_transaction()
+        if self.context is None:
+            self.context = TransactionContext()
+            self.token = current_transaction.set(self.context)
+
+        if self.write_through:
+            self.context.write_through = True
+
+        self.savepoint = self.context.savepoint()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        context = self.context
+        self.context = None
+
+        if exc_type is not None:
+            context.rollback_to(self.savepoint)
+
+        if self.token is None:
+            # It is a nested transaction.
+            return
+
+        current_transaction.reset(self.token)
+        self.token = None
+
+        if exc_type is None:
+            await context.commit()
+        else:
+            await context.release()
+
+
+class CategoryChanges(object):
+    """
+    Uncommitted changes of a category in a transaction.
+    """
+    __slots__ = ("cleared", "evict", "values")
+
+    def __init__(self, cleared: bool = False, evict: bool = False):
+        # All committed values of the category have been removed.
+        self.cleared = cleared
+
+        # Remove the category from the cache after committing.
+        self.evict = evict
+
+        # Changed values. {key: value or DELETED}
+        self.values = {}
+
+    def get(self, key: str) -> any:
+        """
+        Get a key's value in the transaction.
+
+        Return:
+            the value, DELETED if the key does not exist, or UNCHANGED if the transaction has not
+            changed it.
+        """
+        try:
+            return self.values[key]
+        except KeyError:
+            return DELETED if self.cleared else UNCHANGED
+
+    def apply(self, data: dict) -> dict:
+        """
+        Apply changes to a category's committed data.
+        """
+        result = {} if self.cleared else dict(data)
+        for key, value in self.values.items():
+            if value is DELETED:
+                result.pop(key, None)
+            else:
+                result[key] = value
+        return result
+
+
+class TransactionContext(object):
+    """
+    A task's transaction. It records writes to flush and changes of categories.
+    """
+    def __init__(self):
+        self.task = asyncio.current_task()
+
+        # Writes to flush when committing.
+        # [(storage, operation, category, args)]
+        self.writes = []
+
+        # Uncommitted changes.
+        # {(storage's id, category): (storage, CategoryChanges)}
+        self.changes = {}
+
+        # Data to restore changes, used to roll back to savepoints.
+        # [(storage, category, key, value before the change)], the key is None if the whole
+        # category has been changed, then the value is the category's last CategoryChanges.
+        self.undo = []
+
+        # Categories locked by the transaction, they are released when the transaction finishes.
+        # {(storage's id, category)}
+        self.locked = set()
+        self.lock_stack = AsyncExitStack()
+
+        # Write changes of write-behind storages to the database when committing.
+        self.write_through = False
+
+    def savepoint(self) -> tuple:
+        """
+        Begin a savepoint.
+        """
+        return len(self.writes), len(self.undo)
+
+    def has_lock(self, storage, category: str) -> bool:
+        """
+        Check if the transaction has locked the category.
+        """
+        return (id(storage), category) in self.locked
+
+    def count_locks(self, storage) -> int:
+        """
+        Get the number of the storage's categories locked by the transaction.
+        """
+        storage_id = id(storage)
+        return sum(1 for item in self.locked if item[0] == storage_id)
+
+    async def lock(self, storage, category: str) -> None:
+        """
+        Lock a category until the transaction finishes.
+        """
+        if (id(storage), category) in self.locked:
+            return
+
+        await self.lock_stack.enter_async_context(storage.locks.category(category))
+        self.locked.add((id(storage), category))
+
+    def get_changes(self, storage, category: str):
+        """
+        Get a category's uncommitted changes.
+
+        Return:
+            (CategoryChanges): changes, or None if the category has not been changed.
+        """
+        try:
+            return self.changes[(id(storage), category)][1]
+        except KeyError:
+            return None
+
+    def set_value(self, storage, category: str, key: str, value: any) -> None:
+        """
+        Change a key's value, DELETED means deleting the key.
+        """
+        try:
+            changes = self.changes[(id(storage), category)][1]
+        except KeyError:
+            changes = CategoryChanges()
+            self.changes[(id(storage), category)] = (storage, changes)
+            self.undo.append((storage, category, None, None))
+
+        self.undo.append((storage, category, key, changes.values.get(key, UNCHANGED)))
+        changes.values[key] = value
+
+    def clear_category(self, storage, category: str, evict: bool = False) -> None:
+        """
+        Remove all values of a category.
+
+        :param evict: remove the category from the cache after committing.
+        """
+        item = self.changes.get((id(storage), category))
+        self.undo.append((storage, category, None, item[1] if item else None))
+        self.changes[(id(storage), category)] = (storage, CategoryChanges(cleared=True, evict=evict))
+
+    def add_write(self, storage, operation: str, category: str, *args) -> None:
+        """
+        Record a write to flush.
+        """
+        self.writes.append((storage, operation, category, args))
+
+    def rollback_to(self, savepoint: tuple) -> None:
+        """
+        Remove changes after the savepoint.
+        """
+        writes, undo = savepoint
+        del self.writes[writes:]
+
+        for storage, category, key, value in reversed(self.undo[undo:]):
+            if key is None:
+                if value is None:
+                    del self.changes[(id(storage), category)]
+                else:
+                    self.changes[(id(storage), category)] = (storage, value)
+            else:
+                changes = self.changes[(id(storage), category)][1]
+                if value is UNCHANGED:
+                    del changes.values[key]
+                else:
+                    changes.values[key] = value
+        del self.undo[undo:]
+
+    async def commit(self) -> None:
+        """
+        Write all changes to the database, then to caches.
+        """
+        try:
+            if not self.writes:
+                return
+
+            storages = []
+            for storage, operation, category, args in self.writes:
+                if storage not in storages:
+                    storages.append(storage)
+
+            # Storages written in the database transaction.
+            db_storages = [storage for storage in storages if self.write_through or not storage.write_behind]
+
+            # Writes in different databases can not be committed together.
+            databases = {storage.get_database() for storage in db_storages}
+            databases.discard(None)
+            if len(databases) > 1:
+                raise MudderyError(ERR.server_error, "A transaction can not write to more than one database.")
+
+            # Lock changed categories in a fixed order, so transactions will not wait for each other.
+            for storage_id, category in sorted(self.changes, key=lambda item: (item[0], str(item[1]))):
+                await self.lock(self.changes[(storage_id, category)][0], category)
+
+            # Dirty data of write-behind storages written in the database transaction.
+            # [(storage, dirty data)]
+            written = []
+            try:
+                async with AsyncExitStack() as stack:
+                    for storage in db_storages:
+                        if storage.write_behind:
+                            # Other flushes can not write the same keys at the same time.
+                            await stack.enter_async_context(storage.flush_lock)
+                        await stack.enter_async_context(storage.db_transaction())
+
+                    for storage, operation, category, args in self.writes:
+                        if not storage.write_behind:
+                            await storage.apply_write(operation, category, *args)
+
+                    for storage in db_storages:
+                        if storage.write_behind:
+                            writes = [(operation, category, args) for item, operation, category, args
+                                      in self.writes if item is storage]
+                            written.append((storage, await storage.write_through(writes)))
+            except Exception:
+                for storage, dirty in written:
+                    storage.restore_dirty(dirty)
+                raise
+
+            for storage, dirty in written:
+                storage.release_dirty(dirty)
+
+            # The database has been committed, update caches.
+            for (storage_id, category), (storage, changes) in self.changes.items():
+                await storage.commit_changes(category, changes)
+
+            if not self.write_through:
+                for storage, operation, category, args in self.writes:
+                    if storage.write_behind:
+                        await storage.apply_write(operation, category, *args)
+
+                # Wait until write-behind changes are safe in journals.
+                for storage in storages:
+                    await storage.sync_journal()
+        finally:
+            await self.release()
+
+    async def release(self) -> None:
+        """
+        Drop changes and release locks of the transaction.
+        """
+        self.writes = []
+        self.changes = {}
+        self.undo = []
+        self.locked = set()
+        await self.lock_stack.aclose()
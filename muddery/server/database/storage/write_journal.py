@@ -0,0 +1,275 @@
+"""
+Append-only journal of write-behind changes, so changes not flushed to the database can be
+recovered after a crash.
+"""
+
+import os
+import zlib
+import struct
+import asyncio
+import datetime
+from muddery.server.database.gamedata.state_codecs import BinaryStateCodec
+from muddery.server.utils.logger import logger
+
+
+TAG_DATETIME = 0x20
+
+# A record's header: the length and the crc32 of its data.
+RECORD_HEADER = struct.Struct("<II")
+
+
+class JournalCodec(BinaryStateCodec):
+    """
+    The binary state codec which can pack datetime values of game data too.
+    """
+    def __init__(self):
+        super(JournalCodec, self).__init__()
+        self.packers[datetime.datetime] = self.pack_datetime
+
+    def pack_datetime(self, buffer: bytearray, value: datetime.datetime) -> None:
+        data = value.isoformat().encode("ascii")
+        buffer.append(TAG_DATETIME)
+        self.pack_length(buffer, len(data))
+        buffer += data
+
+    def unpack(self, buffer: bytes, pos: int) -> tuple:
+        if buffer[pos] == TAG_DATETIME:
+            length, pos = self.unpack_length(buffer, pos + 1)
+            end = pos + length
+            return datetime.datetime.fromisoformat(buffer[pos:end].decode("ascii")), end
+
+        return super(JournalCodec, self).unpack(buffer, pos)
+
+
+class WriteJournal(object):
+    """
+    Append every change of write-behind storages to journal files before it is flushed to the
+    database.
+
+    Records appended at the same time are written and synced to the disk together in a worker
+    thread, writers wait for the sync without blocking the event loop. Journal files are split
+    into segments. Before flushing caches, a new segment is started; after all caches have been
+    flushed, older segments are removed.
+    """
+    file_prefix = "journal."
+
+    def __init__(self, path: str, sync: bool = True):
+        """
+        :param path: the folder of journal files.
+        :param sync: writers wait until their records are synced to the disk.
+        """
+        self.path = path
+        self.sync_writes = sync
+        self.codec = JournalCodec()
+
+        os.makedirs(path, exist_ok=True)
+
+        # Segments left by the last run, they need to be recovered.
+        self.old_segments = self.get_segments()
+
+        # The segment to write new records.
+        self.segment = self.old_segments[-1] + 1 if self.old_segments else 1
+
+        # The opened file and its segment.
+        self.file = None
+        self.file_segment = None
+
+        # Records waiting to write.
+        self.buffer = bytearray()
+
+        # Resolved when records in the buffer are synced.
+        self.waiter = None
+
+        # Resolved when records being written are synced.
+        self.writing_waiter = None
+
+        self.commit_task = None
+
+    def get_segments(self) -> list:
+        """
+        Get numbers of existing segments in order.
+        """
+        segments = []
+        for name in os.listdir(self.path):
+            if name.startswith(self.file_prefix):
+                try:
+                    segments.append(int(name[len(self.file_prefix):]))
+                except ValueError:
+                    pass
+        return sorted(segments)
+
+    def segment_path(self, segment: int) -> str:
+        return os.path.join(self.path, "%s%s" % (self.file_prefix, segment))
+
+    def append(self, name: str, operation: str, category, args: tuple) -> None:
+        """
+        Add a change to the journal. It is written to the disk soon, call sync() to wait for it.
+
+        :param name: the storage's name.
+        :param operation: the name of the storage's method.
+        :param category: the category of data.
+        :param args: other arguments of the method.
+        """
+        data = bytearray()
+        self.codec.pack(data, (name, operation, category, tuple(args)))
+
+        if self.waiter is None:
+            self.waiter = asyncio.get_running_loop().create_future()
+        self.buffer += RECORD_HEADER.pack(len(data), zlib.crc32(data))
+        self.buffer += data
+
+        if self.commit_task is None:
+            self.commit_task = asyncio.create_task(self.commit())
+
+    async def sync(self) -> None:
+        """
+        Wait until all appended records are synced to the disk. Raise the error if they can not
+        be written.
+        """
+        if not self.sync_writes:
+            return
+
+        # Records being written are older than buffered records, wait for both of them.
+        for waiter in [self.writing_waiter, self.waiter]:
+            if waiter is not None:
+                await asyncio.shield(waiter)
+
+    async def commit(self) -> None:
+        """
+        Write buffered records in batches until the buffer is empty. Errors are passed to
+        writers waiting in sync().
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            while self.buffer:
+                data = self.buffer
+                self.buffer = bytearray()
+                self.writing_waiter = self.waiter
+                self.waiter = None
+
+                try:
+                    await loop.run_in_executor(None, self.write_file, self.segment, data)
+                except Exception as e:
+                    logger.log_err("Can not write the journal: %s" % e)
+                    self.resolve(self.writing_waiter, e)
+                else:
+                    self.resolve(self.writing_waiter)
+                self.writing_waiter = None
+        except BaseException as e:
+            # Writers must not wait for records which will never be written.
+            error = e if isinstance(e, Exception) else RuntimeError("Journal writing stopped.")
+            self.resolve(self.writing_waiter, error)
+            self.resolve(self.waiter, error)
+            self.writing_waiter = None
+            self.waiter = None
+            self.buffer = bytearray()
+            raise
+        finally:
+            self.commit_task = None
+
+    @staticmethod
+    def resolve(waiter, error: Exception = None) -> None:
+        """
+        Wake up writers waiting for a batch of records.
+
+        :param waiter: (Future) the batch's future.
+        :param error: the error of writing the batch, None if it has been written.
+        """
+        if waiter is None or waiter.done():
+            return
+
+        if error is None:
+            waiter.set_result(None)
+        else:
+            waiter.set_exception(error)
+            # Writers may not wait for it, do not report the error again when it is released.
+            waiter.exception()
+
+    def write_file(self, segment: int, data: bytes) -> None:
+        """
+        Write data to a segment and sync it. It runs in a worker thread.
+        """
+        if self.file_segment != segment:
+            if self.file:
+                self.file.close()
+            self.file = open(self.segment_path(segment), "ab")
+            self.file_segment = segment
+
+        self.file.write(data)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    async def drain(self) -> None:
+        """
+        Wait until all records have been written.
+        """
+        while self.commit_task is not None:
+            await asyncio.shield(self.commit_task)
+
+    def rotate(self) -> int:
+        """
+        Write new records to a new segment.
+
+        Return:
+            (int): the last segment before the new one.
+        """
+        self.segment += 1
+        return self.segment - 1
+
+    async def checkpoint(self, segment: int) -> None:
+        """
+        All changes in segments up to the given segment have been flushed, remove these segments.
+        """
+        await self.drain()
+
+        if self.file and self.file_segment <= segment:
+            self.file.close()
+            self.file = None
+            self.file_segment = None
+
+        self.remove([item for item in self.get_segments() if item <= segment])
+
+    def read(self, segments: list):
+        """
+        Read records of segments in order. A broken record at the end of a segment is the last
+        write before a crash, it is ignored.
+
+        Return:
+            (iterator): (storage's name, operation, category, args)
+        """
+        for segment in segments:
+            with open(self.segment_path(segment), "rb") as f:
+                data = f.read()
+
+            pos = 0
+            while pos + RECORD_HEADER.size <= len(data):
+                length, crc = RECORD_HEADER.unpack_from(data, pos)
+                start = pos + RECORD_HEADER.size
+                end = start + length
+                record = data[start:end]
+                if len(record) < length or zlib.crc32(record) != crc:
+                    logger.log_err("Broken record in journal segment %s at %s." % (segment, pos))
+                    break
+
+                yield self.codec.unpack(record, 0)[0]
+                pos = end
+
+    def remove(self, segments: list) -> None:
+        """
+        Remove segments' files.
+        """
+        for segment in segments:
+            try:
+                os.remove(self.segment_path(segment))
+            except FileNotFoundError:
+                pass
+
+    async def close(self) -> None:
+        """
+        Write all records and close the file.
+        """
+        await self.drain()
+        if self.file:
+            self.file.close()
+            self.file = None
+            self.file_segment = None
@@ -2,6 +2,7 @@
 Query and deal common tables.
 """
 
+from muddery.common.utils.utils import literal_value, copy_values
 from muddery.server.database.worlddata.base_query import BaseQuery
 from muddery.server.database.worlddata.worlddata import WorldData
 
@@ -11,3 +12,24 @@ class CharacterStatesDict(BaseQuery):
     Object properties dict.
     """
     table_name = "character_states_dict"
+
+    # Parsed default values: {state's key: value}
+    default_values = None
+
+    # The version of world data when values were parsed.
+    data_version = None
+
+    @classmethod
+    def get_default_values(cls):
+        """
+        Get states' default values parsed from their strings. Parsed values are kept until world
+        data changes, callers get their copies.
+
+        Returns:
+            (dict): {state's key: value}
+        """
+        if cls.default_values is None or cls.data_version != WorldData.version:
+            cls.default_values = {record.key: literal_value(record.default) for record in cls.all()}
+            cls.data_version = WorldData.version
+
+        return copy_values(cls.default_values)
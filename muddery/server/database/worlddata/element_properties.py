@@ -2,6 +2,7 @@
 Query and deal common tables.
 """
 
+from muddery.common.utils.utils import literal_value, copy_values
 from muddery.server.database.worlddata.base_query import BaseQuery
 from muddery.server.database.worlddata.worlddata import WorldData
 
@@ -12,6 +13,12 @@ class ElementProperties(BaseQuery):
     """
     table_name = "element_properties"
 
+    # Parsed values of properties: {(element's type, element's key, level): {property: value}}
+    parsed_values = {}
+
+    # The version of world data when values were parsed.
+    data_version = None
+
     @classmethod
     def get_properties(cls, element, key, level):
         """
@@ -23,3 +30,36 @@ class ElementProperties(BaseQuery):
             level: (number) object's level.
         """
         return WorldData.get_table_data(cls.table_name, element=element, key=key, level=level)
+
+    @classmethod
+    def get_values(cls, element, key, level):
+        """
+        Get element's properties' values parsed from their strings. Parsed values are kept until
+        world data changes, callers get their copies.
+
+        Args:
+            element: (string) element's type.
+            key: (string) element's key
+            level: (number) object's level.
+
+        Returns:
+            (dict): {property's key: value}
+        """
+        if cls.data_version != WorldData.version:
+            cls.parsed_values = {}
+            cls.data_version = WorldData.version
+
+        try:
+            return copy_values(cls.parsed_values[(element, key, level)])
+        except KeyError:
+            pass
+
+        values = {}
+        for record in cls.get_properties(element, key, level):
+            if record.value == "":
+                values[record.property] = None
+            else:
+                values[record.property] = literal_value(record.value)
+
+        cls.parsed_values[(element, key, level)] = values
+        return copy_values(values)
@@ -0,0 +1,121 @@
+"""
+A prebuilt file of world data's tables, so the server can load world data without querying the
+database.
+"""
+
+import os
+import mmap
+import struct
+import pickle
+from muddery.server.utils.logger import logger
+
+
+# The file's header: magic, format version and the length of the database's checksum.
+SNAPSHOT_HEADER = struct.Struct("<8sHH")
+
+
+class SnapshotUnpickler(pickle.Unpickler):
+    """
+    Only values of tables can be loaded from snapshots.
+    """
+    allowed_classes = {
+        ("array", "array"),
+        ("array", "_array_reconstructor"),
+        ("datetime", "datetime"),
+        ("datetime", "date"),
+        ("datetime", "time"),
+        ("decimal", "Decimal"),
+    }
+
+    def find_class(self, module, name):
+        if (module, name) not in self.allowed_classes:
+            raise pickle.UnpicklingError("Can not load %s.%s from the world data snapshot." % (module, name))
+        return super(SnapshotUnpickler, self).find_class(module, name)
+
+
+class WorldSnapshot(object):
+    """
+    A snapshot file keeps all tables' columns and indexes, and the checksum of the world data
+    database when it was built. If the database has been changed, the snapshot can not be used.
+
+    Tables are dumped together, so values shared by tables are stored once.
+    """
+    magic = b"MUDWORLD"
+
+    # Increase it when the format of tables' snapshots changes.
+    version = 1
+
+    def __init__(self, path):
+        """
+        :param path: the snapshot file's path.
+        """
+        self.path = path
+
+    def write(self, checksum, tables):
+        """
+        Write tables to the snapshot file.
+
+        :param checksum: (string) the checksum of the database.
+        :param tables: (dict) {table's name: table's snapshot}
+        """
+        checksum = checksum.encode("ascii")
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(SNAPSHOT_HEADER.pack(self.magic, self.version, len(checksum)))
+            f.write(checksum)
+            pickle.dump(tables, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(temp_path, self.path)
+
+    def read(self, checksum):
+        """
+        Read tables from the snapshot file.
+
+        :param checksum: (string) the checksum of the database.
+
+        Return:
+            (dict): {table's name: table's snapshot}, or None if the snapshot does not exist or
+                    does not match the database.
+        """
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return None
+
+        with f:
+            if os.fstat(f.fileno()).st_size < SNAPSHOT_HEADER.size:
+                logger.log_err("The world data snapshot is broken.")
+                return None
+
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return self.read_data(data, checksum)
+
+    def read_data(self, data, checksum):
+        """
+        Read tables from the mapped file.
+        """
+        magic, version, checksum_length = SNAPSHOT_HEADER.unpack_from(data, 0)
+        if magic != self.magic or version != self.version:
+            logger.log_info("The world data snapshot's format is out of date.")
+            return None
+
+        start = SNAPSHOT_HEADER.size
+        end = start + checksum_length
+        if data[start:end] != checksum.encode("ascii"):
+            logger.log_info("The world data snapshot does not match the database.")
+            return None
+
+        # Unpickle tables from the mapped file directly.
+        data.seek(end)
+        return SnapshotUnpickler(data).load()
+
+    def remove(self):
+        """
+        Remove the snapshot file.
+        """
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
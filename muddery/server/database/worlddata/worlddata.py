@@ -1,14 +1,18 @@
 """
 Load and cache all worlddata.
 """
+import time
 import importlib
 import inspect
 import traceback
+from collections import OrderedDict
 from muddery.common.utils.exception import MudderyError
 from muddery.server.settings import SETTINGS
 from muddery.server.database.storage.memory_record import MemoryRecord
 from muddery.server.database.storage.memory_table import MemoryTable
 from muddery.server.database.worlddata_db import WorldDataDB
+from muddery.server.database.worlddata.world_snapshot import WorldSnapshot
+from muddery.server.utils.logger import logger
 
 
 class WorldData(object):
@@ -17,12 +21,39 @@ class WorldData(object):
     """
     tables = {}
 
+    # It changes when loaded tables are changed.
+    version = 0
+
+    # Merged field layouts of tables.
+    # {tables' names: (all fields' positions, [(table's name, table's fields)])}
+    join_layouts = {}
+
+    # Records of get_tables_data, the least recently used ones are removed first.
+    # {(tables' names, key): record}
+    join_cache = OrderedDict()
+
+    # The max number of records in join_cache.
+    max_join_cache = 4096
+
     @classmethod
     def clear_all(cls):
         """
         Clear data.
         """
         cls.tables = {}
+        cls.join_layouts = {}
+        cls.join_cache = OrderedDict()
+        cls.version += 1
+
+    @classmethod
+    def clear_joins(cls, table_name):
+        """
+        Remove cached joins of a table.
+        """
+        cls.join_layouts = {tables: layout for tables, layout in cls.join_layouts.items() if table_name not in tables}
+        cls.join_cache = OrderedDict(
+            (item, record) for item, record in cls.join_cache.items() if table_name not in item[0]
+        )
 
     @classmethod
     def reload_all(cls):
@@ -31,14 +62,79 @@ class WorldData(object):
         """
         cls.clear_all()
 
-        module = importlib.import_module(SETTINGS.WORLD_DATA_MODEL_FILE)
-        models = [cls for cls in vars(module).values() if inspect.isclass(cls)]
-        for model in models:
-            config = SETTINGS.DATABASES[SETTINGS.WORLD_DATA_APP]
-            cls.tables[model.__name__] = MemoryTable(
-                SETTINGS.WORLD_DATA_APP,
-                config["MODELS"],
-                model.__name__)
+        for table_name in cls.get_table_names():
+            cls.load_table(table_name)
+
+    @classmethod
+    def get_table_names(cls):
+        """
+        Get all tables' names.
+        """
+        module = importlib.import_module(SETTINGS.WORLDDATA_DB["MODELS"])
+        return [name for name, model in vars(module).items() if inspect.isclass(model) and hasattr(model, "__table__")]
+
+    @classmethod
+    def save_snapshot(cls, path):
+        """
+        Reload all tables and save them to a snapshot file, so they can be loaded without querying
+        the database.
+
+        Args:
+            path: (string) the snapshot file's path.
+        """
+        snapshot = WorldSnapshot(path)
+        checksum = WorldDataDB.inst().get_checksum()
+        if checksum is None:
+            snapshot.remove()
+            return
+
+        cls.reload_all()
+        snapshot.write(checksum, {name: table.get_snapshot() for name, table in cls.tables.items()})
+
+    @classmethod
+    def load_snapshot(cls, path):
+        """
+        Load tables from a snapshot file if it matches the database. Tables which can not be loaded
+        from the snapshot will be loaded from the database when they are used.
+
+        Args:
+            path: (string) the snapshot file's path.
+
+        Return:
+            (boolean) tables are loaded from the snapshot.
+        """
+        start = time.perf_counter()
+        checksum = WorldDataDB.inst().get_checksum()
+        if checksum is None:
+            return False
+
+        try:
+            tables = WorldSnapshot(path).read(checksum)
+        except Exception as e:
+            logger.log_err("Can not read the world data snapshot: %s" % e)
+            return False
+
+        if tables is None:
+            return False
+
+        cls.clear_all()
+        config = SETTINGS.WORLDDATA_DB
+        for table_name in cls.get_table_names():
+            if table_name not in tables:
+                continue
+
+            try:
+                cls.tables[table_name] = MemoryTable(
+                    WorldDataDB.inst().get_session(),
+                    config["MODELS"],
+                    table_name,
+                    tables[table_name])
+            except Exception as e:
+                logger.log_err("Can not load table %s from the snapshot: %s" % (table_name, e))
+
+        logger.log_info("Loaded %d world data tables from the snapshot in %.3fs." %
+                        (len(cls.tables), time.perf_counter() - start))
+        return True
 
     @classmethod
     def refresh(cls, table_name):
@@ -47,6 +143,8 @@ class WorldData(object):
         """
         if table_name in cls.tables:
             del cls.tables[table_name]
+            cls.version += 1
+        cls.clear_joins(table_name)
 
     @classmethod
     def load_table(cls, table_name):
@@ -55,13 +153,42 @@ class WorldData(object):
         """
         try:
             config = SETTINGS.WORLDDATA_DB
+            replaced = table_name in cls.tables
             cls.tables[table_name] = MemoryTable(
                 WorldDataDB.inst().get_session(),
                 config["MODELS"],
                 table_name)
+            cls.clear_joins(table_name)
+            if replaced:
+                cls.version += 1
         except Exception as e:
             raise MudderyError("Can not load table %s: %s" % (table_name, e))
 
+    @classmethod
+    def reload_tables(cls, table_names):
+        """
+        Reload tables from the database and compare with their old data.
+
+        Args:
+            table_names: (list) tables' names
+
+        Return:
+            (dict): {table's name: keys of changed records}. Keys are None if changes can not be
+                    found by keys. Tables which have not been loaded have no changes, because
+                    nothing has used their data.
+        """
+        changes = {}
+        for table_name in table_names:
+            old_table = cls.tables.get(table_name)
+            cls.load_table(table_name)
+
+            if old_table is None:
+                changes[table_name] = set()
+            else:
+                changes[table_name] = cls.tables[table_name].get_changed_keys(old_table)
+
+        return changes
+
     @classmethod
     def get_fields(cls, table_name):
         if table_name not in cls.tables:
@@ -110,24 +237,68 @@ class WorldData(object):
         Return:
             (list) records
         """
-        all_fields = {}
-        row_data = []
-        for table_name in tables:
-            if table_name not in cls.tables:
-                cls.load_table(table_name)
+        tables = tuple(tables)
+        try:
+            record = cls.join_cache[(tables, key)]
+            cls.join_cache.move_to_end((tables, key))
+            return [record]
+        except KeyError:
+            pass
+
+        all_fields, table_fields = cls.get_join_layout(tables)
 
-            fields = cls.tables[table_name].fields()
+        row_data = []
+        found = False
+        for table_name, fields in table_fields:
             records = cls.tables[table_name].filter(key=key)
-            field_pos = dict(zip(fields, range(len(row_data), len(row_data) + len(fields))))
 
             if not records:
-                all_fields.update(field_pos)
                 row_data.extend([None] * len(fields))
             elif len(records) > 1:
                 raise MudderyError("Can not solve more than one records from table: %s" % table_name)
             else:
                 record = records[0]
-                all_fields.update(field_pos)
                 row_data.extend([getattr(record, field_name) for field_name in fields])
+                found = True
+
+        record = MemoryRecord(all_fields, row_data)
+        if found:
+            # Do not keep records of missing keys.
+            cls.join_cache[(tables, key)] = record
+            while len(cls.join_cache) > cls.max_join_cache:
+                cls.join_cache.popitem(last=False)
+
+        return [record]
+
+    @classmethod
+    def get_join_layout(cls, tables):
+        """
+        Get the merged field layout of tables. Fields of later tables override fields of
+        earlier tables with the same names.
+
+        Args:
+            tables: (tuple) tables' name
+
+        Return:
+            (dict, list): all fields' positions, [(table's name, table's fields)]
+        """
+        try:
+            return cls.join_layouts[tables]
+        except KeyError:
+            pass
+
+        all_fields = {}
+        table_fields = []
+        position = 0
+        for table_name in tables:
+            if table_name not in cls.tables:
+                cls.load_table(table_name)
+
+            fields = list(cls.tables[table_name].fields())
+            all_fields.update(zip(fields, range(position, position + len(fields))))
+            table_fields.append((table_name, fields))
+            position += len(fields)
 
-        return [MemoryRecord(all_fields, row_data)]
+        layout = (all_fields, table_fields)
+        cls.join_layouts[tables] = layout
+        return layout
@@ -19,27 +19,16 @@ from muddery.server.database.gamedata.system_data import SystemData
 from muddery.server.database.gamedata.account_characters import AccountCharacters
 from muddery.server.database.gamedata.character_info import CharacterInfo
 from muddery.server.database.gamedata.character_location import CharacterLocation
-from muddery.server.database.gamedata.character_revealed_map import CharacterRevealedMap
-from muddery.server.database.gamedata.character_inventory import CharacterInventory
-from muddery.server.database.gamedata.character_equipments import CharacterEquipments
-from muddery.server.database.gamedata.character_quests import CharacterQuests
-from muddery.server.database.gamedata.character_finished_quests import CharacterFinishedQuests
-from muddery.server.database.gamedata.character_skills import CharacterSkills
 from muddery.server.database.gamedata.character_combat import CharacterCombat
-from muddery.server.database.gamedata.character_closed_events import CharacterClosedEvents
-from muddery.server.database.gamedata.character_quest_objectives import CharacterQuestObjectives
-from muddery.server.database.gamedata.character_relationships import CharacterRelationships
-from muddery.server.database.gamedata.object_storage import CharacterObjectStorage
-from muddery.server.database.gamedata.honours_mapper import HonoursMapper
+from muddery.server.database.gamedata.character_bundle import CharacterBundle
 from muddery.server.elements.base_element import BaseElement
 from muddery.server.mappings.element_set import ELEMENT
 from muddery.server.combat.combat_handler import COMBAT_HANDLER
 from muddery.server.server import Server
-from muddery.server.utils.object_states_handler import ObjectStatesHandler
 from muddery.server.utils.game_settings import GameSettings
 from muddery.common.utils.exception import MudderyError, ERR
 from muddery.server.utils.localized_strings_handler import _
-from muddery.common.utils.utils import async_wait, async_gather
+from muddery.common.utils.utils import async_gather
 
 
 _SESSIONS = None
@@ -178,8 +167,16 @@ class MudderyAccount(BaseElement):
         Called before the logout process.
         """
         if self.puppet_obj:
+            char_db_id = self.puppet_obj.get_db_id()
             await self.unpuppet_character()
 
+            # Write the character's changes to the database.
+            try:
+                await CharacterBundle.inst().flush(char_db_id)
+            except Exception as e:
+                # Changes are kept in caches, they will be written by the next flush.
+                logger.log_err("Can not flush character %s's data: %s" % (char_db_id, e))
+
     async def get_all_characters(self):
         """
         Get this player's all playable characters.
@@ -192,7 +189,7 @@ class MudderyAccount(BaseElement):
         """
         char_all = await self.get_all_characters()
         if char_all:
-            nicknames = await async_gather([CharacterInfo.inst().get_nickname(c) for c in char_all])
+            nicknames = await CharacterInfo.inst().get_nicknames(list(char_all))
         else:
             nicknames = []
         return [{"name": nicknames[index], "id": char_id} for index, char_id in enumerate(char_all)]
@@ -241,10 +238,16 @@ class MudderyAccount(BaseElement):
         # was left with a lingering account/session reference from an unclean
         # server kill or similar
 
+        # Keep the character's data in caches while it is online.
+        CharacterBundle.inst().pin(char_db_id)
+
         # Find the character to puppet.
         try:
             new_char = None
 
+            # Load all the character's data at once.
+            await CharacterBundle.inst().load([char_db_id])
+
             # Check if the character is in a combat.
             combat_id = await CharacterCombat.inst().load(char_db_id, None)
             if combat_id is not None:
@@ -272,6 +275,7 @@ class MudderyAccount(BaseElement):
                 new_char.puppet(self)
                 await new_char.setup_element(char_key)
         except Exception as e:
+            CharacterBundle.inst().unpin(char_db_id)
             raise MudderyError(ERR.invalid_input, _("That is not a valid character choice."))
 
         # Set location
@@ -341,6 +345,8 @@ class MudderyAccount(BaseElement):
 
             Server.world.on_char_unpuppet(obj)
 
+            CharacterBundle.inst().unpin(obj.get_db_id())
+
             # Just to be sure we're always clear.
             self.puppet_obj = None
 
@@ -367,27 +373,8 @@ class MudderyAccount(BaseElement):
 
         await self.unpuppet_character()
 
-        # character object's data
-        object_states = ObjectStatesHandler(char_db_id, CharacterObjectStorage)
-
         # delete all character data.
-        await async_wait([
-            object_states.clear(),
-            AccountCharacters.inst().remove_character(self.id, char_db_id),
-            CharacterInfo.inst().remove_character(char_db_id),
-            CharacterLocation.inst().remove_character(char_db_id),
-            CharacterRevealedMap.inst().remove_character(char_db_id),
-            CharacterInventory.inst().remove_character(char_db_id),
-            CharacterEquipments.inst().remove_character(char_db_id),
-            CharacterQuests.inst().remove_character(char_db_id),
-            CharacterFinishedQuests.inst().remove_character(char_db_id),
-            CharacterSkills.inst().remove_character(char_db_id),
-            CharacterCombat.inst().remove_character(char_db_id),
-            CharacterClosedEvents.inst().remove_character(char_db_id),
-            CharacterQuestObjectives.inst().remove_character(char_db_id),
-            CharacterRelationships.inst().remove_character(char_db_id),
-            HonoursMapper.inst().remove_character(char_db_id),
-        ])
+        await CharacterBundle.inst().remove(self.id, [char_db_id])
 
     async def delete_all_characters(self):
         """
@@ -399,32 +386,9 @@ class MudderyAccount(BaseElement):
         await self.unpuppet_character()
 
         all_characters = await self.get_all_characters()
-        awaits = []
-        for char_db_id in all_characters:
-            # character object's data
-            object_states = ObjectStatesHandler(char_db_id, CharacterObjectStorage)
-
-            # delete all character data.
-            awaits.extend([
-                object_states.clear(),
-                AccountCharacters.inst().remove_character(self.id, char_db_id),
-                CharacterInfo.inst().remove_character(char_db_id),
-                CharacterLocation.inst().remove_character(char_db_id),
-                CharacterRevealedMap.inst().remove_character(char_db_id),
-                CharacterInventory.inst().remove_character(char_db_id),
-                CharacterEquipments.inst().remove_character(char_db_id),
-                CharacterQuests.inst().remove_character(char_db_id),
-                CharacterFinishedQuests.inst().remove_character(char_db_id),
-                CharacterSkills.inst().remove_character(char_db_id),
-                CharacterCombat.inst().remove_character(char_db_id),
-                CharacterClosedEvents.inst().remove_character(char_db_id),
-                CharacterQuestObjectives.inst().remove_character(char_db_id),
-                CharacterRelationships.inst().remove_character(char_db_id),
-                HonoursMapper.inst().remove_character(char_db_id),
-            ])
-
-        if awaits:
-            await async_wait(awaits)
+
+        # delete all character data.
+        await CharacterBundle.inst().remove(self.id, all_characters)
 
     async def check_password(self, username, raw_password):
         """
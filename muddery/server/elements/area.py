@@ -5,7 +5,9 @@ Areas are compose the whole map. Rooms are belongs to areas.
 
 """
 
-from muddery.common.utils.utils import async_wait
+import asyncio
+from muddery.common.utils.utils import async_wait, async_gather
+from muddery.server.settings import SETTINGS
 from muddery.server.utils.logger import logger
 from muddery.server.mappings.element_set import ELEMENT
 from muddery.server.database.worlddata.image_resource import ImageResource
@@ -31,6 +33,12 @@ class MudderyArea(ELEMENT("MATTER")):
         self.all_rooms = {}
         self.map_data = {}
 
+        # Only reload the area's data, keep rooms in it.
+        self.keep_rooms = False
+
+        # The timer to unload rooms' contents.
+        self.unload_timer = None
+
     async def at_element_setup(self, first_time):
         """
         Init the character.
@@ -50,7 +58,8 @@ class MudderyArea(ELEMENT("MATTER")):
                 logger.log_trace("Load background %s error: %s" % (resource, e))
 
         # load rooms in this area
-        await self.load_rooms()
+        if not self.keep_rooms:
+            await self.load_rooms()
 
     def get_appearance(self):
         """
@@ -102,19 +111,126 @@ class MudderyArea(ELEMENT("MATTER")):
         :return:
         """
         records = WorldRooms.get_by_area(self.get_element_key())
-        base_model = ELEMENT("ROOM").get_base_model()
 
         self.all_rooms = {}
         for record in records:
-            table_data = WorldData.get_table_data(base_model, key=record.key)
-            table_data = table_data[0]
-
-            new_obj = ELEMENT(table_data.element_type)()
-            self.all_rooms[record.key] = new_obj
+            self.all_rooms[record.key] = self.create_room(record.key)
 
         if self.all_rooms:
             await async_wait([obj.setup_element(key) for key, obj in self.all_rooms.items()])
 
+    def create_room(self, room_key):
+        """
+        Create a room's object, it needs to be set up later.
+
+        :param room_key: room's key.
+        :return: room's object
+        """
+        base_model = ELEMENT("ROOM").get_base_model()
+        table_data = WorldData.get_table_data(base_model, key=room_key)
+        table_data = table_data[0]
+
+        return ELEMENT(table_data.element_type)()
+
+    async def reload_element(self, changed_keys):
+        """
+        Reload the area and its rooms whose data have changed. Rooms with players in them are
+        not removed.
+
+        :param changed_keys: (set) keys of elements whose data have changed.
+        :return: (boolean) the area has changed.
+        """
+        changed = False
+        if self.get_element_key() in changed_keys:
+            self.keep_rooms = True
+            try:
+                await self.setup_element(self.get_element_key(), self.level)
+            finally:
+                self.keep_rooms = False
+            changed = True
+
+        records = WorldRooms.get_by_area(self.get_element_key())
+
+        all_rooms = {}
+        new_rooms = {}
+        for record in records:
+            if record.key in self.all_rooms:
+                all_rooms[record.key] = self.all_rooms[record.key]
+            else:
+                try:
+                    new_rooms[record.key] = self.create_room(record.key)
+                    all_rooms[record.key] = new_rooms[record.key]
+                except Exception as e:
+                    logger.log_trace("Load room %s error: %s" % (record.key, e))
+
+        for key, room in self.all_rooms.items():
+            if key not in all_rooms:
+                if any(char.is_player() for char in room.all_characters.values()):
+                    logger.log_warn("Can not remove room %s, there are players in it." % key)
+                    all_rooms[key] = room
+                else:
+                    await room.remove_contents()
+                    changed = True
+
+        # Reload existing rooms before adding new rooms.
+        awaits = [room.reload_element(changed_keys) for key, room in all_rooms.items() if key not in new_rooms]
+        if awaits:
+            results = await async_gather(awaits)
+            changed = changed or any(results)
+
+        if new_rooms:
+            await async_wait([obj.setup_element(key) for key, obj in new_rooms.items()])
+            changed = True
+
+        self.all_rooms = all_rooms
+        return changed
+
+    async def remove_contents(self):
+        """
+        Remove all rooms' objects and NPCs when the area is removed from the world.
+        """
+        self.cancel_unload()
+        for room in self.all_rooms.values():
+            await room.remove_contents()
+
+    def has_players(self):
+        """
+        Check if there are players in this area.
+        """
+        return any(char.is_player() for room in self.all_rooms.values() for char in room.all_characters.values())
+
+    def check_idle(self):
+        """
+        Unload rooms' contents later if there is no player in this area.
+        """
+        if self.unload_timer or SETTINGS.WORLD_AREA_IDLE_TIMEOUT <= 0:
+            return
+
+        if not self.has_players():
+            self.unload_timer = asyncio.get_running_loop().call_later(
+                SETTINGS.WORLD_AREA_IDLE_TIMEOUT,
+                self.unload_contents
+            )
+
+    def cancel_unload(self):
+        """
+        Stop unloading rooms' contents.
+        """
+        if self.unload_timer:
+            self.unload_timer.cancel()
+            self.unload_timer = None
+
+    def unload_contents(self):
+        """
+        Unload objects and NPCs of all rooms in this area if there is no player in it.
+        """
+        self.unload_timer = None
+        if self.has_players():
+            return
+
+        unloaded = [room.unload_contents() for room in self.all_rooms.values()]
+        logger.log_info("Unloaded %d rooms' contents of area %s." % (sum(unloaded), self.get_element_key()))
+
     def get_rooms_key(self):
         """
         Get keys of all rooms in this area.
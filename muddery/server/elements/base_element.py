@@ -2,9 +2,9 @@
 MudderyObject is an object which can load it's data automatically.
 """
 
-import ast
+from muddery.common.utils.utils import literal_value
 from muddery.server.utils.logger import logger
-from muddery.server.utils.data_field_handler import DataFieldHandler, ConstDataHolder
+from muddery.server.utils.data_field_handler import DataFieldHandler, ConstDataHolder, ConstPrototypes
 from muddery.server.database.worlddata.properties_dict import PropertiesDict
 from muddery.server.mappings.element_set import ELEMENT
 from muddery.server.database.worlddata.worlddata import WorldData
@@ -21,6 +21,9 @@ class BaseElement(object):
     # object's data model
     model_name = ""
 
+    # Elements with the same key and level share their const data.
+    share_const_data = True
+
     def __init__(self, *agrs, **wargs):
         super(BaseElement, self).__init__(*agrs, **wargs)
 
@@ -81,8 +84,10 @@ class BaseElement(object):
         :param
         refresh: (boolean) refresh properties data
         """
-        if "_all_properties_" not in cls.__dict__ or refresh:
+        if "_all_properties_" not in cls.__dict__ or refresh or \
+                cls.__dict__.get("_properties_version_") != WorldData.version:
             cls._all_properties_ = {}
+            cls._properties_version_ = WorldData.version
 
             if cls.element_type:
                 for c in cls.__bases__:
@@ -95,6 +100,7 @@ class BaseElement(object):
                         "name": record.name,
                         "desc": record.desc,
                         "default": record.default,
+                        "default_value": literal_value(record.default),
                     }
 
         return cls._all_properties_
@@ -175,6 +181,14 @@ class BaseElement(object):
 
         :return:
         """
+        if self.share_const_data:
+            prototype = ConstPrototypes.inst().get(self.element_type, element_key, level)
+            if prototype is not None:
+                self.const_data_handler.set_prototype(prototype)
+                return
+
+            self.const_data_handler.clear()
+
         # Load data.
         try:
             # Load db data.
@@ -192,6 +206,11 @@ class BaseElement(object):
 
         await self.load_custom_level_data(self.element_type, element_key, level)
 
+        if self.share_const_data:
+            prototype = ConstPrototypes.inst().add(self.element_type, element_key, level,
+                                                   self.const_data_handler.all())
+            self.const_data_handler.set_prototype(prototype)
+
     def load_base_data(self, model, key):
         """
         Get object's data from database.
@@ -280,19 +299,7 @@ class BaseElement(object):
         :return:
         """
         # Get custom data.
-        values = {}
-        for record in ElementProperties.get_properties(element_type, element_key, level):
-            key = record.property
-            serializable_value = record.value
-            if serializable_value == "":
-                value = None
-            else:
-                try:
-                    value = ast.literal_eval(serializable_value)
-                except (SyntaxError, ValueError) as e:
-                    # treat as a raw string
-                    value = serializable_value
-            values[key] = value
+        values = ElementProperties.get_values(element_type, element_key, level)
 
         # Set values.
         for key, info in self.get_properties_info().items():
@@ -307,11 +314,7 @@ class BaseElement(object):
                 # the value of another const
                 value = self.const_data_handler.get(info["default"])
             else:
-                try:
-                    value = ast.literal_eval(info["default"])
-                except (SyntaxError, ValueError) as e:
-                    # treat as a raw string
-                    value = info["default"]
+                value = info["default_value"]
 
             self.const_data_handler.add(key, value)
 
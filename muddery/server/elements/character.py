@@ -8,7 +8,7 @@ creation commands.
 
 """
 
-import time, traceback, ast
+import time, traceback
 from datetime import datetime
 import pytz
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
@@ -96,7 +96,7 @@ class MudderyCharacter(ELEMENT("MATTER")):
         Characters use memory to store status by default.
         :return:
         """
-        return ObjectStatesHandler(self.get_id(), MemoryObjectStorage)
+        return ObjectStatesHandler(self.get_id(), MemoryObjectStorage())
 
     def set_id(self, char_id):
         """
@@ -177,14 +177,15 @@ class MudderyCharacter(ELEMENT("MATTER")):
         # set states
         to_save = {}
         records = CharacterStatesDict.all()
+        default_values = CharacterStatesDict.get_default_values()
 
         if keep_states and records:
-            has_status = await async_gather([self.states.has(record.key) for record in records])
+            exist_states = await self.states.loads([record.key for record in records])
         else:
-            has_status = []
+            exist_states = {}
 
-        for index, record in enumerate(records):
-            if keep_states and has_status[index]:
+        for record in records:
+            if record.key in exist_states:
                 # Do not change existent states.
                 continue
 
@@ -193,11 +194,7 @@ class MudderyCharacter(ELEMENT("MATTER")):
                 # the value of another const
                 value = self.const_data_handler.get(record.default)
             else:
-                try:
-                    value = ast.literal_eval(record.default)
-                except (SyntaxError, ValueError) as e:
-                    # treat as a raw string
-                    value = record.default
+                value = default_values[record.key]
 
             # set the value.
             to_save[record.key] = value
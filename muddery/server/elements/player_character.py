@@ -66,6 +66,10 @@ class MudderyPlayerCharacter(ELEMENT("CHARACTER")):
     element_name = "Player Character"
     model_name = "player_characters"
 
+    # Player characters' levels are kept in their own records, level data also changes their
+    # body properties, so their const data is not shared.
+    share_const_data = False
+
     def __init__(self):
         """
         Initial the object.
@@ -157,7 +161,7 @@ class MudderyPlayerCharacter(ELEMENT("CHARACTER")):
         Characters use memory to store state by default.
         :return:
         """
-        return ObjectStatesHandler(self.get_db_id(), CharacterObjectStorage)
+        return ObjectStatesHandler(self.get_db_id(), CharacterObjectStorage.inst())
 
     def set_db_id(self, db_id):
         """
@@ -202,7 +206,7 @@ class MudderyPlayerCharacter(ELEMENT("CHARACTER")):
         Returns:
             None
         """
-        with CharacterInfo.inst().transaction():
+        async with CharacterInfo.inst().transaction():
             new_level = await self.get_level() + 1
             await self.set_level(new_level)
 
@@ -995,7 +999,7 @@ class MudderyPlayerCharacter(ELEMENT("CHARACTER")):
         :param receive_list:
         :return:
         """
-        with self.states.transaction():
+        async with self.states.transaction():
             remove = await self.remove_objects_by_list(remove_list)
             receive = await self.receive_objects(receive_list)
 
@@ -1190,7 +1194,7 @@ class MudderyPlayerCharacter(ELEMENT("CHARACTER")):
             item["obj"] = new_obj
 
         obj_num = item["number"]
-        with self.states.transaction():
+        async with self.states.transaction():
             # add to body
             await CharacterEquipments.inst().add(self.get_db_id(), body_position, item["object_key"], item["level"])
 
@@ -1237,7 +1241,7 @@ class MudderyPlayerCharacter(ELEMENT("CHARACTER")):
             new_position = 1
 
         # save to db first
-        with self.states.transaction():
+        async with self.states.transaction():
             await CharacterInventory.inst().add(self.get_db_id(), new_position, item["object_key"], 1, item["level"])
             await CharacterEquipments.inst().remove_equipment(self.get_db_id(), body_position)
 
@@ -1320,6 +1324,7 @@ class MudderyPlayerCharacter(ELEMENT("CHARACTER")):
             }
 
         # add new default skills
+        new_skills = {}
         for item in default_skills:
             key = item.skill
             if key not in self.skills:
@@ -1330,14 +1335,17 @@ class MudderyPlayerCharacter(ELEMENT("CHARACTER")):
                 }
 
                 # save skill
-                await CharacterSkills.inst().save(self.get_db_id(), key, {
+                new_skills[key] = {
                     "level": item.level,
                     "is_default": True,
                     "cd_finish": 0,
-                })
+                }
+
+        if new_skills:
+            await CharacterSkills.inst().save_skills(self.get_db_id(), new_skills)
 
         if to_delete:
-            await async_wait([CharacterSkills.inst().delete(self.get_db_id(), key) for key in to_delete])
+            await CharacterSkills.inst().delete_skills(self.get_db_id(), to_delete)
 
         if to_save:
             await async_wait([CharacterSkills.inst().save(self.get_db_id(), key, self.skills["level"], True, 0) for key in to_save])
@@ -1762,7 +1770,7 @@ class MudderyPlayerCharacter(ELEMENT("CHARACTER")):
         rankings = top_rankings
         rankings.extend([char_id for char_id in nearest_rankings if char_id not in top_rankings])
 
-        nicknames = await async_gather([CharacterInfo.inst().get_nickname(char_id) for char_id in rankings])
+        nicknames = await CharacterInfo.inst().get_nicknames(rankings)
 
         return [{
             "name": nicknames[index],
@@ -6,6 +6,8 @@ Rooms are simple containers that has no location of their own.
 """
 
 import ast
+import asyncio
+from muddery.server.settings import SETTINGS
 from muddery.server.utils.logger import logger
 from muddery.server.utils.game_settings import GameSettings
 from muddery.server.database.worlddata.image_resource import ImageResource
@@ -17,6 +19,7 @@ from muddery.common.utils.defines import ConversationType, EventType
 from muddery.server.utils.localized_strings_handler import _
 from muddery.server.database.worlddata.worlddata import WorldData
 from muddery.common.utils.utils import async_wait
+from muddery.server.server import Server
 
 
 class MudderyRoom(ELEMENT("MATTER")):
@@ -53,19 +56,29 @@ class MudderyRoom(ELEMENT("MATTER")):
         # }
         self.all_characters = {}
 
+        # Only reload the room's data, keep exits, objects and characters in it.
+        self.keep_contents = False
+
+        # Objects and NPCs have been loaded. In lazy room mode, they are loaded when the first
+        # player arrives.
+        self.contents_loaded = False
+        self.contents_lock = asyncio.Lock()
+
     async def at_element_setup(self, first_time):
         """
         Set data_info to the object.
         """
         await super(MudderyRoom, self).at_element_setup(first_time)
 
-        self.all_exits = {}
-        self.all_objects = {}
+        if not self.keep_contents:
+            self.all_exits = {}
+            self.all_objects = {}
 
-        # character_list: {
-        #   character's id: character's object
-        # }
-        self.all_characters = {}
+            # character_list: {
+            #   character's id: character's object
+            # }
+            self.all_characters = {}
+            self.contents_loaded = False
 
         self.peaceful = self.const.peaceful
 
@@ -91,12 +104,99 @@ class MudderyRoom(ELEMENT("MATTER")):
             except Exception as e:
                 logger.log_trace("Load background %s error: %s" % (resource, e))
 
+        if self.keep_contents:
+            return
+
+        if SETTINGS.WORLD_LAZY_ROOMS:
+            # Exits are needed by the map.
+            await self.load_exits()
+            return
+
         # Load exits, objects and NPCs.
         await async_wait([
             self.load_exits(),
             self.load_objects(),
             self.load_npcs(),
         ])
+        self.contents_loaded = True
+
+    async def load_contents(self):
+        """
+        Load objects and NPCs if they have not been loaded.
+        """
+        if self.contents_loaded:
+            return
+
+        async with self.contents_lock:
+            if self.contents_loaded:
+                return
+
+            await async_wait([
+                self.load_objects(),
+                self.load_npcs(),
+            ])
+            self.contents_loaded = True
+
+    def unload_contents(self):
+        """
+        Remove objects and NPCs, they will be loaded again when a player arrives. Rooms with
+        players or NPCs in combats are not unloaded.
+
+        :return: (boolean) contents have been unloaded.
+        """
+        if not self.contents_loaded or self.contents_lock.locked():
+            return False
+
+        for char in self.all_characters.values():
+            if char.is_player() or char.is_in_combat():
+                return False
+
+        for char in self.all_characters.values():
+            char.set_location(None)
+
+        self.all_objects = {}
+        self.all_characters = {}
+        self.contents_loaded = False
+        return True
+
+    async def remove_contents(self):
+        """
+        Remove objects and NPCs when the room is removed from the world.
+        """
+        for char in list(self.all_characters.values()):
+            if not char.is_player():
+                await self.at_character_leave(char)
+                char.set_location(None)
+
+        self.all_objects = {}
+
+    def get_area(self):
+        """
+        Get the area of this room.
+        """
+        return Server.world.get_area_by_room(self.get_element_key())
+
+    def get_objects_appearance(self):
+        """
+        Get objects' appearance from their data without loading them.
+        """
+        models = ELEMENT("WORLD_OBJECT").get_models()
+
+        appearance = []
+        for record in WorldObjects.get_location(self.get_element_key()):
+            try:
+                tables_data = WorldData.get_tables_data(models, record.key)
+                tables_data = tables_data[0]
+                appearance.append({
+                    "key": record.key,
+                    "name": tables_data.name,
+                    "desc": tables_data.desc,
+                    "icon": tables_data.icon,
+                })
+            except Exception as e:
+                logger.log_trace("Load object %s error: %s" % (record.key, e))
+
+        return appearance
 
     def load_map(self):
         """
@@ -110,7 +210,10 @@ class MudderyRoom(ELEMENT("MATTER")):
         if self.position:
             map_data["pos"] = self.position
 
-        map_data["objects"] = [item["obj"].get_appearance() for item in self.all_objects.values()]
+        if self.contents_loaded:
+            map_data["objects"] = [item["obj"].get_appearance() for item in self.all_objects.values()]
+        else:
+            map_data["objects"] = self.get_objects_appearance()
         map_data["exits"] = [item["obj"].get_appearance() for item in self.all_exits.values()]
 
         self.map_data = map_data
@@ -123,18 +226,14 @@ class MudderyRoom(ELEMENT("MATTER")):
         :return:
         """
         records = WorldNPCs.get_location(self.get_element_key())
-        models = ELEMENT("WORLD_NPC").get_models()
 
         self.all_characters = {}
         awaits = []
         for record in records:
             try:
-                tables_data = WorldData.get_tables_data(models, record.key)
-                tables_data = tables_data[0]
-
-                new_obj = ELEMENT(tables_data.element_type)()
+                new_obj, level = self.create_npc(record.key)
                 self.all_characters[new_obj.get_id()] = new_obj
-                awaits.append(new_obj.setup_element(tables_data.key, level=tables_data.level, first_time=True))
+                awaits.append(new_obj.setup_element(record.key, level=level, first_time=True))
             except Exception as e:
                 logger.log_trace("Load NPC %s error: %s" % (record.key, e))
 
@@ -152,19 +251,10 @@ class MudderyRoom(ELEMENT("MATTER")):
         :return:
         """
         records = WorldExits.get_location(self.get_element_key())
-        models = ELEMENT("EXIT").get_models()
 
         self.all_exits = {}
         for record in records:
-            tables_data = WorldData.get_tables_data(models, record.key)
-            tables_data = tables_data[0]
-
-            new_obj = ELEMENT(tables_data.element_type)()
-            self.all_exits[record.key] = {
-                "destination": tables_data.destination,
-                "verb": tables_data.verb,
-                "obj": new_obj,
-            }
+            self.all_exits[record.key] = self.create_exit(record.key)
 
         if self.all_exits:
             await async_wait([item["obj"].setup_element(key) for key, item in self.all_exits.items()])
@@ -176,22 +266,214 @@ class MudderyRoom(ELEMENT("MATTER")):
         :return:
         """
         records = WorldObjects.get_location(self.get_element_key())
-        models = ELEMENT("WORLD_OBJECT").get_models()
 
         self.all_objects = {}
         for record in records:
-            tables_data = WorldData.get_tables_data(models, record.key)
-            tables_data = tables_data[0]
-
-            new_obj = ELEMENT(tables_data.element_type)()
-
-            self.all_objects[record.key] = {
-                "obj": new_obj,
-            }
+            self.all_objects[record.key] = self.create_object(record.key)
 
         if self.all_objects:
             await async_wait([obj["obj"].setup_element(key) for key, obj in self.all_objects.items()])
 
+    def create_npc(self, npc_key):
+        """
+        Create an NPC's object, it needs to be set up later.
+
+        :param npc_key: NPC's key.
+        :return: (tuple) NPC's object, NPC's level
+        """
+        models = ELEMENT("WORLD_NPC").get_models()
+        tables_data = WorldData.get_tables_data(models, npc_key)
+        tables_data = tables_data[0]
+
+        return ELEMENT(tables_data.element_type)(), tables_data.level
+
+    def create_exit(self, exit_key):
+        """
+        Create an exit's object, it needs to be set up later.
+
+        :param exit_key: exit's key.
+        :return: (dict) exit's info
+        """
+        models = ELEMENT("EXIT").get_models()
+        tables_data = WorldData.get_tables_data(models, exit_key)
+        tables_data = tables_data[0]
+
+        return {
+            "destination": tables_data.destination,
+            "verb": tables_data.verb,
+            "obj": ELEMENT(tables_data.element_type)(),
+        }
+
+    def create_object(self, object_key):
+        """
+        Create an object, it needs to be set up later.
+
+        :param object_key: object's key.
+        :return: (dict) object's info
+        """
+        models = ELEMENT("WORLD_OBJECT").get_models()
+        tables_data = WorldData.get_tables_data(models, object_key)
+        tables_data = tables_data[0]
+
+        return {
+            "obj": ELEMENT(tables_data.element_type)(),
+        }
+
+    async def reload_element(self, changed_keys):
+        """
+        Reload the room and its exits, objects and NPCs whose data have changed. Players stay in
+        the room, NPCs in combats are not changed.
+
+        :param changed_keys: (set) keys of elements whose data have changed.
+        :return: (boolean) the room has changed.
+        """
+        changed = False
+        if self.get_element_key() in changed_keys:
+            self.keep_contents = True
+            try:
+                await self.setup_element(self.get_element_key(), self.level)
+            finally:
+                self.keep_contents = False
+            changed = True
+
+        exits_changed = await self.reload_exits(changed_keys)
+        changed = changed or exits_changed
+
+        if self.contents_loaded:
+            # Objects and NPCs which have not been loaded will be loaded with new data.
+            objects_changed = await self.reload_objects(changed_keys)
+            npcs_changed = await self.reload_npcs(changed_keys)
+            changed = changed or objects_changed or npcs_changed
+
+        if changed:
+            # Show the room's changes to players.
+            for char in self.all_characters.values():
+                if char.is_player():
+                    char.msg({"look_around": char.look_around()})
+
+        return changed
+
+    async def reload_contents(self, contents, records, changed_keys, create):
+        """
+        Reload exits or objects. Changed ones are created again, others are kept.
+
+        :param contents: (dict) current exits or objects, {key: info}
+        :param records: records of exits or objects in this room.
+        :param changed_keys: (set) keys of elements whose data have changed.
+        :param create: the function to create an exit or object.
+        :return: (dict) new exits or objects, or None if nothing changed.
+        """
+        keys = [record.key for record in records]
+        if not changed_keys.intersection(keys) and not changed_keys.intersection(contents):
+            return None
+
+        new_contents = {}
+        created = {}
+        for key in keys:
+            if key in contents and key not in changed_keys:
+                new_contents[key] = contents[key]
+            else:
+                try:
+                    created[key] = create(key)
+                    new_contents[key] = created[key]
+                except Exception as e:
+                    logger.log_trace("Reload %s error: %s" % (key, e))
+
+        if created:
+            await async_wait([item["obj"].setup_element(key) for key, item in created.items()])
+
+        return new_contents
+
+    async def reload_exits(self, changed_keys):
+        """
+        Reload exits whose data have changed.
+
+        :param changed_keys: (set) keys of elements whose data have changed.
+        :return: (boolean) exits have changed.
+        """
+        records = WorldExits.get_location(self.get_element_key())
+        all_exits = await self.reload_contents(self.all_exits, records, changed_keys, self.create_exit)
+        if all_exits is None:
+            return False
+
+        self.all_exits = all_exits
+        return True
+
+    async def reload_objects(self, changed_keys):
+        """
+        Reload objects whose data have changed.
+
+        :param changed_keys: (set) keys of elements whose data have changed.
+        :return: (boolean) objects have changed.
+        """
+        records = WorldObjects.get_location(self.get_element_key())
+        all_objects = await self.reload_contents(self.all_objects, records, changed_keys, self.create_object)
+        if all_objects is None:
+            return False
+
+        self.all_objects = all_objects
+        return True
+
+    async def reload_npcs(self, changed_keys):
+        """
+        Reload NPCs whose data have changed. NPCs in combats are not changed.
+
+        :param changed_keys: (set) keys of elements whose data have changed.
+        :return: (boolean) NPCs have changed.
+        """
+        records = WorldNPCs.get_location(self.get_element_key())
+        keys = set([record.key for record in records])
+
+        npcs = [char for char in self.all_characters.values() if char.is_element("WORLD_NPC")]
+        live_keys = set([npc.get_element_key() for npc in npcs])
+        if not changed_keys.intersection(keys) and not changed_keys.intersection(live_keys):
+            return False
+
+        awaits = []
+        for npc in npcs:
+            npc_key = npc.get_element_key()
+            if npc_key not in changed_keys or npc.is_in_combat():
+                continue
+
+            if npc_key in keys:
+                try:
+                    new_obj, level = self.create_npc(npc_key)
+                    if type(new_obj) is type(npc):
+                        # Set up the NPC again.
+                        awaits.append(npc.setup_element(npc_key, level=level, first_time=True))
+                        continue
+                except Exception as e:
+                    logger.log_trace("Reload NPC %s error: %s" % (npc_key, e))
+                    continue
+
+            # The NPC has been removed or its type has changed.
+            await self.at_character_leave(npc)
+            npc.set_location(None)
+            live_keys.discard(npc_key)
+
+        if awaits:
+            await async_wait(awaits)
+
+        # Add new NPCs.
+        new_npcs = []
+        awaits = []
+        for npc_key in keys - live_keys:
+            try:
+                new_obj, level = self.create_npc(npc_key)
+                new_npcs.append(new_obj)
+                awaits.append(new_obj.setup_element(npc_key, level=level, first_time=True))
+            except Exception as e:
+                logger.log_trace("Load NPC %s error: %s" % (npc_key, e))
+
+        if awaits:
+            await async_wait(awaits)
+
+        for npc in new_npcs:
+            npc.set_location(self)
+            await self.at_character_arrive(npc)
+
+        return True
+
     def get_character(self, char_id):
         """
         Get a character in the room.
@@ -265,6 +547,21 @@ class MudderyRoom(ELEMENT("MATTER")):
         character (Object): The character moved into this one
 
         """
+        if SETTINGS.WORLD_LAZY_ROOMS:
+            if character.is_player():
+                self.get_area().cancel_unload()
+                await self.load_contents()
+            elif not self.contents_loaded:
+                await self.load_contents()
+                self.get_area().check_idle()
+
+                for char in self.all_characters.values():
+                    if char is not character and not char.is_player() and \
+                            char.get_element_key() == character.get_element_key():
+                        # The NPC has been created again from the room's data.
+                        character.set_location(None)
+                        return
+
         self.all_characters[character.get_id()] = character
 
         # send surrounding changes to player
@@ -292,6 +589,9 @@ class MudderyRoom(ELEMENT("MATTER")):
         except KeyError:
             pass
 
+        if SETTINGS.WORLD_LAZY_ROOMS and character.is_player():
+            self.get_area().check_idle()
+
         # send surrounding changes to player
         if not character.is_staff():
             # Players can not see staffs.
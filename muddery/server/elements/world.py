@@ -11,7 +11,8 @@ from muddery.server.database.worlddata.world_channels import WorldChannels
 from muddery.server.database.worlddata.worlddata import WorldData
 from muddery.common.utils.defines import ConversationType
 from muddery.common.utils.utils import class_from_path
-from muddery.common.utils.utils import async_wait
+from muddery.common.utils.utils import async_wait, async_gather
+from muddery.server.utils.logger import logger
 
 
 class MudderyWorld(BaseElement):
@@ -83,7 +84,6 @@ class MudderyWorld(BaseElement):
         Load all areas.
         """
         records = WorldAreas.all()
-        base_model = ELEMENT("AREA").get_base_model()
         self.all_areas = {}
 
         # self.room_dict {
@@ -91,19 +91,98 @@ class MudderyWorld(BaseElement):
         # }
         self.room_dict = {}
         for record in records:
-            table_data = WorldData.get_table_data(base_model, key=record.key)
-            table_data = table_data[0]
-
-            new_area = ELEMENT(table_data.element_type)()
-            self.all_areas[record.key] = new_area
+            self.all_areas[record.key] = self.create_area(record.key)
 
         if self.all_areas:
             await async_wait([area.setup_element(key) for key, area in self.all_areas.items()])
 
+        self.set_room_dict()
+
+    def create_area(self, area_key):
+        """
+        Create an area's object, it needs to be set up later.
+
+        :param area_key: area's key.
+        :return: area's object
+        """
+        base_model = ELEMENT("AREA").get_base_model()
+        table_data = WorldData.get_table_data(base_model, key=area_key)
+        table_data = table_data[0]
+
+        return ELEMENT(table_data.element_type)()
+
+    def set_room_dict(self):
+        """
+        Set the area of every room.
+        """
         self.room_dict = {
             room_key: area_key for area_key, area in self.all_areas.items() for room_key in area.get_rooms_key()
         }
 
+    async def reload_data(self, table_names):
+        """
+        Reload world data tables and update areas, rooms, exits, objects and NPCs whose data have
+        changed, other elements are kept. Players and NPCs in combats are not changed.
+
+        Elements are found by changed records' keys. Changes of tables without keys are loaded, but
+        elements using them are not updated until they are set up again, these tables are logged
+        and returned with None.
+
+        :param table_names: (list) tables' names.
+        :return: (dict) {table's name: the number of changed keys, or None if changes can not be
+                 found by keys}
+        """
+        changes = WorldData.reload_tables(table_names)
+
+        changed_keys = set()
+        for keys in changes.values():
+            if keys:
+                changed_keys.update(keys)
+
+        keyless_tables = [table_name for table_name, keys in changes.items() if keys is None]
+        if keyless_tables:
+            logger.log_warn("Changes of %s can not be found by keys, they will be applied to elements "
+                            "set up later." % ", ".join(keyless_tables))
+
+        if changed_keys:
+            records = WorldAreas.all()
+
+            all_areas = {}
+            new_areas = {}
+            for record in records:
+                if record.key in self.all_areas:
+                    all_areas[record.key] = self.all_areas[record.key]
+                else:
+                    try:
+                        new_areas[record.key] = self.create_area(record.key)
+                        all_areas[record.key] = new_areas[record.key]
+                    except Exception as e:
+                        logger.log_trace("Load area %s error: %s" % (record.key, e))
+
+            for key, area in self.all_areas.items():
+                if key not in all_areas:
+                    players = [char for room in area.all_rooms.values() for char in room.all_characters.values()
+                               if char.is_player()]
+                    if players:
+                        logger.log_warn("Can not remove area %s, there are players in it." % key)
+                        all_areas[key] = area
+                    else:
+                        await area.remove_contents()
+
+            # Reload existing areas before adding new areas.
+            awaits = [area.reload_element(changed_keys) for key, area in all_areas.items() if key not in new_areas]
+            if awaits:
+                await async_gather(awaits)
+
+            if new_areas:
+                await async_wait([area.setup_element(key) for key, area in new_areas.items()])
+
+            self.all_areas = all_areas
+            self.set_room_dict()
+            self.load_map()
+
+        return {table_name: None if keys is None else len(keys) for table_name, keys in changes.items()}
+
     def load_map(self):
         """
         Load the world's map data.
@@ -3,6 +3,7 @@ All available requests.
 """
 
 import os, re
+import json
 import traceback
 from importlib import import_module
 from muddery.server.settings import SETTINGS
@@ -15,6 +16,9 @@ class ElementSet(object):
     """
     All available classes.
     """
+    # Increase it when the manifest's format changes.
+    manifest_version = 1
+
     def __init__(self):
         self.module_dict = {}
         self.class_dict = {}
@@ -23,6 +27,58 @@ class ElementSet(object):
         self.match_class = re.compile(r'^class\s+(\w+)\s*.*$')
         self.match_key = re.compile(r""" {4}element_type\s*=\s*("|')(.+)("|')\s*$""")
 
+        # Elements found in files.
+        # {component's path: {file's path: [mtime, size, [[element type, module path], ...]]}}
+        self.manifest_path = None
+        self.manifest = {}
+        self.manifest_changed = False
+
+    def load_manifest(self, path):
+        """
+        Load the manifest of elements' files.
+
+        :param path: the manifest file's path.
+        """
+        self.manifest_path = path
+        self.manifest = {}
+        self.manifest_changed = False
+        if not path:
+            return
+
+        try:
+            with open(path, "r", encoding="utf-8") as fp:
+                data = json.load(fp)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logger.log_err("Can not read the element manifest: %s" % e)
+            return
+
+        if data.get("version") == self.manifest_version:
+            self.manifest = data.get("components", {})
+
+    def save_manifest(self):
+        """
+        Write the manifest if files have been changed.
+        """
+        if not self.manifest_path or not self.manifest_changed:
+            return
+
+        data = {
+            "version": self.manifest_version,
+            "components": self.manifest,
+        }
+
+        temp_path = self.manifest_path + ".tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as fp:
+                json.dump(data, fp)
+            os.replace(temp_path, self.manifest_path)
+            self.manifest_changed = False
+        except Exception as e:
+            # The game's folder may be read only.
+            logger.log_debug("Can not write the element manifest: %s" % e)
+
     def load_files(self, component_path):
         """
         Get elements' file path.
@@ -36,36 +92,64 @@ class ElementSet(object):
             return
 
         base_path = base_path[0]
+        last_files = self.manifest.get(component_path, {})
+        files_info = {}
         for root, dirs, files in os.walk(base_path):
             for filename in files:
                 name, ext = os.path.splitext(filename)
                 if ext != ".py":
                     continue
 
-                with open(os.path.join(root, filename), "r", encoding="utf-8") as fp:
-                    class_name = ""
-                    for line in fp.readlines():
-                        if not class_name:
-                            match = self.match_class.match(line)
-                            if match:
-                                class_name = match.group(1)
-                        else:
-                            match = self.match_key.match(line)
-                            if match:
-                                key_name = match.group(2)
+                file_path = os.path.join(root, filename)
+                stat = os.stat(file_path)
+                info = last_files.get(file_path)
+                if not info or info[0] != stat.st_mtime_ns or info[1] != stat.st_size:
+                    module_path = component_path
+                    if base_path != root:
+                        module_path += "." + get_module_path(os.path.relpath(root, base_path))
+                    module_path += "." + name
+
+                    info = [stat.st_mtime_ns, stat.st_size, self.scan_file(file_path, module_path)]
+                    self.manifest_changed = True
 
-                                module_path = component_path
-                                if base_path == root:
-                                    module_path += "." + name + "." + class_name
-                                else:
-                                    relative_path = get_module_path(os.path.relpath(root, base_path))
-                                    module_path += "." + relative_path + "." + name + "." + class_name
+                files_info[file_path] = info
 
-                                if key_name in self.module_dict:
-                                    logger.log_debug("Element %s is replaced by %s." % (key_name, module_path))
+                for key_name, module_path in info[2]:
+                    if key_name in self.module_dict:
+                        logger.log_debug("Element %s is replaced by %s." % (key_name, module_path))
 
-                                self.module_dict[key_name] = module_path
-                                class_name = ""
+                    self.module_dict[key_name] = module_path
+
+        if len(files_info) != len(last_files):
+            # Some files have been removed.
+            self.manifest_changed = True
+        self.manifest[component_path] = files_info
+
+    def scan_file(self, file_path, module_path):
+        """
+        Find element types declared in a file.
+
+        :param file_path: the file's path.
+        :param module_path: the file's module path.
+
+        Return:
+            (list): [[element type, class's path], ...]
+        """
+        elements = []
+        with open(file_path, "r", encoding="utf-8") as fp:
+            class_name = ""
+            for line in fp.readlines():
+                if not class_name:
+                    match = self.match_class.match(line)
+                    if match:
+                        class_name = match.group(1)
+                else:
+                    match = self.match_key.match(line)
+                    if match:
+                        elements.append([match.group(2), module_path + "." + class_name])
+                        class_name = ""
+
+        return elements
 
     def load_classes(self):
         """
@@ -174,5 +258,7 @@ class ElementSet(object):
 
 ELEMENT_SET = ElementSet()
 ELEMENT = ELEMENT_SET.get
+ELEMENT_SET.load_manifest(SETTINGS.ELEMENT_MANIFEST)
 ELEMENT_SET.load_files(SETTINGS.PATH_ELEMENTS_BASE)
 ELEMENT_SET.load_files(SETTINGS.PATH_ELEMENTS_CUSTOM)
+ELEMENT_SET.save_manifest()
@@ -1,8 +1,11 @@
 # The sanic server.
 
 from asyncio import CancelledError
+from muddery.common.networks import responses
 from muddery.common.networks.sanic_server import SanicServer
 from muddery.server.networks.sanic_session import SanicSession
+from muddery.server.database.storage.storage_metrics import StorageMetricsRegistry
+from muddery.server.database.worlddata.worlddata import WorldData
 from muddery.server.settings import SETTINGS
 from muddery.server.utils.logger import logger
 
@@ -34,9 +37,48 @@ class SanicGameServer(SanicServer):
             logger.log_info("[Connection closed] %s:%s" % (request.ip, request.port))
             await ws.close()
 
+        # dump storages' metrics
+        @app.get("/storage_stats")
+        async def storage_stats(request):
+            if request.ip != "127.0.0.1":
+                # Only can read from local.
+                return responses.error_response(status=401)
+
+            data = StorageMetricsRegistry.inst().dump()
+            if request.args.get("reset"):
+                StorageMetricsRegistry.inst().reset()
+            return responses.success_response(data)
+
+        # reload changed world data without restarting the server
+        @app.get("/reload_world_data")
+        async def reload_world_data(request):
+            if request.ip != "127.0.0.1":
+                # Only can reload from local.
+                return responses.error_response(status=401)
+
+            # Tables are separated by commas, reload all loaded tables by default.
+            tables = request.args.get("tables")
+            table_names = tables.split(",") if tables else list(WorldData.tables.keys())
+
+            from muddery.server.server import Server
+            try:
+                data = await Server.world.reload_data(table_names)
+            except Exception as e:
+                logger.log_trace("Can not reload world data: %s" % e)
+                return responses.error_response(msg=str(e))
+
+            return responses.success_response(data)
+
     @classmethod
     async def _run_before_server_start(cls, app, loop):
         await super(SanicGameServer, cls)._run_before_server_start(app, loop)
 
         from muddery.server.server import Server
         await Server.inst().init()
+
+    @classmethod
+    async def _run_before_server_stop(cls, app, loop):
+        await super(SanicGameServer, cls)._run_before_server_stop(app, loop)
+
+        from muddery.server.server import Server
+        await Server.inst().stop()
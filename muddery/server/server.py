@@ -4,8 +4,11 @@ from muddery.server.settings import SETTINGS
 from muddery.common.utils.singleton import Singleton
 from muddery.server.database.gamedata_db import GameDataDB
 from muddery.server.database.worlddata_db import WorldDataDB
-from muddery.common.utils.utils import classes_in_path
+from muddery.server.database.worlddata.worlddata import WorldData
+from muddery.common.utils.utils import classes_in_path, class_from_path
 from muddery.server.database.gamedata.base_data import BaseData
+from muddery.server.database.storage.cache_flusher import CacheFlusher
+from muddery.server.database.storage.write_journal import WriteJournal
 
 
 class Server(Singleton):
@@ -39,18 +42,46 @@ class Server(Singleton):
             return
 
         try:
+            storage_class = class_from_path(SETTINGS.DATABASE_STORAGE_OBJECT)
+
             WorldDataDB.inst().connect()
-            GameDataDB.inst().connect()
+            GameDataDB.inst().connect(async_engine=storage_class.require_async_engine)
         except Exception as e:
             traceback.print_exc()
             raise
 
+        if SETTINGS.WORLD_DATA_SNAPSHOT:
+            WorldData.load_snapshot(SETTINGS.WORLD_DATA_SNAPSHOT)
+
+        if SETTINGS.DATABASE_WRITE_BEHIND and SETTINGS.DATABASE_JOURNAL:
+            CacheFlusher.inst().open_journal(
+                WriteJournal(SETTINGS.DATABASE_JOURNAL_DIR, sync=SETTINGS.DATABASE_JOURNAL_SYNC)
+            )
+
+        # create storages
+        data_classes = list(classes_in_path(SETTINGS.PATH_GAMEDATA_DAO, BaseData))
+        for cls in data_classes:
+            cls.inst()
+
+        # write changes left by the last run before loading data
+        await CacheFlusher.inst().recover()
+
         # load classes
-        for cls in classes_in_path(SETTINGS.PATH_GAMEDATA_DAO, BaseData):
+        for cls in data_classes:
             await cls.inst().init()
 
+        if SETTINGS.DATABASE_WRITE_BEHIND:
+            CacheFlusher.inst().start(SETTINGS.DATABASE_FLUSH_INTERVAL)
+
         self.db_connected = True
 
+    async def stop(self):
+        """
+        Called before the server stops.
+        """
+        # Write all cached changes to the database.
+        await CacheFlusher.inst().stop()
+
     async def create_the_world(self):
         """
         Create the whole game world.
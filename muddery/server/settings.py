@@ -101,6 +101,10 @@ class Settings(object):
     # PASSWORD - db admin password (unused in sqlite3)
     # HOST - empty string is localhost (unused in sqlite3)
     # PORT - empty string defaults to localhost (unused in sqlite3)
+    # PROFILE - the engine's tuning profile: 'safe', 'default' or 'fast',
+    #           'default' keeps the database's own settings, 'fast' uses sqlite3's WAL mode,
+    #           see ENGINE_PROFILES in muddery/common/database/engines.py
+    # OPTIONS - values overriding the profile's options, such as {'SYNCHRONOUS': 'FULL'}
     ######################################################################
     GAMEDATA_DB = {
         'MODELS': 'gamedata.models',
@@ -111,6 +115,8 @@ class Settings(object):
         'HOST': '',
         'PORT': '',
         'DEBUG': False,
+        'PROFILE': 'default',
+        'OPTIONS': {},
     }
 
     WORLDDATA_DB = {
@@ -122,14 +128,65 @@ class Settings(object):
         'HOST': '',
         'PORT': '',
         'DEBUG': False,
+        'PROFILE': 'default',
+        'OPTIONS': {},
     }
 
     # Database Access Object
+    # To use asyncio database drivers (aiosqlite or aiomysql), use:
+    #     DATABASE_STORAGE_OBJECT = 'muddery.server.database.storage.async_table_kv_storage.AsyncTableKVStorage'
     DATABASE_STORAGE_OBJECT = 'muddery.server.database.storage.table_kv_storage.TableKVStorage'
 
     # Database Access Object without cache
     DATABASE_CACHE_OBJECT = 'muddery.server.database.storage.memory_kv_storage.MemoryKVStorage'
 
+    # Arguments to create cache objects.
+    # To limit the cache's size, use:
+    #     DATABASE_CACHE_OBJECT = 'muddery.server.database.storage.lru_kv_storage.LRUMemoryKVStorage'
+    #     DATABASE_CACHE_OPTIONS = {"max_categories": 1000, "ttl": 3600}
+    DATABASE_CACHE_OPTIONS = {}
+
+    # Arguments of a table's cache object, they override DATABASE_CACHE_OPTIONS.
+    # {table's name: {argument's name: value}}
+    DATABASE_CACHE_TABLE_OPTIONS = {}
+
+    # Write game data to the cache first and flush them to the database later.
+    # Changes will be flushed at regular intervals, on logout and on shutdown.
+    DATABASE_WRITE_BEHIND = False
+
+    # Seconds between two flushes in write-behind mode.
+    DATABASE_FLUSH_INTERVAL = 5
+
+    # Flush a table's changes at once when the number of its dirty keys reaches this value, 0 means no limit.
+    DATABASE_FLUSH_THRESHOLD = 500
+
+    # Append write-behind changes to a journal before they are flushed. Changes left in the journal
+    # are written to the database when the server starts next time, so a crash does not lose them.
+    DATABASE_JOURNAL = True
+
+    # The folder of journal files.
+    DATABASE_JOURNAL_DIR = os.path.join(GAME_DIR, "server", "journal")
+
+    # Wait until changes are synced to the disk. If it is False, changes made in the last
+    # moment before a crash may be lost, but writers never wait for the disk.
+    DATABASE_JOURNAL_SYNC = True
+
+    # Store a category's all data in one versioned record of another table, so a character's data
+    # can be loaded or saved in one query. These tables do not use the cache or write-behind.
+    # {table's name: blob table's name}, for example:
+    #     DATABASE_BLOB_TABLES = {"character_states": "character_state_blobs"}
+    DATABASE_BLOB_TABLES = {}
+
+    # Record cached tables' operation counts, database latencies, loaded rows, lock waits and
+    # cache lookups. They can be read from the game server's /storage_stats path on localhost.
+    DATABASE_METRICS = True
+
+    # The codec to convert object states to strings in the database.
+    # To write compact binary states, use:
+    #     OBJECT_STATE_CODEC = 'muddery.server.database.gamedata.state_codecs.BinaryStateCodec'
+    # It reads JSON states too, run "muddery migratestates" to convert them.
+    OBJECT_STATE_CODEC = 'muddery.server.database.gamedata.state_codecs.JSONStateCodec'
+
 
     ######################################################################
     # Web features
@@ -198,6 +255,10 @@ class Settings(object):
     # Path of custom elements.
     PATH_ELEMENTS_CUSTOM = "elements"
 
+    # A manifest of element types found in elements' files. Files which have not changed since
+    # the manifest was written are not scanned again. Set it to None to disable it.
+    ELEMENT_MANIFEST = os.path.join(GAME_DIR, "server", "elements.manifest")
+
     # Game data dao's path.
     PATH_GAMEDATA_DAO = "muddery.server.database.gamedata"
 
@@ -255,6 +316,20 @@ class Settings(object):
     # Localized string model's name
     LOCALIZED_STRINGS_MODEL = "localized_strings"
 
+    # A prebuilt file of all world data tables. It is built after loading game data and applying
+    # changes in the world editor. The server loads tables from it at startup instead of querying
+    # the database, if it matches the world data database. Set it to None to disable it.
+    WORLD_DATA_SNAPSHOT = os.path.join(GAME_DIR, "server", "worlddata.snapshot")
+
+    # Only load areas, rooms and exits when the server starts. Objects and NPCs in a room are
+    # loaded when the first player or NPC arrives, so the server starts faster and uses less
+    # memory in a large world.
+    WORLD_LAZY_ROOMS = False
+
+    # In lazy room mode, objects and NPCs in an area are unloaded after no player has been in
+    # the area for this number of seconds. 0 means never unload.
+    WORLD_AREA_IDLE_TIMEOUT = 0
+
 
     ###################################
     # combat settings
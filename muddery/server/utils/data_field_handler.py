@@ -4,7 +4,53 @@ Data are arbitrary data stored in worlddata tables. They are read only.
 """
 
 from builtins import object
+import copy
 import weakref
+from types import MappingProxyType
+from muddery.common.utils.singleton import Singleton
+from muddery.server.database.worlddata.worlddata import WorldData
+
+
+EMPTY_PROTOTYPE = MappingProxyType({})
+
+# Types of values which can be changed in place. Prototypes share them, so every element gets its
+# own copy.
+MUTABLE_TYPES = {list, dict, set}
+
+
+class ConstPrototypes(Singleton):
+    """
+    Elements with the same type, key and level have the same const data. Their data is loaded
+    once and shared as a read only prototype. Prototypes are cleared when world data changes.
+    """
+    def __init__(self):
+        # {(element's type, element's key, level): prototype}
+        self.prototypes = {}
+        self.data_version = WorldData.version
+
+    def get(self, element_type, element_key, level):
+        """
+        Get a prototype, return None if it does not exist.
+        """
+        if self.data_version != WorldData.version:
+            self.prototypes = {}
+            self.data_version = WorldData.version
+
+        return self.prototypes.get((element_type, element_key, level))
+
+    def add(self, element_type, element_key, level, values):
+        """
+        Add a prototype of const values. The values dict belongs to the prototype after it is
+        added, it should not be changed any more. Mutable values in it are copied when elements
+        read them.
+
+        Return:
+            the read only prototype.
+        """
+        prototype = MappingProxyType(values)
+        self.prototypes[(element_type, element_key, level)] = prototype
+        return prototype
+
 
 class DataFieldHandler(object):
     """
@@ -12,12 +58,17 @@ class DataFieldHandler(object):
     It is similar to `NAttributeHandler` and is used
     by the `.data` handler in the same way as `.ndb` does
     for the `NAttributeHandler`.
+
+    Values can be read from a shared prototype. Values added to the handler are kept by the
+    handler itself and override the prototype's values, the prototype is never changed.
     """
     def __init__(self, obj):
         """
         Initialized on the object
         """
-        self._store = {}
+        # Values added to the handler, it is created when the first value is added.
+        self._store = EMPTY_PROTOTYPE
+        self._prototype = EMPTY_PROTOTYPE
         self.obj = weakref.proxy(obj)
 
     def has(self, key):
@@ -31,7 +82,7 @@ class DataFieldHandler(object):
             has_data (bool): If Data is set or not.
 
         """
-        return key in self._store
+        return key in self._store or key in self._prototype
 
     def get(self, key):
         """
@@ -43,9 +94,22 @@ class DataFieldHandler(object):
         Returns:
             the value of the Data.
         """
-        if key not in self._store:
+        try:
+            return self._store[key]
+        except KeyError:
+            pass
+
+        try:
+            value = self._prototype[key]
+        except KeyError:
             raise AttributeError
-        return self._store.get(key)
+
+        if type(value) in MUTABLE_TYPES:
+            # Keep the element's own copy, so changes will not affect other elements.
+            value = copy.deepcopy(value)
+            self.add(key, value)
+
+        return value
 
     def add(self, key, value):
         """
@@ -56,14 +120,28 @@ class DataFieldHandler(object):
             value (any): The value to store.
 
         """
+        if self._store is EMPTY_PROTOTYPE:
+            self._store = {}
         self._store[key] = value
 
+    def set_prototype(self, prototype):
+        """
+        Read values from a shared prototype, values added before are removed.
+
+        Args:
+            prototype (Mapping): read only values.
+
+        """
+        self._store = EMPTY_PROTOTYPE
+        self._prototype = prototype
+
     def clear(self):
         """
         Remove all NAttributes from handler.
 
         """
-        self._store = {}
+        self._store = EMPTY_PROTOTYPE
+        self._prototype = EMPTY_PROTOTYPE
 
     def all(self):
         """
@@ -79,7 +157,13 @@ class DataFieldHandler(object):
                 setting of `return_tuples`.
 
         """
-        return self._store
+        if not self._prototype:
+            return self._store
+
+        values = {key: self.get(key) if type(value) in MUTABLE_TYPES else value
+                  for key, value in self._prototype.items()}
+        values.update(self._store)
+        return values
 
 
 class DataHolder(object):
@@ -22,10 +22,16 @@ class ObjectStatesHandler(object):
     """
     Handler for adding Attributes to the object.
     """
-    def __init__(self, obj_id, storage_class):
-        """Initialize handler."""
+    def __init__(self, obj_id, storage):
+        """
+        Initialize handler.
+
+        Args:
+            obj_id: the object's id.
+            storage: the storage of object states.
+        """
         self.obj_id = obj_id
-        self.storage = storage_class()
+        self.storage = storage
 
     async def has(self, key):
         """
@@ -57,6 +63,18 @@ class ObjectStatesHandler(object):
         """
         return await self.storage.load(self.obj_id, key, default)
 
+    async def loads(self, keys):
+        """
+        Get attributes.
+
+        Args:
+            keys (list): attributes' keys.
+
+        Returns:
+            result (dict): {key: value}, keys not found are omitted.
+        """
+        return await self.storage.load_keys(self.obj_id, keys)
+
     async def save(self, key, value):
         """
         Add attribute to object.
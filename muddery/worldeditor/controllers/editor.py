@@ -865,6 +865,41 @@ class QueryDialoguesTable(BaseRequestProcesser):
         return success_response(data)
 
 
+class ReloadWorldData(BaseRequestProcesser):
+    """
+    Apply changes of world data to the running game server without restarting it. Only elements
+    whose data have changed are reloaded.
+
+    Args:
+        tables: (list, optional) changed tables' names. Reload all tables by default.
+    """
+    path = "reload_world_data"
+    name = ""
+
+    async def func(self, args, request):
+        import httpx
+        from muddery.server.settings import SETTINGS
+
+        params = {}
+        if args and args.get("tables"):
+            params["tables"] = ",".join(args["tables"])
+
+        url = "http://localhost:%s/reload_world_data" % SETTINGS.GAME_SERVER_PORT
+        try:
+            async with httpx.AsyncClient() as client:
+                response = await client.get(url, params=params, timeout=60)
+            result = response.json()
+        except Exception as e:
+            message = "Can not reload world data: %s" % e
+            logger.log_trace(message)
+            raise MudderyError(ERR.build_world_error, message)
+
+        if result["code"] != 0:
+            raise MudderyError(ERR.build_world_error, "Can not reload world data: %s" % result["msg"])
+
+        return success_response(result["data"])
+
+
 class ApplyChanges(BaseRequestProcesser):
     """
     Query all tables' names.
@@ -876,6 +911,15 @@ class ApplyChanges(BaseRequestProcesser):
     name = ""
 
     async def func(self, args, request):
+        try:
+            # build the world data snapshot for the game server's startup
+            from muddery.server.settings import SETTINGS
+            if SETTINGS.WORLD_DATA_SNAPSHOT:
+                WorldData.save_snapshot(SETTINGS.WORLD_DATA_SNAPSHOT)
+        except Exception as e:
+            # The game server can still load world data from the database.
+            logger.log_trace("Can not build the world data snapshot: %s" % e)
+
         try:
             # restart the game server
             import subprocess
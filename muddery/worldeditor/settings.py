@@ -97,6 +97,10 @@ class Settings(object):
     # PASSWORD - db admin password (unused in sqlite3)
     # HOST - empty string is localhost (unused in sqlite3)
     # PORT - empty string defaults to localhost (unused in sqlite3)
+    # PROFILE - the engine's tuning profile: 'safe', 'default' or 'fast',
+    #           'default' keeps the database's own settings, 'fast' uses sqlite3's WAL mode,
+    #           see ENGINE_PROFILES in muddery/common/database/engines.py
+    # OPTIONS - values overriding the profile's options, such as {'SYNCHRONOUS': 'FULL'}
     ######################################################################
     WORLDEDITOR_DB = {
         'MODELS': 'worldeditor.models',
@@ -107,6 +111,8 @@ class Settings(object):
         'HOST': '',
         'PORT': '',
         'DEBUG': False,
+        'PROFILE': 'default',
+        'OPTIONS': {},
     }
 
 
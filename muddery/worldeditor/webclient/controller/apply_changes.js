@@ -7,6 +7,7 @@ controller = {
 
     bindEvents: function() {
         $("#apply-button").on("click", this.onApply);
+        $("#reload-button").on("click", this.onReload);
     },
 
     onApply: function(e) {
@@ -39,6 +40,41 @@ controller = {
         window.parent.controller.hideWaiting();
         window.parent.controller.notify("", "Apply failed: " + code + ": " + message);
     },
+
+    onReload: function(e) {
+        window.parent.controller.confirm("", "Reload world data?", controller.confirmReload);
+    },
+
+    confirmReload: function() {
+        window.parent.controller.hideWaiting();
+        window.parent.controller.showWaiting("", "Reloading world data. Please wait.");
+
+        service.reloadWorldData(null, controller.reloadSuccess, controller.reloadFailed);
+    },
+
+    reloadSuccess: function(data) {
+        window.parent.controller.hideWaiting();
+
+        // Changes of tables without keys can not be applied to existing elements.
+        var keyless_tables = [];
+        for (var table_name in data) {
+            if (data[table_name] === null) {
+                keyless_tables.push(table_name);
+            }
+        }
+
+        var message = "World data reloaded.";
+        if (keyless_tables.length > 0) {
+            message += " Changes of these tables will be used by elements set up later, " +
+                       "restart the server to apply them to all elements: " + keyless_tables.join(", ");
+        }
+        window.parent.controller.notify("", message);
+    },
+
+    reloadFailed: function(code, message, data) {
+        window.parent.controller.hideWaiting();
+        window.parent.controller.notify("", "Reload failed: " + code + ": " + message);
+    },
 }
 
 $(document).ready(function() {
@@ -482,6 +482,14 @@ service = {
         this.sendRequest("apply_changes", "", {}, callback_success, callback_failed);
     },
 
+    reloadWorldData: function(tables, callback_success, callback_failed) {
+        var args = {};
+        if (tables) {
+            args.tables = tables;
+        }
+        this.sendRequest("reload_world_data", "", args, callback_success, callback_failed);
+    },
+
     checkState: function(callback_success, callback_failed) {
         this.getData("state", callback_success, callback_failed);
     },
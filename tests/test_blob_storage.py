@@ -0,0 +1,91 @@
+"""
+Blob storages in task transactions.
+"""
+
+import asyncio
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from muddery.server.database import gamedata_models
+from muddery.server.database.storage.table_kv_storage import TableKVStorage
+from muddery.server.database.storage.blob_kv_storage import BlobKVStorage
+from muddery.server.database.gamedata.state_codecs import BinaryStateCodec
+
+
+def create_storage():
+    engine = create_engine("sqlite://")
+    gamedata_models.Base.metadata.create_all(engine)
+    session = Session(engine, autocommit=True)
+    records = TableKVStorage(session, gamedata_models.__name__, "character_state_blobs", "obj_id", None)
+    return BlobKVStorage(records, BinaryStateCodec())
+
+
+def test_uncommitted_writes_are_isolated():
+    async def run():
+        storage = create_storage()
+        await storage.save(1, "hp", 10)
+        changed = asyncio.Event()
+        checked = asyncio.Event()
+
+        async def write():
+            async with storage.transaction():
+                await storage.save(1, "hp", 5)
+                await storage.save(1, "mp", 3)
+                assert await storage.load_category(1) == {"hp": 5, "mp": 3}
+                changed.set()
+                await checked.wait()
+
+        async def read():
+            await changed.wait()
+            assert await storage.load_category(1) == {"hp": 10}
+            assert (await storage.storage.load(1, ""))["version"] == 1
+            checked.set()
+
+        await asyncio.gather(write(), read())
+        assert await storage.load_category(1) == {"hp": 5, "mp": 3}
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("pinned", [False, True])
+def test_rollback(pinned):
+    async def run():
+        storage = create_storage()
+        if pinned:
+            storage.pin(1)
+        await storage.save_many(1, {"hp": 10, "mp": 2})
+
+        with pytest.raises(RuntimeError):
+            async with storage.transaction():
+                await storage.save(1, "hp", 0)
+                await storage.delete(1, "mp")
+                await storage.delete_category(2)
+                raise RuntimeError
+
+        assert await storage.load_category(1) == {"hp": 10, "mp": 2}
+
+        async with storage.transaction():
+            await storage.save(1, "hp", 9)
+            with pytest.raises(RuntimeError):
+                async with storage.transaction():
+                    await storage.save(1, "mp", 0)
+                    raise RuntimeError
+
+        assert await storage.load_category(1) == {"hp": 9, "mp": 2}
+        storage.unpin(1)
+        assert await storage.load_category(1) == {"hp": 9, "mp": 2}
+
+    asyncio.run(run())
+
+
+def test_values_are_packed_once():
+    async def run():
+        storage = create_storage()
+        async with storage.transaction():
+            await storage.save(1, "items", [1, (2, 3)])
+            await storage.add(1, "hp", 10)
+
+        record = await storage.storage.load(1, "")
+        assert BinaryStateCodec().decode(record["data"]) == {"items": [1, (2, 3)], "hp": 10}
+
+    asyncio.run(run())
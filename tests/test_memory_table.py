@@ -0,0 +1,159 @@
+"""
+Columnar world data tables and their indexes.
+"""
+
+import pytest
+from array import array
+from sqlalchemy import create_engine, Column, Integer, String, UniqueConstraint
+from sqlalchemy.orm import Session, declarative_base
+from muddery.common.utils.exception import MudderyError
+from muddery.server.database.storage.memory_table import MemoryTable
+from muddery.server.database.worlddata.world_snapshot import WorldSnapshot
+
+
+Base = declarative_base()
+
+
+class fruits(Base):
+    __tablename__ = "fruits"
+    __table_args__ = (UniqueConstraint("key", "level"),)
+
+    id = Column(Integer, primary_key=True)
+    key = Column(String(80), index=True)
+    level = Column(Integer)
+    name = Column(String(80))
+    value = Column(Integer)
+
+
+ROWS = [
+    ("a", 1, "apple", 5),
+    ("a", 2, "apricot", None),
+    ("b", 1, "banana", 3),
+    ("b", 2, "blueberry", 8),
+    ("c", 1, "cherry", None),
+]
+
+
+def create_table():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = Session(engine)
+    session.add_all([fruits(id=i + 1, key=key, level=level, name=name, value=value)
+                     for i, (key, level, name, value) in enumerate(ROWS)])
+    session.commit()
+    return MemoryTable(session, __name__, "fruits")
+
+
+def names(records):
+    return [record.name for record in records]
+
+
+def test_equal():
+    table = create_table()
+    assert names(table.filter(key="a")) == ["apple", "apricot"]
+    assert names(table.filter(key="b", level=2)) == ["blueberry"]
+    assert names(table.filter(name="cherry")) == ["cherry"]
+    assert names(table.filter(value=None)) == ["apricot", "cherry"]
+    assert table.filter(key="d") == []
+    assert len(table.filter()) == len(ROWS)
+
+    with pytest.raises(MudderyError):
+        table.filter(color="red")
+
+
+def test_postings():
+    table = create_table()
+
+    # Several rows of a value are kept in an array.
+    assert table.index["key"]["c"] == 4
+    assert table.index["key"]["a"] == array("I", [0, 1])
+    assert table.index["key.level"][("b", 1)] == 2
+
+    # Fields are searched together in the order of their names.
+    assert names(table.filter(value=None, level=1)) == ["cherry"]
+    assert names(table.filter(level=1)) == ["apple", "banana", "cherry"]
+    assert table.adhoc_indexes["level.value"][(1, None)] == 4
+    assert table.adhoc_indexes["level"][1] == array("I", [0, 2, 4])
+
+
+def test_range():
+    table = create_table()
+
+    # Rows are in the order of values, None values are not compared.
+    assert names(table.filter(value__lt=5)) == ["banana"]
+    assert names(table.filter(value__gte=5)) == ["apple", "blueberry"]
+    assert names(table.filter(value__gte=3, value__lt=8)) == ["banana", "apple"]
+    assert names(table.filter(value__gt=8)) == []
+
+    assert names(table.filter(name__startswith="b")) == ["banana", "blueberry"]
+    assert names(table.filter(name__startswith="ap")) == ["apple", "apricot"]
+    assert names(table.filter(name__startswith="")) == sorted(row[2] for row in ROWS)
+
+    # Equal fields and compared fields together.
+    assert names(table.filter(key="a", value__gte=0)) == ["apple"]
+    assert names(table.filter(level__gte=2, name__startswith="b")) == ["blueberry"]
+
+
+def test_mixed_types():
+    table = create_table()
+
+    with pytest.raises(MudderyError):
+        table.filter(value__lt="x")
+
+    with pytest.raises(MudderyError):
+        table.filter(key="a", value__lt="x")
+
+    snapshot = table.get_snapshot()
+    column_data = list(snapshot["column_data"])
+    column_data[4] = (5, "five", 3, None, 1)
+    snapshot = dict(snapshot, column_data=column_data)
+    table = MemoryTable(None, __name__, "fruits", snapshot=snapshot)
+    assert names(table.filter(value="five")) == ["apricot"]
+    with pytest.raises(MudderyError):
+        table.filter(value__gte=1)
+
+
+def test_adhoc_index_eviction():
+    table = create_table()
+    table.max_adhoc_indexes = 2
+
+    table.filter(name="apple")
+    table.filter(value=5)
+    table.filter(name="banana")
+    table.filter(level=1)
+    assert list(table.adhoc_indexes.keys()) == ["name", "level"]
+
+    table.filter(value__gte=5)
+    assert list(table.adhoc_indexes.keys()) == ["level", "~value"]
+
+    # Declared indexes are never evicted.
+    table.filter(key="a")
+    stats = table.get_index_stats()
+    assert stats["evicted_indexes"] == 2
+    assert stats["indexes"]["name"] == dict(stats["indexes"]["name"], lookups=2, adhoc=True, cached=False)
+    assert stats["indexes"]["key"]["adhoc"] is False
+    assert stats["indexes"]["key"]["cached"] is True
+
+    # Evicted indexes are built again.
+    assert names(table.filter(name="banana")) == ["banana"]
+
+
+def test_snapshot(tmp_path):
+    table = create_table()
+    path = str(tmp_path / "world.snapshot")
+    WorldSnapshot(path).write("checksum", {"fruits": table.get_snapshot()})
+    assert WorldSnapshot(path).read("other") is None
+
+    loaded = MemoryTable(None, __name__, "fruits", snapshot=WorldSnapshot(path).read("checksum")["fruits"])
+    assert loaded.size == table.size
+    assert [(record.id, record.key, record.level, record.name, record.value) for record in loaded.all()] == \
+        [(record.id, record.key, record.level, record.name, record.value) for record in table.all()]
+    assert loaded.index == table.index
+    assert names(loaded.filter(key="a")) == ["apple", "apricot"]
+    assert names(loaded.filter(key="b", level=1)) == ["banana"]
+    assert names(loaded.filter(name__startswith="b")) == ["banana", "blueberry"]
+    assert loaded.get_changed_keys(table) == set()
+
+    snapshot = dict(table.get_snapshot(), columns=list(table.columns)[1:])
+    with pytest.raises(MudderyError):
+        MemoryTable(None, __name__, "fruits", snapshot=snapshot)
@@ -0,0 +1,99 @@
+"""
+Codecs of object states.
+"""
+
+import json
+import pytest
+from collections import OrderedDict
+from muddery.common.utils.exception import MudderyError
+from muddery.server.database.gamedata.state_codecs import JSONStateCodec, BinaryStateCodec
+
+
+VALUES = [
+    None,
+    True,
+    False,
+    0,
+    255,
+    256,
+    -1,
+    (1 << 63) - 1,
+    -(1 << 63),
+    1 << 100,
+    -(1 << 100),
+    1.5,
+    "",
+    "text",
+    "中文",
+    [],
+    [1, "a", None],
+    (1, (2, 3)),
+    {1, 2},
+    frozenset({"a"}),
+    {},
+    {"a": [1, {"b": (2, None)}], 3: {"c": {4, 5}}},
+    OrderedDict([("b", 1), ("a", [OrderedDict([("c", 2)])])]),
+]
+
+
+def assert_same(value, result):
+    assert result == value
+    assert type(result) is type(value)
+    if isinstance(value, dict):
+        assert list(result.keys()) == list(value.keys())
+        for key in value:
+            assert_same(value[key], result[key])
+    elif isinstance(value, (list, tuple)):
+        for item, result_item in zip(value, result):
+            assert_same(item, result_item)
+
+
+@pytest.mark.parametrize("value", VALUES)
+def test_binary_round_trip(value):
+    codec = BinaryStateCodec()
+    data = codec.encode(value)
+    assert codec.is_current(data)
+    assert_same(value, codec.decode(data))
+
+
+@pytest.mark.parametrize("value", VALUES)
+def test_legacy_round_trip(value):
+    legacy = JSONStateCodec()
+    data = legacy.encode(value)
+    assert legacy.is_current(data)
+    assert_same(value, legacy.decode(data))
+
+    # The binary codec reads legacy data.
+    codec = BinaryStateCodec()
+    assert not codec.is_current(data)
+    assert_same(value, codec.decode(data))
+
+
+def test_bigint_is_compact():
+    codec = BinaryStateCodec()
+    assert len(codec.encode(1 << 100)) < len(JSONStateCodec().encode(1 << 100))
+
+
+@pytest.mark.parametrize("data", [
+    json.dumps((1, "__import__('os').getcwd")),
+    json.dumps((1, "object")),
+    json.dumps(([[1, "print"]], "list")),
+    json.dumps({"a": 1}),
+    "not json",
+])
+def test_legacy_unknown_types(data):
+    with pytest.raises(MudderyError):
+        JSONStateCodec().decode(data)
+
+    with pytest.raises(MudderyError):
+        BinaryStateCodec().decode(data)
+
+
+def test_binary_bad_data():
+    codec = BinaryStateCodec()
+    data = codec.encode([1, 2])
+    with pytest.raises(MudderyError):
+        codec.decode(data[:-4])
+
+    with pytest.raises(MudderyError):
+        codec.decode(codec.prefix + "/w==")
@@ -0,0 +1,240 @@
+"""
+Transactions of cached storages.
+"""
+
+import asyncio
+import pytest
+from muddery.common.utils.exception import MudderyError
+from muddery.server.database.storage.memory_kv_storage import MemoryKVStorage
+from muddery.server.database.storage.memory_kv_cache import MemoryKVCache
+from muddery.server.database.storage.storage_with_cache import StorageWithCache
+
+
+def create_storage(write_behind=False):
+    return StorageWithCache(MemoryKVStorage(), MemoryKVCache(), write_behind=write_behind)
+
+
+@pytest.mark.parametrize("write_behind", [False, True])
+def test_rollback_keeps_concurrent_commit(write_behind):
+    async def run():
+        storage = create_storage(write_behind)
+        await storage.save("c", "a", 1)
+        changed = asyncio.Event()
+        committed = asyncio.Event()
+
+        async def rollback():
+            with pytest.raises(RuntimeError):
+                async with storage.transaction():
+                    await storage.save("c", "a", 2)
+                    assert await storage.load("c", "a") == 2
+                    changed.set()
+                    await committed.wait()
+                    raise RuntimeError
+
+        async def commit():
+            await changed.wait()
+            # Uncommitted writes of the other task can not be read.
+            assert await storage.load("c", "a") == 1
+            async with storage.transaction():
+                await storage.save("c", "b", 99)
+            committed.set()
+
+        await asyncio.gather(rollback(), commit())
+        await storage.flush()
+
+        assert await storage.load_category("c") == {"a": 1, "b": 99}
+        assert await storage.load("c", "b") == 99
+        assert await storage.storage.load_category("c") == {"a": 1, "b": 99}
+
+    asyncio.run(run())
+
+
+def test_rollback_to_savepoint():
+    async def run():
+        storage = create_storage()
+        await storage.save("c", "a", 1)
+
+        async with storage.transaction():
+            await storage.save("c", "a", 2)
+            with pytest.raises(RuntimeError):
+                async with storage.transaction():
+                    await storage.save("c", "a", 3)
+                    await storage.delete_category("c")
+                    assert await storage.load_category("c") == {}
+                    raise RuntimeError
+            assert await storage.load_category("c") == {"a": 2}
+
+        assert await storage.load_category("c") == {"a": 2}
+        assert await storage.storage.load_category("c") == {"a": 2}
+
+    asyncio.run(run())
+
+
+def test_load_for_update():
+    async def run():
+        storage = create_storage()
+        await storage.save("c", "a", 0)
+
+        async def increase():
+            async with storage.transaction():
+                value = await storage.load("c", "a", for_update=True)
+                await asyncio.sleep(0)
+                await storage.save("c", "a", value + 1)
+
+        await asyncio.gather(*[increase() for i in range(10)])
+        assert await storage.load("c", "a") == 10
+
+    asyncio.run(run())
+
+
+def test_reject_writes_to_databases():
+    class DatabaseStorage(MemoryKVStorage):
+        def get_database(self):
+            return id(self)
+
+    async def run():
+        storage1 = StorageWithCache(DatabaseStorage(), MemoryKVCache())
+        storage2 = StorageWithCache(DatabaseStorage(), MemoryKVCache())
+
+        with pytest.raises(MudderyError):
+            async with storage1.transaction():
+                await storage1.save("c", "a", 1)
+                await storage2.save("c", "a", 1)
+
+        assert await storage1.load_category("c") == {}
+        assert not await storage2.storage.has_category("c")
+
+    asyncio.run(run())
+
+
+def test_flush_keys():
+    async def run():
+        storage = create_storage(True)
+        await storage.save("", 1, {"name": "a"})
+        await storage.save("", 2, {"name": "b"})
+        await storage.save("c", "a", 1)
+
+        await storage.flush(keys=[("", 1)])
+        assert await storage.storage.load_category("", {}) == {1: {"name": "a"}}
+        assert not await storage.storage.has_category("c")
+        assert "" in storage.dirty_categories
+
+        await storage.flush(keys=[("", 2)])
+        assert await storage.storage.load_category("") == {1: {"name": "a"}, 2: {"name": "b"}}
+        assert "" not in storage.dirty_categories
+
+        # Keys saved after deleting their category are written after the deletion.
+        await storage.delete_category("c")
+        await storage.save("c", "b", 2)
+        await storage.flush(keys=[("c", "b")])
+        assert await storage.storage.load_category("c") == {"b": 2}
+        assert not storage.has_dirty()
+
+    asyncio.run(run())
+
+
+def test_write_through():
+    class BrokenStorage(MemoryKVStorage):
+        broken = False
+
+        async def delete_categories(self, categories):
+            if self.broken:
+                raise RuntimeError
+            await super(BrokenStorage, self).delete_categories(categories)
+
+    async def run():
+        storage1 = StorageWithCache(BrokenStorage(), MemoryKVCache(), write_behind=True)
+        storage2 = create_storage()
+        await storage1.save("c", "a", 1)
+        await storage1.save("d", "a", 1)
+        await storage2.save("c", "a", 1)
+
+        storage1.storage.broken = True
+        with pytest.raises(RuntimeError):
+            async with storage1.transaction(write_through=True):
+                await storage1.delete_categories(["c"])
+                await storage1.save("d", "b", 2)
+                await storage2.delete("c", "a")
+
+        # Dirty data are kept.
+        assert storage1.dirty_keys == {("c", "a"): False, ("d", "a"): False}
+        assert await storage1.load_category("c") == {"a": 1}
+
+        storage1.storage.broken = False
+        async with storage1.transaction(write_through=True):
+            await storage1.delete_categories(["c"])
+            await storage1.save("d", "b", 2)
+            await storage2.delete("c", "a")
+
+        # Changes and dirty data of changed keys are written at once.
+        assert storage1.dirty_keys == {("d", "a"): False}
+        assert storage1.dirty_categories == {"d"}
+        assert not await storage1.storage.has_category("c")
+        assert await storage1.storage.load_category("d") == {"b": 2}
+        assert await storage1.load_category("d") == {"a": 1, "b": 2}
+        assert await storage2.storage.load_category("c", {}) == {}
+
+    asyncio.run(run())
+
+
+def test_load_all_in_transaction():
+    async def run():
+        storage = create_storage()
+        await storage.save("c", "a", 1)
+        await storage.save("d", "a", 1)
+
+        async with storage.transaction():
+            value = await storage.load("c", "a", for_update=True)
+            await storage.save("c", "a", value + 1)
+            assert await storage.all() == {"c": {"a": 2}, "d": {"a": 1}}
+
+        assert await storage.all() == {"c": {"a": 2}, "d": {"a": 1}}
+
+    asyncio.run(asyncio.wait_for(run(), 5))
+
+
+def test_child_task_in_transaction():
+    async def run():
+        storage = create_storage()
+        await storage.save("c", "a", 0)
+
+        async def write():
+            await storage.save("c", "a", 10)
+
+        async with storage.transaction():
+            value = await storage.load("c", "a", for_update=True)
+            task = asyncio.create_task(write())
+            await asyncio.sleep(0.01)
+
+            # The task is not in the transaction, it waits for the transaction's lock.
+            assert not task.done()
+            assert await storage.load("c", "a") == 0
+            await storage.save("c", "a", value + 1)
+
+        await task
+        assert await storage.load("c", "a") == 10
+        assert await storage.storage.load("c", "a") == 10
+
+    asyncio.run(run())
+
+
+def test_all_cached_new_category():
+    async def run():
+        storage = create_storage()
+        await storage.save("c", "a", 1)
+        assert await storage.all() == {"c": {"a": 1}}
+
+        await storage.add("d", "a", 1)
+        await storage.save("e", "a", 1)
+        await storage.save_many("f", {"a": 1})
+        async with storage.transaction():
+            await storage.save("g", "a", 1)
+
+        # New categories are cached with all data.
+        assert storage.all_cached
+        assert await storage.cache.load_all() == {
+            "c": {"a": 1}, "d": {"a": 1}, "e": {"a": 1}, "f": {"a": 1}, "g": {"a": 1},
+        }
+        assert await storage.all() == await storage.storage.load_all()
+
+    asyncio.run(run())
@@ -0,0 +1,83 @@
+"""
+Recovering write-behind changes from the journal.
+"""
+
+import os
+import asyncio
+import pytest
+from muddery.server.database.storage.memory_kv_storage import MemoryKVStorage
+from muddery.server.database.storage.memory_kv_cache import MemoryKVCache
+from muddery.server.database.storage.storage_with_cache import StorageWithCache
+from muddery.server.database.storage.write_journal import WriteJournal
+from muddery.server.database.storage.cache_flusher import CacheFlusher
+
+
+def create_storage(storage, journal):
+    return StorageWithCache(storage, MemoryKVCache(), write_behind=True, name="data", journal=journal)
+
+
+def test_recover(tmp_path):
+    async def run():
+        database = MemoryKVStorage()
+        await database.save("c", "a", 1)
+        await database.save("d", "a", 1)
+
+        journal = WriteJournal(str(tmp_path))
+        storage = create_storage(database, journal)
+        await storage.save("c", "a", 2)
+        await storage.save("c", "b", {"x": 1})
+        async with storage.transaction():
+            await storage.save("e", "a", 3)
+            await storage.delete_category("d")
+            await storage.delete("c", "b")
+
+        # Crash before flushing, the last record is broken.
+        assert await database.load_all() == {"c": {"a": 1}, "d": {"a": 1}}
+        journal.file.close()
+        with open(os.path.join(str(tmp_path), os.listdir(str(tmp_path))[0]), "ab") as f:
+            f.write(b"\x30\x00\x00\x00\x01\x02")
+
+        journal = WriteJournal(str(tmp_path))
+        storage = create_storage(database, journal)
+        flusher = CacheFlusher()
+        flusher.open_journal(journal)
+        flusher.add(storage)
+        await flusher.recover()
+
+        assert await database.load_all() == {"c": {"a": 2}, "e": {"a": 3}}
+        assert await storage.load_category("c") == {"a": 2}
+        assert not os.listdir(str(tmp_path))
+        await journal.close()
+
+    asyncio.run(run())
+
+
+def test_write_error(tmp_path):
+    class BrokenJournal(WriteJournal):
+        def write_file(self, segment, data):
+            if b"broken" in data:
+                raise OSError("disk full")
+            super(BrokenJournal, self).write_file(segment, data)
+
+    async def run():
+        journal = BrokenJournal(str(tmp_path))
+        storage = create_storage(MemoryKVStorage(), journal)
+
+        with pytest.raises(OSError):
+            async with storage.transaction():
+                await storage.save("broken", "a", 1)
+
+        # Records after a failed batch do not hide its error.
+        journal.append("data", "save", "broken", ("b", 2))
+        await asyncio.sleep(0)
+        journal.append("data", "save", "c", ("c", 3))
+        with pytest.raises(OSError):
+            await journal.sync()
+        await journal.sync()
+
+        async with storage.transaction():
+            await storage.save("c", "d", 4)
+        await journal.close()
+        assert [record[2] for record in journal.read(journal.get_segments())] == ["c", "c"]
+
+    asyncio.run(run())